@@ -1,7 +1,10 @@
 class AVLNode:
+    __slots__ = ('board_state', 'value_q', 'visits', 'height', 'left', 'right')
+
     def __init__(self, board_state, value_q):
         self.board_state = board_state  # tupla que representa al estado del tablero
         self.value_q = value_q  # Diccionario que mapea el movimiento con las tablas Q
+        self.visits = 0  # Número de actualizaciones Q que ha recibido el estado
         self.height = 1
         self.left = None
         self.right = None
\ No newline at end of file
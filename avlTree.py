@@ -1,33 +1,45 @@
-from graphviz import Digraph
-
 from avlNode import AVLNode
+from treeExport import write_dot
 
 class AVLTree:
     def __init__(self):
         self.root = None
+        self.rotations = 0  # Rotaciones acumuladas, expuestas como métrica
     
     def insert(self, node, board_state, value_q):
-        if not node:
-            return AVLNode(board_state, value_q)
-        elif board_state < node.board_state:
-            node.left = self.insert(node.left, board_state, value_q)
-        else:
-            node.right = self.insert(node.right, board_state, value_q)
-        
-        node.height = 1 + max(self.get_height(node.left), self.get_height(node.right))
-        balance = self.get_balance(node)
-        
-        if balance > 1 and board_state < node.left.board_state:
-            return self.rotate_right(node)
-        if balance < -1 and board_state > node.right.board_state:
-            return self.rotate_left(node)
-        if balance > 1 and board_state > node.left.board_state:
-            node.left = self.rotate_left(node.left)
+        # Inserción iterativa: baja guardando el camino y rebalancea de regreso hacia la raíz.
+        # Devuelve la nueva raíz del subárbol, igual que la versión recursiva.
+        path = []
+        current = node
+        while current:
+            go_left = board_state < current.board_state
+            path.append((current, go_left))
+            current = current.left if go_left else current.right
+
+        subtree = AVLNode(board_state, value_q)
+        for parent, went_left in reversed(path):
+            if went_left:
+                parent.left = subtree
+            else:
+                parent.right = subtree
+            subtree = self._rebalance(parent)
+        return subtree
+
+    def _rebalance(self, node):
+        left, right = node.left, node.right
+        left_height = left.height if left else 0
+        right_height = right.height if right else 0
+        node.height = 1 + (left_height if left_height > right_height else right_height)
+        balance = left_height - right_height
+
+        if balance > 1:
+            if self.get_balance(left) < 0:
+                node.left = self.rotate_left(left)
             return self.rotate_right(node)
-        if balance < -1 and board_state < node.right.board_state:
-            node.right = self.rotate_right(node.right)
+        if balance < -1:
+            if self.get_balance(right) > 0:
+                node.right = self.rotate_right(right)
             return self.rotate_left(node)
-        
         return node
 
     def get_height(self, node):
@@ -38,131 +50,132 @@ class AVLTree:
     def get_balance(self, node):
         if not node:
             return 0
-        return self.get_height(node.left) - self.get_height(node.right)
+        return (node.left.height if node.left else 0) - (node.right.height if node.right else 0)
     
+    def _update_height(self, node):
+        left_height = node.left.height if node.left else 0
+        right_height = node.right.height if node.right else 0
+        node.height = 1 + (left_height if left_height > right_height else right_height)
+
     def rotate_left(self, z):
+        self.rotations += 1
         y = z.right
         T2 = y.left
         y.left = z
         z.right = T2
-        z.height = 1 + max(self.get_height(z.left), self.get_height(z.right))
-        y.height = 1 + max(self.get_height(y.left), self.get_height(y.right))
+        self._update_height(z)
+        self._update_height(y)
         return y
     
     def rotate_right(self, z):
+        self.rotations += 1
         y = z.left
         T3 = y.right
         y.right = z
         z.left = T3
-        z.height = 1 + max(self.get_height(z.left), self.get_height(z.right))
-        y.height = 1 + max(self.get_height(y.left), self.get_height(y.right))
+        self._update_height(z)
+        self._update_height(y)
         return y
 
     def search(self, node, board_state):
-        if not node or node.board_state == board_state:
-            return node
-        elif board_state < node.board_state:
-            return self.search(node.left, board_state)
-        else:
-            return self.search(node.right, board_state)
-        
+        while node and node.board_state != board_state:
+            node = node.left if board_state < node.board_state else node.right
+        return node
+
+    def iter_nodes(self, node=None):
+        # Recorrido en orden con una pila explícita; no construye la lista de todos los nodos
+        stack = []
+        current = self.root if node is None else node
+        while stack or current:
+            while current:
+                stack.append(current)
+                current = current.left
+            current = stack.pop()
+            yield current
+            current = current.right
+
     def get_all_nodes(self):
-        nodes = []
-        self._inorder_traverse(self.root, nodes)
-        return nodes
+        return list(self.iter_nodes())
+
+    def __len__(self):
+        return sum(1 for _ in self.iter_nodes())
 
-    def _inorder_traverse(self, node, nodes):
-        if node is not None:
-            self._inorder_traverse(node.left, nodes)
+    def bulk_load(self, sorted_items):
+        # Construye en O(n) un árbol perfectamente balanceado a partir de elementos ya ordenados
+        # por board_state: (board_state, value_q) o (board_state, value_q, visits)
+        nodes = []
+        for item in sorted_items:
+            node = AVLNode(item[0], item[1])
+            if len(item) > 2:
+                node.visits = item[2]
             nodes.append(node)
-            self._inorder_traverse(node.right, nodes)
-
-    def visualize_tree(self, filename='avl_tree'):
-        dot = Digraph(comment='AVL Tree')
-        if not self.root:
-            dot.node('None', 'Empty Tree')
-            dot.render(filename, view=True)
-            return
-        self._add_nodes(dot, self.root)
-        dot.render(filename, view=True)  # Guarda y muestra el gráfico automáticamente
-
-    def _add_nodes(self, dot, node):
-        if node:
-            # Simplificamos la etiqueta para mostrar solo el mejor valor Q
-            best_q_value = max(node.value_q.values()) if node.value_q else 'No Q-values'
-            label = f"Q: {best_q_value}"
-            dot.node(str(id(node)), label)
-            self._add_edges(dot, node)
-            self._add_nodes(dot, node.left)
-            self._add_nodes(dot, node.right)
-
-    def _add_edges(self, dot, node):
-        if node and node.left:
-            dot.edge(str(id(node)), str(id(node.left)))
-        if node and node.right:
-            dot.edge(str(id(node)), str(id(node.right)))
+
+        self.root = None
+        if not nodes:
+            return self.root
+        # Cada rango [lo, hi) toma su punto medio como raíz; la altura de un subárbol construido
+        # así con n nodos es n.bit_length()
+        stack = [(0, len(nodes), None, False)]
+        while stack:
+            lo, hi, parent, is_left = stack.pop()
+            mid = lo + (hi - lo - 1) // 2
+            node = nodes[mid]
+            node.height = (hi - lo).bit_length()
+            if parent is None:
+                self.root = node
+            elif is_left:
+                parent.left = node
+            else:
+                parent.right = node
+            if lo < mid:
+                stack.append((lo, mid, node, True))
+            if mid + 1 < hi:
+                stack.append((mid + 1, hi, node, False))
+        return self.root
+
+    def visualize_tree(self, filename='avl_tree', max_depth=None, top_k=None, sample=None):
+        # Versión bloqueante: escribe el DOT (ver treeExport.write_dot), lo dibuja y lo abre.
+        # La interfaz usa TreeExportWindow, que dibuja en un proceso aparte.
+        import graphviz  # Solo se carga al dibujar; el juego y la IA no lo necesitan
+
+        write_dot(self, filename, max_depth, top_k, sample)
+        output = graphviz.render('dot', 'pdf', filename)
+        graphviz.view(output)
 
     def delete_node(self, node, board_state):
-        if not node:
+        # Eliminación iterativa dentro del subárbol `node`; devuelve la nueva raíz del subárbol
+        path = []
+        current = node
+        while current and current.board_state != board_state:
+            go_left = board_state < current.board_state
+            path.append((current, go_left))
+            current = current.left if go_left else current.right
+        if not current:
             return node
 
-        if board_state < node.board_state:
-            node.left = self.delete_node(node.left, board_state)
-        elif board_state > node.board_state:
-            node.right = self.delete_node(node.right, board_state)
+        if current.left and current.right:
+            # Dos hijos: copia el sucesor en orden y elimina el sucesor, que no tiene hijo izquierdo
+            path.append((current, False))
+            successor = current.right
+            while successor.left:
+                path.append((successor, True))
+                successor = successor.left
+            current.board_state, current.value_q, current.visits = \
+                successor.board_state, successor.value_q, successor.visits
+            replacement = successor.right
         else:
-            if not node.left:
-                temp = node.right
-                node = None
-                return temp
-            elif not node.right:
-                temp = node.left
-                node = None
-                return temp
-
-            temp = self.get_min_value_node(node.right)
-            node.board_state, node.value_q = temp.board_state, temp.value_q
-            node.right = self.delete_node(node.right, temp.board_state)
-
-        if not node:
-            return node
-
-        node.height = 1 + max(self.get_height(node.left), self.get_height(node.right))
-        balance = self.get_balance(node)
+            replacement = current.left if current.left else current.right
 
-        if balance > 1 and self.get_balance(node.left) >= 0:
-            return self.rotate_right(node)
-        if balance > 1 and self.get_balance(node.left) < 0:
-            node.left = self.rotate_left(node.left)
-            return self.rotate_right(node)
-        if balance < -1 and self.get_balance(node.right) <= 0:
-            return self.rotate_left(node)
-        if balance < -1 and self.get_balance(node.right) > 0:
-            node.right = self.rotate_right(node.right)
-            return self.rotate_left(node)
-
-        return node
-
-    def get_min_value_node(self, node):
-        if node is None or node.left is None:
-            return node
-        return self.get_min_value_node(node.left)
-
-    def remove_duplicates(self):
-        def in_order_collect(node, seen, duplicates):
-            if not node:
-                return
-            in_order_collect(node.left, seen, duplicates)
-            max_q_value = max(node.value_q.values(), default=None)
-            if max_q_value in seen:
-                duplicates.append(node.board_state)
+        subtree = replacement
+        for parent, went_left in reversed(path):
+            if went_left:
+                parent.left = subtree
             else:
-                seen.add(max_q_value)
-            in_order_collect(node.right, seen, duplicates)
-
-        seen = set()
-        duplicates = []
-        in_order_collect(self.root, seen, duplicates)
+                parent.right = subtree
+            subtree = self._rebalance(parent)
+        return subtree
 
-        for board_state in duplicates:
-            self.root = self.delete_node(self.root, board_state)
\ No newline at end of file
+    def get_min_value_node(self, node):
+        while node is not None and node.left is not None:
+            node = node.left
+        return node
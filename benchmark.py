@@ -0,0 +1,266 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+from avlTree import AVLTree
+from gameState import STATE_COUNT, GameState, decode_state
+from machineAI import MachineIa
+from qStore import Q_STORES, create_q_store
+from training import HeadlessBoard, seed_everything
+
+# Banco de pruebas sin interfaz de las rutas críticas del juego, la IA y el árbol. Usa semillas
+# fijas y tablas Q sintéticas para que las corridas sean comparables entre commits.
+
+IMPORT_MODULES = ('gameState', 'machineAI', 'training', 'tournament', 'server', 'main')
+# Dependencias que solo deberían cargarse al usar la interfaz, el historial o el diagrama
+HEAVY_MODULES = ('tkinter', 'PIL', 'graphviz', 'numpy', 'flask', 'pymongo')
+
+
+def synthetic_items(size, seed):
+    # `size` estados distintos (a lo sumo 3^9) con valores Q aleatorios en sus casillas vacías
+    rng = random.Random(seed)
+    codes = sorted(rng.sample(range(STATE_COUNT), min(size, STATE_COUNT)))
+    items = []
+    for code in codes:
+        board_state = decode_state(code)
+        value_q = {i: rng.uniform(-1, 1) for i, text in enumerate(board_state) if text == ''}
+        items.append((board_state, value_q, rng.randrange(1, 20)))
+    return items
+
+
+def measure(fn, repeat, setup=None):
+    # Mejor tiempo de `repeat` corridas. Si hay setup, su resultado se pasa a fn y su costo
+    # queda fuera de la medición.
+    best = float('inf')
+    for _ in range(repeat):
+        context = setup() if setup else None
+        start = time.perf_counter()
+        fn(context) if setup else fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def result(name, size, store, operations, seconds):
+    return {
+        'name': name,
+        'size': size,
+        'store': store,
+        'operations': operations,
+        'seconds': seconds,
+        'ops_per_sec': operations / seconds if seconds else None,
+        'mean_us': seconds / operations * 1e6 if operations else None,
+    }
+
+
+def bench_winner(repeat, seed):
+    rng = random.Random(seed)
+    board = HeadlessBoard()
+    states = [GameState.from_tuple(decode_state(rng.randrange(STATE_COUNT))) for _ in range(10000)]
+
+    def run():
+        for state in states:
+            board.game_state = state
+            board.winner()
+    return result('winner', None, None, len(states), measure(run, repeat))
+
+
+def bench_tree(items, repeat, seed):
+    rng = random.Random(seed)
+    size = len(items)
+    shuffled = items[:]
+    rng.shuffle(shuffled)
+    lookups = [rng.choice(items)[0] for _ in range(10000)]
+    results = []
+
+    def insert_all():
+        tree = AVLTree()
+        for board_state, value_q, _ in shuffled:
+            tree.root = tree.insert(tree.root, board_state, value_q)
+    results.append(result('avl.insert', size, 'avl', size, measure(insert_all, repeat)))
+
+    tree = AVLTree()
+    tree.bulk_load(items)
+
+    def search_all():
+        for board_state in lookups:
+            tree.search(tree.root, board_state)
+    results.append(result('avl.search', size, 'avl', len(lookups), measure(search_all, repeat)))
+
+    victims = [board_state for board_state, _, _ in shuffled[:min(1000, size)]]
+
+    def fresh_tree():
+        local = AVLTree()
+        local.bulk_load(items)
+        return local
+
+    def delete_some(local):
+        for board_state in victims:
+            local.root = local.delete_node(local.root, board_state)
+    results.append(result('avl.delete_node', size, 'avl', len(victims), measure(delete_some, repeat, fresh_tree)))
+    return results
+
+
+def _machine(store_kind, items):
+    board = HeadlessBoard(create_q_store(store_kind))
+    board.q_store.load_items(items)
+    machine = MachineIa(board)
+    machine.canonical_keys = False  # Los estados sintéticos no son canónicos; así cada consulta los encuentra
+    machine.exploration_rate = 0
+    machine.epsilon = 0
+    return board, machine
+
+
+def bench_machine(store_kind, items, repeat, seed):
+    rng = random.Random(seed)
+    size = len(items)
+    samples = [rng.choice(items)[0] for _ in range(5000)]
+    playable = [s for s in samples if '' in s] or [('',) * 9]
+    results = []
+
+    def update_all(context):
+        board, machine = context
+        for board_state in playable:
+            board.game_state = GameState.from_tuple(board_state)
+            machine.update_q_values(board_state, board_state.index(''), 0.3, True, False)
+    results.append(result('update_q_values', size, store_kind, len(playable),
+                          measure(update_all, repeat, lambda: _machine(store_kind, items))))
+
+    board, machine = _machine(store_kind, items)
+    moves = [(s, [i for i, text in enumerate(s) if text == '']) for s in playable]
+
+    def choose_all():
+        for board_state, empties in moves:
+            machine.choose_best_move(board_state, empties)
+    results.append(result('choose_best_move', size, store_kind, len(moves), measure(choose_all, repeat)))
+
+    def block_all():
+        for board_state, empties in moves:
+            board.game_state = GameState.from_tuple(board_state)
+            board.turn = 'O'
+            machine.block_opponent_win(empties, board_state)
+    results.append(result('block_opponent_win', size, store_kind, len(moves), measure(block_all, repeat)))
+    return results
+
+
+def bench_episodes(store_kind, episodes, repeat, seed, batch_updates=False):
+    def run():
+        seed_everything(seed)
+        board = HeadlessBoard(create_q_store(store_kind))
+        machine = MachineIa(board)
+        machine.batch_updates = batch_updates
+        use_x = True
+        for _ in range(episodes):
+            machine.simulate_game(use_x)
+            use_x = not use_x
+        machine.flush_updates()
+    name = 'simulate_game.batched' if batch_updates else 'simulate_game'
+    return result(name, None, store_kind, episodes, measure(run, repeat))
+
+
+def bench_import(module, repeat):
+    # Arranque en frío: cada corrida importa el módulo en un intérprete nuevo. Se mide el proceso
+    # completo y, con -X importtime, el tiempo acumulado del import; también se anota qué
+    # dependencias pesadas quedaron cargadas.
+    code = f"import sys, {module}; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    here = os.path.dirname(os.path.abspath(__file__))
+    best_start = best_import = float('inf')
+    heavy = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True,
+                                   text=True, cwd=here)
+        elapsed = time.perf_counter() - start
+        if completed.returncode:
+            error = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else 'error'
+            return {'module': module, 'error': error}
+        for line in completed.stderr.splitlines():
+            # "import time: propio | acumulado | módulo", en microsegundos
+            parts = line.split('|')
+            if len(parts) == 3 and parts[2].strip() == module:
+                best_import = min(best_import, int(parts[1]) / 1e6)
+        best_start = min(best_start, elapsed)
+        heavy = [name for name in completed.stdout.strip().split(',') if name]
+    return {
+        'module': module,
+        'cold_start_seconds': best_start,
+        'import_seconds': best_import if best_import != float('inf') else None,
+        'heavy': heavy,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(sizes, stores, repeat=3, episodes=2000, seed=0, imports=IMPORT_MODULES):
+    seed_everything(seed)
+    results = [bench_winner(repeat, seed)]
+    for size in sizes:
+        items = synthetic_items(size, seed)
+        results.extend(bench_tree(items, repeat, seed))
+        for store_kind in stores:
+            results.extend(bench_machine(store_kind, items, repeat, seed))
+    for store_kind in stores:
+        results.append(bench_episodes(store_kind, episodes, repeat, seed))
+        if hasattr(create_q_store(store_kind), 'apply_batch'):
+            results.append(bench_episodes(store_kind, episodes, repeat, seed, batch_updates=True))
+    return {
+        'meta': {
+            'commit': git_commit(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'seed': seed,
+            'repeat': repeat,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+        'imports': [bench_import(module, repeat) for module in imports],
+    }
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmarks sin interfaz de las rutas críticas del juego")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 5000, 20000],
+                        help="Tamaños de las tablas Q sintéticas (máximo 3^9 estados)")
+    parser.add_argument('--stores', nargs='+', choices=sorted(Q_STORES), default=['avl', 'hash'])
+    parser.add_argument('--repeat', type=int, default=3, help="Repeticiones por medición (se toma la mejor)")
+    parser.add_argument('--episodes', type=int, default=2000, help="Juegos simulados para medir juegos/s")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--imports', nargs='*', default=list(IMPORT_MODULES),
+                        help="Módulos cuyo arranque en frío se mide (sin valores no se mide ninguno)")
+    parser.add_argument('--output', default=None, help="Archivo JSON de salida (por defecto stdout)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    report = run_benchmarks(args.sizes, args.stores, args.repeat, args.episodes, args.seed, args.imports)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+        for row in report['results']:
+            size = row['size'] if row['size'] is not None else '-'
+            print(f"{row['name']:<22} {str(row['store'] or '-'):<6} {str(size):>6} {row['mean_us']:>10.2f} us/op")
+        for row in report['imports']:
+            if 'error' in row:
+                print(f"import {row['module']:<15} {row['error']}")
+                continue
+            print(f"import {row['module']:<15} {row['cold_start_seconds'] * 1000:>8.1f} ms proceso  "
+                  f"{(row['import_seconds'] or 0) * 1000:>8.1f} ms import  {','.join(row['heavy']) or '-'}")
+    else:
+        print(text)
+    return report
+
+
+if __name__ == '__main__':
+    main()
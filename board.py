@@ -1,38 +1,119 @@
-import tkinter as tk
-from tkinter import messagebox, Toplevel, Menu, Label, simpledialog
-from PIL import Image, ImageTk
+import logging
 import os
-import numpy as np
 
 from utilities import GameUtilities
 from machineAI import MachineIa
 from avlTree import AVLTree
+from qStore import AVLQStore, HashQStore
+from compaction import Compactor, CompactionPolicy
+from gridState import create_game_state
+from modelSnapshot import load_snapshot, save_snapshot, snapshot_canonical_keys
+from gameLog import GameLogWriter, GameRecorder
+from sharedStore import open_shared_store
+
+logger = logging.getLogger(__name__)
+
+MODEL_PATH = 'model.qtab'  # Tabla Q entrenada que se carga al iniciar y se guarda tras entrenar
 
 class BoardManager:
 
-    def __init__(self):
-        root = tk.Tk()
+    def __init__(self, size=3, win_length=None, shared_store=None, headless=False):
+        # headless: sin ventana ni tk.Tk(), para usar el tablero y la IA en scripts o sin pantalla
+        if headless:
+            root = None
+        else:
+            import tkinter as tk  # tkinter solo se importa al abrir la ventana
+
+            root = tk.Tk()
+        self.size = size
+        self.win_length = win_length or size
+        # Modelo guardado, registro de partidas y solucionador son del 3x3 clásico
+        self.classic = (self.size, self.win_length) == (3, 3)
         self.avl_tree = AVLTree()  # Asegúrate de que AVLTree esté correctamente definido
-        root.title("Juego de Totito")
+        self.model_path = MODEL_PATH
+        self._q_store = None  # Se carga desde model_path la primera vez que se usa
+        self.canonical_keys = True  # Forma de las claves del modelo; la decide el archivo cargado
+        self.shared_store = shared_store  # URI de una tabla Q compartida con otros clientes (opcional)
+        self.compactor = Compactor(None, CompactionPolicy())
+        self.game_recorder = GameRecorder(GameLogWriter()) if self.classic else None  # Partidas para reentrenar
+        self.pending_machine_move = None  # after() de la jugada de la máquina que aún no se ejecuta
+        self.game_state = create_game_state(size, win_length)  # Fuente de verdad del tablero, los botones solo la reflejan
+        if root is not None:
+            root.title("Juego de Totito")
         self.gameUtilities = GameUtilities(self)
         self.root = root
 
 
+    @property
+    def q_store(self):
+        # Almacén de valores Q que usa MachineIa; el modelo guardado se lee de forma perezosa
+        if self._q_store is None:
+            if self.shared_store:
+                # Tabla compartida: lo aprendido aquí llega a los demás clientes y viceversa
+                self.set_q_store(open_shared_store(self.shared_store))
+                return self._q_store
+            if not self.classic:
+                # Tableros grandes: solo se guardan los estados vistos, indexados por hash Zobrist
+                self.set_q_store(HashQStore())
+                return self._q_store
+            q_store = AVLQStore(self.avl_tree)
+            if os.path.exists(self.model_path):
+                load_snapshot(q_store, self.model_path)
+                self.canonical_keys = snapshot_canonical_keys(self.model_path)
+                self.compactor.canonical_keys = self.canonical_keys
+                if hasattr(self, 'machineIa'):
+                    self.machineIa.canonical_keys = self.canonical_keys
+            self.set_q_store(q_store)
+        return self._q_store
+
+    @property
+    def loaded_q_store(self):
+        # El modelo solo si ya se cargó: para el hilo de métricas, que no debe provocar la carga
+        return self._q_store
+
+    def set_q_store(self, q_store):
+        # Reemplazo del modelo en uso (por ejemplo al terminar un entrenamiento): una sola
+        # asignación en el hilo de Tk, la máquina lee self.q_store en cada jugada
+        if self._q_store is not None and self._q_store is not q_store:
+            self._q_store.close()
+        self._q_store = q_store
+        if isinstance(q_store, AVLQStore):
+            self.avl_tree = q_store.avl_tree
+        self.compactor.q_store = q_store
+
+    def save_model(self):
+        if self.shared_store:
+            self.q_store.flush()  # El almacén compartido es el modelo; solo se envía lo pendiente
+        elif self.classic:
+            save_snapshot(self.q_store, self.model_path, self.canonical_keys)
+
+    def close_model(self):
+        if self._q_store is not None:
+            self._q_store.close()
+
     def init_Ia(self, new_self):
         self.machineIa = MachineIa(new_self)
+        self.machineIa.canonical_keys = self.canonical_keys
+        self.machineIa.compactor = self.compactor
+        self.machineIa.game_recorder = self.game_recorder
     
         
 
     def create_widgets(self):
+            import tkinter as tk
+
             self.buttons = []
-            for i in range(9):
-                btn = tk.Button(self.root, text='', font=('Arial', 24), height=3, width=6,
+            # Botones más chicos en tableros grandes para que la ventana quepa en pantalla
+            font_size, height, width = (24, 3, 6) if self.size <= 3 else (max(8, 72 // self.size), 1, 2)
+            for i in range(self.size * self.size):
+                btn = tk.Button(self.root, text='', font=('Arial', font_size), height=height, width=width,
                                 command=lambda i=i: self.on_button_press(i))
-                btn.grid(row=i//3, column=i%3)
+                btn.grid(row=i//self.size, column=i%self.size)
                 self.buttons.append(btn)
             
+            self.sync_buttons()
             self.reset_button = tk.Button(self.root, text='Reiniciar Juego', command=self.reset_game)
-            self.reset_button.grid(row=3, column=0, columnspan=3)
+            self.reset_button.grid(row=self.size, column=0, columnspan=self.size)
             self.update_scores()
 
     def reset_game(self, silent=False):
@@ -40,10 +121,14 @@ class BoardManager:
         if not silent:
             # Reinicia el arbol AVL solo si es un reseteo forzado, mas no durante el training
             #self.avl_tree.root = None
-            print("tried to restart avl node")
-        if hasattr(self, 'buttons'):
-            for btn in self.buttons:
-                btn.config(text='')
+            logger.debug("tried to restart avl node")
+        if self.pending_machine_move is not None:
+            self.root.after_cancel(self.pending_machine_move)  # La jugada era de la partida anterior
+            self.pending_machine_move = None
+        self.game_state.reset()
+        if self.game_recorder:
+            self.game_recorder.discard()  # Una partida reiniciada a medias no se registra
+        self.sync_buttons()
         if not silent:
             self.score_x = getattr(self, 'score_x', 0)
             self.score_o = getattr(self, 'score_o', 0)
@@ -58,27 +143,40 @@ class BoardManager:
 
     def update_scores(self):
         score_text = f"Victorias (X): {self.score_x}  Victorias (O): {self.score_o}  Empates: {self.draws}"
+        if self.root is None:
+            return  # Sin ventana el marcador solo vive en score_x, score_o y draws
         if hasattr(self, 'score_label'):
             self.score_label.config(text=score_text)
         else:
+            import tkinter as tk
+
             self.score_label = tk.Label(self.root, text=score_text)
-            self.score_label.grid(row=4, column=0, columnspan=3)
+            self.score_label.grid(row=self.size + 1, column=0, columnspan=self.size)
 
     def winner(self):
-        # Definir todas las combinaciones posibles para ganar en un tablero 3x3
-        lines = [
-            (0, 1, 2), (3, 4, 5), (6, 7, 8),  # líneas horizontales
-            (0, 3, 6), (1, 4, 7), (2, 5, 8),  # líneas verticales
-            (0, 4, 8), (2, 4, 6)             # diagonales
-        ]
-        # Revisar cada combinación para ver si hay una línea ganadora
-        for a, b, c in lines:
-            if self.buttons[a]['text'] == self.buttons[b]['text'] == self.buttons[c]['text'] != '':
-                return self.buttons[a]['text']
-        # Si no hay ganador, devuelve None
-        return None
+        # Consulta O(1) sobre las máscaras del estado, sin leer los botones
+        return self.game_state.winner()
+
+    def place_mark(self, index, player):
+        # Escribe en el estado y refleja el cambio en el botón correspondiente
+        self.game_state.set(index, player)
+        if hasattr(self, 'buttons'):
+            self.buttons[index]['text'] = player
+
+    def sync_buttons(self):
+        # Refleja el estado completo del tablero en los botones
+        if hasattr(self, 'buttons'):
+            for i, btn in enumerate(self.buttons):
+                btn.config(text=self.game_state.get(i))
+
+    def refresh_display(self):
+        if self.root is not None:
+            self.root.update_idletasks()  # Forzar actualización inmediata de la GUI
     
     def create_menu(self):
+        import tkinter as tk
+        from tkinter import Menu
+
         menu_bar = Menu(self.root)
         self.root.config(menu=menu_bar)
 
@@ -87,48 +185,47 @@ class BoardManager:
         file_menu.add_command(label="Mostrar historial", command=self.show_history)
         file_menu.add_command(label="Entrenar modelo", command=self.ask_training_games)
         file_menu.add_command(label="Generar diagrama de evolucion", command=self.show_avl_tree)
+        file_menu.add_command(label="Compactar modelo", command=self.compact_model)
+        # Estrategia de la máquina: el solucionador exacto solo existe para el 3x3
+        strategy_menu = Menu(file_menu, tearoff=0)
+        file_menu.add_cascade(label="Estrategia", menu=strategy_menu)
+        self.strategy = tk.StringVar(value='qlearning')
+        strategy_menu.add_radiobutton(label="Aprendizaje Q", value='qlearning', variable=self.strategy,
+                                      command=self.change_strategy)
+        strategy_menu.add_radiobutton(label="Oponente perfecto", value='perfect', variable=self.strategy,
+                                      command=self.change_strategy, state='normal' if self.classic else 'disabled')
+        strategy_menu.add_radiobutton(label="Monte Carlo (MCTS)", value='mcts', variable=self.strategy,
+                                      command=self.change_strategy)
         file_menu.add_command(label="Integrantes del grupo", command=self.show_group_information)
         self.init_Ia(self)
 
     def show_history(self):
-        # Abre una ventana nueva con el hsitorial de partidas
-        history_window = Toplevel()
-        history_window.title("Historial de Partidas")
-
-        # agrega el scroll al canvas
-        canvas = tk.Canvas(history_window)
-        scrollbar = tk.Scrollbar(history_window, command=canvas.yview)
-        scrollable_frame = tk.Frame(canvas)
-
-        # Configura el canvas y scrollbar
-        canvas.configure(yscrollcommand=scrollbar.set)
-        canvas.bind('<Configure>', lambda e: canvas.configure(scrollregion=canvas.bbox('all')))
-        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-
-        game_files = sorted([f for f in os.listdir('history') if f.endswith('.png')], reverse=True)
-        for i, filename in enumerate(game_files, start=1):
-            image_path = os.path.join('history', filename)
-            img = Image.open(image_path)
-            img.thumbnail((150, 150), Image.Resampling.LANCZOS)
-            photo = ImageTk.PhotoImage(img)
-
-            label_image = Label(scrollable_frame, image=photo)
-            label_image.image = photo  # Keep a reference!
-            label_image.grid(row=i, column=0, padx=10, pady=10)
-
-            # Dado que no tenemos forma de guardar los q values, generamos dummys q values
-            q_values_text = "Q-values: " + ", ".join(f"{k}: {v:.2f}" for k, v in enumerate(np.random.rand(9)))
-            label_q_values = Label(scrollable_frame, text=f"Partida {i}: {q_values_text}", font=("Arial", 10))
-            label_q_values.grid(row=i, column=1, sticky="w", padx=10)
-
-        scrollbar.pack(side="right", fill="y")
-        canvas.pack(side="left", fill="both", expand=True)
+        # Abre una ventana nueva con el hsitorial de partidas, paginado y con miniaturas en caché
+        from historyViewer import HistoryViewer  # PIL se carga solo al abrir el historial
+
+        HistoryViewer(self.root)
+
+    def change_strategy(self):
+        self.machineIa.strategy = self.strategy.get()
+
+    def compact_model(self):
+        # Mantenimiento explícito de la tabla Q según la política del compactador
+        from tkinter import messagebox
+
+        self.q_store  # Asegura que el modelo esté cargado antes de compactarlo
+        removed = self.compactor.run()
+        messagebox.showinfo("Compactación", f"Se eliminaron {removed} estados del modelo.")
 
     def show_avl_tree(self):
-        self.avl_tree.visualize_tree()
+        # Opciones de profundidad, top-K y muestreo; el dibujo corre en un proceso aparte
+        from treeViewer import TreeExportWindow  # graphviz se carga solo al pedir el diagrama
+
+        TreeExportWindow(self.root, self.q_store.as_avl_tree())
 
     
     def show_group_information(self):
+            from tkinter import messagebox
+
             informacion_grupo = "Integrantes del grupo:\n\n" \
                                 "- Cristhian Sebastián Rodas Arriola, 9490-22-523, Sección A\n" \
                                 "- Alder Isaac Solis De León, 9490-22-227, Sección A\n" \
@@ -138,20 +235,31 @@ class BoardManager:
             messagebox.showinfo("Información del grupo", informacion_grupo)
 
     def on_button_press(self, index, pvpMode=True):
-        if self.buttons[index]['text'] == '' and self.winner() is None:
-            self.buttons[index]['text'] = self.turn
+        from tkinter import messagebox  # Solo los clics en la ventana llegan aquí
+
+        if self.pending_machine_move is not None:
+            return  # Es el turno de la máquina, que mueve tras la pausa
+        if self.game_state.is_empty(index) and self.winner() is None:
+            self.place_mark(index, self.turn)
+            if self.game_recorder:
+                reward, is_diagonal, blocked_opponent = self.machineIa.evaluate_move_result(index)
+                self.game_recorder.record_move(index, self.turn, reward, is_diagonal, blocked_opponent)
             
             # Verificar si hay un ganador
             winner = self.winner()
             if winner:
                 self.update_score(winner) if pvpMode else None
                 messagebox.showinfo("Juego Terminado", f"El ganador es {winner}!") if pvpMode else None
-                self.gameUtilities.save_screenshot() 
+                self.gameUtilities.save_game_record(winner)
+                if self.game_recorder:
+                    self.game_recorder.finish(winner)
                 self.reset_game()
-            elif '' not in [btn['text'] for btn in self.buttons]:  # Comprobar si el tablero está lleno
+            elif self.game_state.is_full():  # Comprobar si el tablero está lleno
                 self.draws += 1 if pvpMode else None
                 messagebox.showinfo("Juego Terminado", "¡Es un empate!") if pvpMode else None
-                self.gameUtilities.save_screenshot() 
+                self.gameUtilities.save_game_record()
+                if self.game_recorder:
+                    self.game_recorder.finish('draw')
                 self.reset_game()
             else:
                 # Cambiar el turno
@@ -159,16 +267,21 @@ class BoardManager:
                 self.update_scores() if pvpMode else None
                 # Si es el turno de la máquina, realizar el movimiento
                 if self.turn == 'O':
-                    self.avl_tree.remove_duplicates()
-                    self.root.after(500, self.machineIa.machine_move(True))
+                    self.pending_machine_move = self.root.after(500, self.machine_turn)
     
+    def machine_turn(self):
+        self.pending_machine_move = None
+        self.machineIa.machine_move(True)
+
     def get_board_state(self):
         # Convertir el estado del tablero a una tupla para ser hashable
-        return tuple(btn['text'] for btn in self.buttons)
+        return self.game_state.to_tuple()
     
     def ask_training_games(self):
+        from tkinter import messagebox, simpledialog
+
         try:
-            N = simpledialog.askinteger("Entrenamiento", "Ingresa el número de juegos para entrenar:", minvalue=1, maxvalue=100)
+            N = simpledialog.askinteger("Entrenamiento", "Ingresa el número de juegos para entrenar:", minvalue=1)
             if N is not None:
                 self.machineIa.train_model(N)
         except ValueError:
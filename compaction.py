@@ -0,0 +1,98 @@
+from gameState import SYMMETRY_INVERSES, canonical_form
+from instrumentation import metrics
+
+
+class CompactionPolicy:
+    # symmetry: fusiona los estados equivalentes por rotación/reflexión en su forma canónica
+    # min_visits: poda los estados con menos visitas que este umbral
+    # every_inserts: ejecuta la compactación automáticamente cada N inserciones (0 = solo manual)
+    def __init__(self, symmetry=False, min_visits=0, every_inserts=0):
+        self.symmetry = symmetry
+        self.min_visits = min_visits
+        self.every_inserts = every_inserts
+
+
+def _merge_values(entries):
+    # Promedio de valores Q ponderado por visitas; sin visitas cuenta cada entrada igual
+    total = sum(visits for _, visits in entries)
+    merged = {}
+    for value_q, visits in entries:
+        weight = visits / total if total else 1 / len(entries)
+        for action, q in value_q.items():
+            merged[action] = merged.get(action, 0) + q * weight
+    return merged, total
+
+
+def merge_symmetric_states(q_store):
+    # Agrupa cada estado con su forma canónica, traduciendo los índices de acción
+    groups = {}
+    for entry in list(q_store.entries()):
+        if len(entry.board_state) != 9:
+            continue  # Las simetrías solo están definidas para el 3x3
+        canonical, symmetry = canonical_form(entry.board_state)
+        inverse = SYMMETRY_INVERSES[symmetry]
+        value_q = {inverse[action]: q for action, q in entry.value_q.items()}
+        groups.setdefault(canonical, []).append((entry.board_state, value_q, entry.visits))
+
+    removed = 0
+    for canonical, members in groups.items():
+        if len(members) == 1 and members[0][0] == canonical:
+            continue
+        value_q, visits = _merge_values([(q, v) for _, q, v in members])
+        for board_state, _, _ in members:
+            if board_state != canonical:
+                q_store.remove(board_state)
+                removed += 1
+        entry = q_store.get(canonical)
+        if entry is None:
+            entry = q_store.insert(canonical, value_q)
+            removed -= 1
+        entry.value_q = value_q
+        entry.visits = visits
+        q_store.touch(entry)
+    return removed
+
+
+def prune_low_visits(q_store, min_visits, keep=None):
+    # `keep` es el estado que se está actualizando: recién insertado, aún no junta visitas
+    stale = [entry.board_state for entry in q_store.entries()
+             if entry.visits < min_visits and entry.board_state != keep]
+    for board_state in stale:
+        q_store.remove(board_state)
+    return len(stale)
+
+
+def compact_store(q_store, policy, keep=None, canonical_keys=True):
+    # Ejecuta la política completa y devuelve cuántos estados se eliminaron. Con claves tal cual
+    # (modelos entrenados con --no-symmetry) no se fusionan simetrías: la máquina busca cada
+    # estado sin canonizarlo y dejaría de encontrar los que se movieran a su forma canónica.
+    removed = 0
+    with metrics.timer('compaction_seconds'):
+        if policy.symmetry and canonical_keys:
+            removed += merge_symmetric_states(q_store)
+        if policy.min_visits:
+            removed += prune_low_visits(q_store, policy.min_visits, keep)
+    return removed
+
+
+class Compactor:
+
+    def __init__(self, q_store, policy=None):
+        self.q_store = q_store
+        self.policy = policy if policy is not None else CompactionPolicy()
+        self.canonical_keys = True  # Igual que MachineIa.canonical_keys del modelo que compacta
+        self.inserts_since_run = 0
+
+    def on_insert(self, keep=None):
+        # Mantenimiento incremental: solo corre cada policy.every_inserts inserciones. `keep` es
+        # el estado recién insertado, que no se poda aunque tenga pocas visitas.
+        if not self.policy.every_inserts:
+            return 0
+        self.inserts_since_run += 1
+        if self.inserts_since_run < self.policy.every_inserts:
+            return 0
+        return self.run(keep)
+
+    def run(self, keep=None):
+        self.inserts_since_run = 0
+        return compact_store(self.q_store, self.policy, keep, self.canonical_keys)
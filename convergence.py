@@ -0,0 +1,75 @@
+# Seguimiento de la convergencia del entrenamiento por lotes de episodios. MachineIa avisa cada
+# actualización Q con record(); al cerrar el lote se calculan el cambio máximo y medio de los
+# valores Q (|ΔQ|) y la rotación de la política: la fracción de estados tocados en el lote cuya
+# mejor jugada cambió respecto del lote anterior (un estado nuevo cuenta como cambio). Cuando la
+# rotación y el cambio máximo se mantienen bajo los umbrales durante `patience` lotes seguidos,
+# should_stop() indica que la política ya se estabilizó.
+
+
+def greedy_action(value_q):
+    # Mejor acción con desempate por el índice menor, para que la comparación sea estable
+    return max(value_q, key=lambda action: (value_q[action], -action)) if value_q else None
+
+
+class Convergence:
+
+    def __init__(self, batch_episodes=1000, patience=5, churn_threshold=0.01, delta_threshold=None, report=None):
+        self.batch_episodes = batch_episodes
+        self.patience = patience  # None: solo se mide, nunca se detiene
+        self.churn_threshold = churn_threshold
+        self.delta_threshold = delta_threshold  # None: solo se mira la rotación de la política
+        self.history = []  # Un diccionario por lote cerrado
+        self.stopped_at = None  # Episodios jugados al detenerse por convergencia
+        self.report = report  # report(fila) se llama al cerrar cada lote
+        self.greedy = {}  # estado -> mejor acción al cerrar el último lote en que se tocó
+        self._reset_batch()
+
+    def _reset_batch(self):
+        self.max_delta = 0.0
+        self.total_delta = 0.0
+        self.updates = 0
+        self.touched = set()
+
+    def record(self, state, delta):
+        if delta > self.max_delta:
+            self.max_delta = delta
+        self.total_delta += delta
+        self.updates += 1
+        self.touched.add(state)
+
+    def record_batch(self, states, deltas):
+        for state, delta in zip(states, deltas):
+            self.record(state, float(delta))
+
+    def end_batch(self, episodes, q_store):
+        changed = 0
+        for state in self.touched:
+            entry = q_store.get(state)
+            action = greedy_action(entry.value_q) if entry else None
+            if self.greedy.get(state) != action:
+                changed += 1
+            self.greedy[state] = action
+        row = {
+            'episodes': episodes,
+            'updates': self.updates,
+            'max_delta': self.max_delta,
+            'mean_delta': self.total_delta / self.updates if self.updates else 0.0,
+            'churn': changed / len(self.touched) if self.touched else 0.0,
+            'states': len(q_store),
+        }
+        self.history.append(row)
+        self._reset_batch()
+        if self.report:
+            self.report(row)
+        return row
+
+    def _stable(self, row):
+        if row['churn'] > self.churn_threshold:
+            return False
+        return self.delta_threshold is None or row['max_delta'] <= self.delta_threshold
+
+    def should_stop(self):
+        if not self.patience:
+            return False
+        recent = self.history[-self.patience:]
+        return len(recent) == self.patience and all(self._stable(row) for row in recent)
@@ -0,0 +1,156 @@
+import argparse
+import os
+import struct
+import time
+
+from gameState import GameState
+from machineAI import MachineIa
+from modelSnapshot import load_snapshot, save_snapshot, snapshot_canonical_keys
+from qStore import Q_STORES, create_q_store
+
+# Registro binario de partidas, sólo de anexado y dividido en segmentos games-000001.log, ...
+# Cada registro: longitud (uint16) + cabecera + una entrada por jugada.
+#   cabecera: marca de tiempo (float64), quién empezó (0 = X, 1 = O), resultado (0 = sin
+#             terminar, 1 = X, 2 = O, 3 = empate), número de jugadas (uint8)
+#   jugada:   casilla (uint8), banderas (bit 0 = jugó O, bit 1 = diagonal, bit 2 = bloqueó),
+#             recompensa de evaluate_move_result (float32)
+LOG_DIR = 'logs'
+LENGTH = struct.Struct('<H')
+HEADER = struct.Struct('<dBBB')
+MOVE = struct.Struct('<BBf')
+OUTCOMES = (None, 'X', 'O', 'draw')
+PLAYER_O, DIAGONAL, BLOCKED = 1, 2, 4
+
+
+def encode_game(game):
+    moves = game['moves']
+    payload = [HEADER.pack(game['timestamp'], 1 if game['starter'] == 'O' else 0,
+                           OUTCOMES.index(game['outcome']), len(moves))]
+    for index, player, reward, is_diagonal, blocked in moves:
+        flags = (PLAYER_O if player == 'O' else 0) | (DIAGONAL if is_diagonal else 0) | (BLOCKED if blocked else 0)
+        payload.append(MOVE.pack(index, flags, reward))
+    body = b''.join(payload)
+    return LENGTH.pack(len(body)) + body
+
+
+def decode_game(body):
+    timestamp, starter, outcome, count = HEADER.unpack_from(body, 0)
+    moves = []
+    for index, flags, reward in MOVE.iter_unpack(body[HEADER.size:HEADER.size + count * MOVE.size]):
+        moves.append((index, 'O' if flags & PLAYER_O else 'X', reward, bool(flags & DIAGONAL), bool(flags & BLOCKED)))
+    return {'timestamp': timestamp, 'starter': 'O' if starter else 'X', 'outcome': OUTCOMES[outcome], 'moves': moves}
+
+
+def segment_paths(directory=LOG_DIR):
+    if not os.path.isdir(directory):
+        return []
+    names = sorted(name for name in os.listdir(directory) if name.startswith('games-') and name.endswith('.log'))
+    return [os.path.join(directory, name) for name in names]
+
+
+class GameLogWriter:
+
+    def __init__(self, directory=LOG_DIR, max_segment_bytes=1 << 20):
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self.file = None
+
+    def _open_segment(self):
+        os.makedirs(self.directory, exist_ok=True)
+        paths = segment_paths(self.directory)
+        if paths and os.path.getsize(paths[-1]) < self.max_segment_bytes:
+            path = paths[-1]
+        else:
+            number = int(os.path.basename(paths[-1])[6:-4]) + 1 if paths else 1
+            path = os.path.join(self.directory, f'games-{number:06d}.log')
+        self.file = open(path, 'ab')
+
+    def append(self, game):
+        if self.file is None or self.file.tell() >= self.max_segment_bytes:
+            self.close()
+            self._open_segment()
+        self.file.write(encode_game(game))
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class GameRecorder:
+    # Acumula las jugadas de la partida en curso y la escribe completa al terminar
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.moves = []
+
+    def record_move(self, index, player, reward, is_diagonal=False, blocked_opponent=False):
+        self.moves.append((index, player, reward, is_diagonal, blocked_opponent))
+
+    def finish(self, outcome):
+        if self.moves:
+            self.writer.append({'timestamp': time.time(), 'starter': self.moves[0][1],
+                                'outcome': outcome, 'moves': self.moves})
+        self.moves = []
+
+    def discard(self):
+        # Partida abandonada (reinicio manual): no se escribe
+        self.moves = []
+
+
+def iter_games(directory=LOG_DIR):
+    # Lee los segmentos en orden sin cargarlos completos; ignora un registro final truncado
+    for path in segment_paths(directory):
+        with open(path, 'rb') as f:
+            while True:
+                prefix = f.read(LENGTH.size)
+                if len(prefix) < LENGTH.size:
+                    break
+                (length,) = LENGTH.unpack(prefix)
+                body = f.read(length)
+                if len(body) < length:
+                    break
+                yield decode_game(body)
+
+
+def replay_games(machine, games):
+    # Reaplica las actualizaciones Q de cada jugada tal como las hace execute_move: con el
+    # estado del tablero antes de la jugada y la recompensa registrada
+    replayed = 0
+    for game in games:
+        state = GameState()
+        for index, player, reward, is_diagonal, blocked in game['moves']:
+            machine.update_q_values(state.to_tuple(), index, reward, is_diagonal, blocked)
+            state.set(index, player)
+        replayed += 1
+    machine.flush_updates()
+    return replayed
+
+
+def main(argv=None):
+    from training import HeadlessBoard  # training también importa este módulo
+
+    parser = argparse.ArgumentParser(description="Entrena la tabla Q reproduciendo el registro de partidas")
+    parser.add_argument('directory', nargs='?', default=LOG_DIR, help="Carpeta con los segmentos del registro")
+    parser.add_argument('--store', choices=sorted(Q_STORES), default='hash')
+    parser.add_argument('--input', default=None, help="Modelo guardado al que se suman las partidas")
+    parser.add_argument('--output', default=None, help="Archivo donde guardar el modelo resultante")
+    args = parser.parse_args(argv)
+
+    board = HeadlessBoard(create_q_store(args.store))
+    machine = MachineIa(board)
+    if args.input:
+        load_snapshot(board.q_store, args.input)
+        machine.canonical_keys = snapshot_canonical_keys(args.input)  # Las partidas siguen las claves del modelo
+    start = time.perf_counter()
+    replayed = replay_games(machine, iter_games(args.directory))
+    elapsed = time.perf_counter() - start
+    print(f"{replayed} partidas reproducidas en {elapsed:.2f}s, {len(board.q_store)} estados")
+    if args.output:
+        save_snapshot(board.q_store, args.output, machine.canonical_keys)
+        print(f"Modelo guardado en {args.output}")
+
+
+if __name__ == '__main__':
+    main()
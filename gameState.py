@@ -0,0 +1,161 @@
+from functools import lru_cache
+
+WIN_LINES = (
+    (0, 1, 2), (3, 4, 5), (6, 7, 8),  # líneas horizontales
+    (0, 3, 6), (1, 4, 7), (2, 5, 8),  # líneas verticales
+    (0, 4, 8), (2, 4, 6)              # diagonales
+)
+
+# Cada línea ganadora representada como una máscara de 9 bits (bit i = casilla i)
+WIN_MASKS = tuple((1 << a) | (1 << b) | (1 << c) for a, b, c in WIN_LINES)
+FULL_MASK = (1 << 9) - 1
+LINES_THROUGH = tuple(tuple(line for line in WIN_MASKS if line >> i & 1) for i in range(9))  # Por casilla
+
+# Tabla precalculada: para cada máscara posible (512) indica si contiene una línea completa
+IS_WIN = tuple(any(mask & line == line for line in WIN_MASKS) for mask in range(1 << 9))
+
+# Esquinas y centro: las casillas que están sobre alguna diagonal
+DIAGONAL_CELLS = frozenset((0, 2, 4, 6, 8))
+
+# Casillas vacías de cada máscara ocupada, ya en orden ascendente
+EMPTY_INDICES = tuple(tuple(i for i in range(9) if not mask >> i & 1) for mask in range(1 << 9))
+
+# Las 8 simetrías del tablero (grupo D4): transformado[i] = original[perm[i]]
+def _rotate(perm):
+    return tuple(perm[6 - 3 * (i % 3) + i // 3] for i in range(9))
+
+
+def _reflect(perm):
+    return tuple(perm[3 * (i // 3) + 2 - i % 3] for i in range(9))
+
+
+_IDENTITY = tuple(range(9))
+_ROTATIONS = [_IDENTITY]
+for _ in range(3):
+    _ROTATIONS.append(_rotate(_ROTATIONS[-1]))
+SYMMETRIES = tuple(_ROTATIONS + [_reflect(perm) for perm in _ROTATIONS])
+# Inversas: la acción original a queda en la posición SYMMETRY_INVERSES[k][a] del tablero
+# transformado, y la posición j del transformado vuelve a la acción original SYMMETRIES[k][j]
+SYMMETRY_INVERSES = tuple(tuple(perm.index(i) for i in range(9)) for perm in SYMMETRIES)
+
+
+def transform_state(board_state, perm):
+    return tuple(board_state[i] for i in perm)
+
+
+@lru_cache(maxsize=3 ** 9)
+def canonical_form(board_state):
+    # Representante de la clase de equivalencia (la menor de las 8 transformaciones) junto
+    # con el índice de la simetría que lleva el estado original a ese representante
+    return min((transform_state(board_state, perm), k) for k, perm in enumerate(SYMMETRIES))
+
+
+def canonical_state(board_state):
+    return canonical_form(board_state)[0]
+
+# Codificación base 3 del tablero: dígito 0 = vacía, 1 = 'O', 2 = 'X', con la casilla 0 como
+# dígito más significativo. Así el orden de los códigos coincide con el orden de las tuplas
+# ('' < 'O' < 'X'), que es el orden que usa el árbol AVL. Hay como máximo 3^9 = 19683 códigos.
+STATE_COUNT = 3 ** 9
+CELL_DIGITS = {'': 0, 'O': 1, 'X': 2}
+_POWERS = tuple(3 ** (8 - i) for i in range(9))
+X_MASK_CODES = tuple(sum(2 * _POWERS[i] for i in range(9) if mask >> i & 1) for mask in range(1 << 9))
+O_MASK_CODES = tuple(sum(_POWERS[i] for i in range(9) if mask >> i & 1) for mask in range(1 << 9))
+
+
+def encode_state(board_state):
+    code = 0
+    for text in board_state:
+        code = code * 3 + CELL_DIGITS[text]
+    return code
+
+
+# Cada grupo de 3 casillas es un número en base 27; se decodifica por tabla
+_TRIPLES = tuple((('', 'O', 'X')[n // 9], ('', 'O', 'X')[n // 3 % 3], ('', 'O', 'X')[n % 3]) for n in range(27))
+
+
+def decode_state(code):
+    return _TRIPLES[code // 729] + _TRIPLES[code // 27 % 27] + _TRIPLES[code % 27]
+
+
+# Estado del tablero 3x3 como dos máscaras de 9 bits, una por jugador. Es la fuente de
+# verdad del juego; los botones de la interfaz solo reflejan este estado.
+class GameState:
+    bitboard = True  # Admite las tablas de threats.py, indexadas por el código del estado
+    size = 3
+    win_length = 3
+    cell_count = 9
+
+    def __init__(self, x_mask=0, o_mask=0):
+        self.x_mask = x_mask
+        self.o_mask = o_mask
+
+    @classmethod
+    def from_tuple(cls, board_state):
+        state = cls()
+        for i, text in enumerate(board_state):
+            if text:
+                state.set(i, text)
+        return state
+
+    def reset(self):
+        self.x_mask = 0
+        self.o_mask = 0
+
+    def copy(self):
+        return GameState(self.x_mask, self.o_mask)
+
+    def get(self, index):
+        bit = 1 << index
+        if self.x_mask & bit:
+            return 'X'
+        if self.o_mask & bit:
+            return 'O'
+        return ''
+
+    def set(self, index, player):
+        # Un jugador vacío ('') limpia la casilla, igual que escribir '' en el botón
+        bit = 1 << index
+        self.x_mask &= ~bit
+        self.o_mask &= ~bit
+        if player == 'X':
+            self.x_mask |= bit
+        elif player == 'O':
+            self.o_mask |= bit
+
+    def is_empty(self, index):
+        return not (self.x_mask | self.o_mask) >> index & 1
+
+    def empty_indices(self):
+        return EMPTY_INDICES[self.x_mask | self.o_mask]
+
+    def is_full(self):
+        return self.x_mask | self.o_mask == FULL_MASK
+
+    def winner(self):
+        if IS_WIN[self.x_mask]:
+            return 'X'
+        if IS_WIN[self.o_mask]:
+            return 'O'
+        return None
+
+    def is_draw(self):
+        return self.is_full() and self.winner() is None
+
+    def is_diagonal(self, index):
+        return index in DIAGONAL_CELLS
+
+    def mixed_line_count(self):
+        # Líneas con marcas de ambos jugadores y al menos una casilla libre
+        occupied = self.x_mask | self.o_mask
+        return sum(1 for line in WIN_MASKS
+                   if self.x_mask & line and self.o_mask & line and occupied & line != line)
+
+    def encode(self):
+        return X_MASK_CODES[self.x_mask] + O_MASK_CODES[self.o_mask]
+
+    def key(self):
+        return self.encode()
+
+    def to_tuple(self):
+        return decode_state(self.encode())
@@ -0,0 +1,201 @@
+import random
+from functools import lru_cache
+from math import isqrt
+
+from gameState import GameState, encode_state
+
+# Tablero N x N donde gana quien junta win_length marcas seguidas. Cada ventana de win_length
+# casillas (horizontal, vertical o diagonal) es una "línea" con un contador por jugador; poner
+# o quitar una marca solo toca las líneas que pasan por esa casilla (a lo sumo 4 * win_length),
+# así que detectar el ganador no depende del tamaño del tablero.
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+
+class GridGeometry:
+    # Líneas y tablas que comparten todos los tableros del mismo tamaño y largo de línea
+
+    def __init__(self, size, win_length):
+        if not 1 <= win_length <= size:
+            raise ValueError(f"win_length debe estar entre 1 y {size}")
+        self.size = size
+        self.win_length = win_length
+        self.cell_count = size * size
+        lines = []
+        for row in range(size):
+            for col in range(size):
+                for d_row, d_col in DIRECTIONS:
+                    end_row = row + d_row * (win_length - 1)
+                    end_col = col + d_col * (win_length - 1)
+                    if 0 <= end_row < size and 0 <= end_col < size:
+                        lines.append(tuple((row + d_row * step) * size + col + d_col * step
+                                           for step in range(win_length)))
+        self.lines = tuple(dict.fromkeys(lines))  # Con win_length 1 las 4 direcciones coinciden
+        through = [[] for _ in range(self.cell_count)]
+        for line_id, line in enumerate(self.lines):
+            for cell in line:
+                through[cell].append(line_id)
+        self.lines_through = tuple(tuple(ids) for ids in through)
+        self.diagonal_cells = frozenset(i for i in range(self.cell_count)
+                                        if i // size == i % size or i // size + i % size == size - 1)
+        self.zobrist = zobrist_table(self.cell_count)
+
+
+@lru_cache(maxsize=None)
+def grid_geometry(size, win_length):
+    return GridGeometry(size, win_length)
+
+
+@lru_cache(maxsize=None)
+def zobrist_table(cell_count):
+    # Un número aleatorio de 64 bits por (casilla, jugador), fijo para cada tamaño de tablero
+    rng = random.Random(cell_count)
+    return tuple((rng.getrandbits(64), rng.getrandbits(64)) for _ in range(cell_count))
+
+
+@lru_cache(maxsize=1 << 14)
+def zobrist_key(board_state):
+    # En cada jugada se consulta la tabla Q varias veces con la misma tupla; el caché evita
+    # recorrer el tablero en Python más de una vez por estado
+    table = zobrist_table(len(board_state))
+    key = 0
+    for i, text in enumerate(board_state):
+        if text == 'X':
+            key ^= table[i][0]
+        elif text == 'O':
+            key ^= table[i][1]
+    return key
+
+
+def state_key(board_state):
+    # Clave de la tabla Q: el código base 3 exacto en el 3x3 (3^9 estados) y el hash Zobrist de
+    # 64 bits en tableros mayores, donde los códigos exactos crecen sin límite
+    if len(board_state) == 9:
+        return encode_state(board_state)
+    return zobrist_key(board_state)
+
+
+class GridState:
+    # Misma interfaz que GameState para tableros de cualquier tamaño. Además de las casillas
+    # lleva, por línea, cuántas marcas tiene cada jugador; con eso se mantienen al día las
+    # líneas completas (ganador), las líneas mixtas y la clave Zobrist en cada jugada.
+    bitboard = False
+
+    def __init__(self, size=3, win_length=None):
+        self.geometry = grid_geometry(size, win_length or size)
+        self.size = size
+        self.win_length = self.geometry.win_length
+        self.cell_count = self.geometry.cell_count
+        self.reset()
+
+    @classmethod
+    def from_tuple(cls, board_state, win_length=None):
+        state = cls(isqrt(len(board_state)), win_length)
+        for i, text in enumerate(board_state):
+            if text:
+                state.set(i, text)
+        return state
+
+    def reset(self):
+        line_count = len(self.geometry.lines)
+        self.cells = [''] * self.cell_count
+        self.x_counts = [0] * line_count
+        self.o_counts = [0] * line_count
+        self.x_lines = 0  # Líneas completas de cada jugador
+        self.o_lines = 0
+        self.mixed_lines = 0  # Líneas con marcas de ambos jugadores y al menos una casilla libre
+        self.filled = 0
+        self.zobrist = 0
+
+    def copy(self):
+        state = GridState.__new__(GridState)
+        state.__dict__.update(self.__dict__)
+        state.cells = self.cells[:]
+        state.x_counts = self.x_counts[:]
+        state.o_counts = self.o_counts[:]
+        return state
+
+    def get(self, index):
+        return self.cells[index]
+
+    def set(self, index, player):
+        # Un jugador vacío ('') limpia la casilla, igual que en GameState
+        previous = self.cells[index]
+        if previous == player:
+            return
+        if previous:
+            self._update(index, previous, -1)
+        if player:
+            self._update(index, player, 1)
+        self.cells[index] = player
+
+    def _update(self, index, player, delta):
+        k = self.win_length
+        counts = self.x_counts if player == 'X' else self.o_counts
+        others = self.o_counts if player == 'X' else self.x_counts
+        completed = 0
+        mixed = 0
+        for line_id in self.geometry.lines_through[index]:
+            before = counts[line_id]
+            after = before + delta
+            counts[line_id] = after
+            other = others[line_id]
+            if before == k or after == k:
+                completed += after - before
+            if other:
+                mixed += (0 < after and after + other < k) - (0 < before and before + other < k)
+        if player == 'X':
+            self.x_lines += completed
+        else:
+            self.o_lines += completed
+        self.mixed_lines += mixed
+        self.filled += delta
+        self.zobrist ^= self.geometry.zobrist[index][0 if player == 'X' else 1]
+
+    def is_empty(self, index):
+        return not self.cells[index]
+
+    def empty_indices(self):
+        return tuple([i for i, text in enumerate(self.cells) if not text])
+
+    def is_full(self):
+        return self.filled == self.cell_count
+
+    def winner(self):
+        if self.x_lines:
+            return 'X'
+        if self.o_lines:
+            return 'O'
+        return None
+
+    def is_draw(self):
+        return self.is_full() and self.winner() is None
+
+    def is_diagonal(self, index):
+        return index in self.geometry.diagonal_cells
+
+    def mixed_line_count(self):
+        return self.mixed_lines
+
+    def mixed_lines_through(self, index):
+        # Líneas que pasan por `index` con marcas de ambos jugadores y al menos una casilla libre
+        k = self.win_length
+        x_counts, o_counts = self.x_counts, self.o_counts
+        return sum(1 for line_id in self.geometry.lines_through[index]
+                   if x_counts[line_id] and o_counts[line_id] and x_counts[line_id] + o_counts[line_id] < k)
+
+    def encode(self):
+        return encode_state(self.cells)
+
+    def key(self):
+        # Igual a state_key(self.to_tuple()), pero sin recorrer el tablero en los tableros grandes
+        return self.encode() if self.cell_count == 9 else self.zobrist
+
+    def to_tuple(self):
+        return tuple(self.cells)
+
+
+def create_game_state(size=3, win_length=None):
+    # El 3x3 clásico usa las máscaras de bits de GameState; el resto, GridState
+    if size == 3 and (win_length or size) == 3:
+        return GameState()
+    return GridState(size, win_length)
@@ -0,0 +1,147 @@
+import json
+import os
+import tkinter as tk
+from collections import OrderedDict
+from tkinter import Label, Toplevel
+
+from PIL import Image, ImageTk
+
+from utilities import HISTORY_DIR, RECORDS_FILE
+
+THUMBNAIL_SIZE = (150, 150)
+
+
+def load_history_records(directory=HISTORY_DIR):
+    # Partidas más recientes primero. Las capturas antiguas sin registro aparecen sin valores Q.
+    records = []
+    recorded_images = set()
+    path = os.path.join(directory, RECORDS_FILE)
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # Línea incompleta, por ejemplo si se cerró el juego a media escritura
+                records.append(record)
+                if record.get('image'):
+                    recorded_images.add(record['image'])
+    if os.path.isdir(directory):
+        for filename in os.listdir(directory):
+            if filename.endswith('.png') and filename not in recorded_images:
+                records.append({'timestamp': filename[len('game_'):-len('.png')], 'image': filename,
+                                'q_values': None})
+    records.sort(key=lambda record: record.get('timestamp', ''), reverse=True)
+    return records
+
+
+class ThumbnailCache:
+    # Miniaturas en disco dentro de history/.thumbs. Una miniatura es válida mientras sea más
+    # reciente que su imagen original; se descartan las menos usadas al superar max_entries.
+
+    def __init__(self, directory=HISTORY_DIR, max_entries=500, size=THUMBNAIL_SIZE):
+        self.directory = directory
+        self.cache_dir = os.path.join(directory, '.thumbs')
+        self.max_entries = max_entries
+        self.size = size
+        self.entries = OrderedDict()  # nombre de la miniatura -> None, en orden de uso
+        if os.path.isdir(self.cache_dir):
+            names = os.listdir(self.cache_dir)
+            names.sort(key=lambda name: os.path.getatime(os.path.join(self.cache_dir, name)))
+            for name in names:
+                self.entries[name] = None
+
+    def get(self, image_name):
+        source = os.path.join(self.directory, image_name)
+        if not os.path.exists(source):
+            return None
+        thumb_path = os.path.join(self.cache_dir, image_name)
+        if not os.path.exists(thumb_path) or os.path.getmtime(thumb_path) < os.path.getmtime(source):
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with Image.open(source) as img:
+                img.thumbnail(self.size, Image.Resampling.LANCZOS)
+                img.save(thumb_path)
+        self.entries.pop(image_name, None)
+        self.entries[image_name] = None
+        self._evict()
+        return Image.open(thumb_path)
+
+    def _evict(self):
+        while len(self.entries) > self.max_entries:
+            name, _ = self.entries.popitem(last=False)
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+
+
+class HistoryViewer:
+    # Ventana de historial paginada: solo se decodifican las miniaturas de la página visible y
+    # solo se mantienen en memoria sus PhotoImage.
+
+    def __init__(self, master, directory=HISTORY_DIR, page_size=10):
+        self.records = load_history_records(directory)
+        self.cache = ThumbnailCache(directory)
+        self.page_size = page_size
+        self.page = 0
+
+        self.window = Toplevel(master)
+        self.window.title("Historial de Partidas")
+        self.rows_frame = tk.Frame(self.window)
+        self.rows_frame.pack(side="top", fill="both", expand=True)
+
+        controls = tk.Frame(self.window)
+        controls.pack(side="bottom", fill="x")
+        self.prev_button = tk.Button(controls, text="< Anterior", command=lambda: self.show_page(self.page - 1))
+        self.prev_button.pack(side="left", padx=10, pady=5)
+        self.page_label = Label(controls, text="")
+        self.page_label.pack(side="left", expand=True)
+        self.next_button = tk.Button(controls, text="Siguiente >", command=lambda: self.show_page(self.page + 1))
+        self.next_button.pack(side="right", padx=10, pady=5)
+
+        self.show_page(0)
+
+    def page_count(self):
+        return max(1, -(-len(self.records) // self.page_size))
+
+    def show_page(self, page):
+        self.page = min(max(page, 0), self.page_count() - 1)
+        for child in self.rows_frame.winfo_children():
+            child.destroy()  # Libera las PhotoImage de la página anterior
+
+        start = self.page * self.page_size
+        for row, record in enumerate(self.records[start:start + self.page_size]):
+            number = len(self.records) - start - row
+            photo = None
+            if record.get('image'):
+                thumbnail = self.cache.get(record['image'])
+                if thumbnail is not None:
+                    photo = ImageTk.PhotoImage(thumbnail)
+                    thumbnail.close()
+            label_image = Label(self.rows_frame, image=photo, text="" if photo else "Sin imagen")
+            label_image.image = photo  # Keep a reference!
+            label_image.grid(row=row, column=0, padx=10, pady=10)
+
+            label_q_values = Label(self.rows_frame, text=f"Partida {number}: {self.describe(record)}",
+                                   font=("Arial", 10), justify="left")
+            label_q_values.grid(row=row, column=1, sticky="w", padx=10)
+
+        self.page_label.config(text=f"Página {self.page + 1} de {self.page_count()} ({len(self.records)} partidas)")
+        self.prev_button.config(state="normal" if self.page > 0 else "disabled")
+        self.next_button.config(state="normal" if self.page < self.page_count() - 1 else "disabled")
+
+    @staticmethod
+    def describe(record):
+        winner = record.get('winner')
+        result = f"Ganador: {winner}" if winner else ("Empate" if 'winner' in record else "")
+        q_values = record.get('q_values')
+        if q_values is None:
+            q_values_text = "Q-values: no registrados"
+        elif not q_values:
+            q_values_text = "Q-values: sin decisiones de la máquina"
+        else:
+            q_values_text = "Q-values: " + ", ".join(f"{k}: {v:.2f}" for k, v in q_values.items())
+        return f"{result}\n{q_values_text}" if result else q_values_text
@@ -0,0 +1,242 @@
+import bisect
+import cProfile
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Métricas en memoria del proceso: contadores, valores instantáneos (gauges) e histogramas de
+# duraciones. Están apagadas por defecto; el código instrumentado revisa `metrics.enabled` antes
+# de medir, así que sin activarlas no se llama a perf_counter ni se toma ningún lock.
+PREFIX = 'tictactoe_'
+# Límites superiores de los buckets en segundos: de 1 µs a ~8 s, duplicando
+BUCKETS = tuple(1e-6 * 2 ** i for i in range(24))
+
+
+class Histogram:
+
+    def __init__(self, bounds=BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # El último bucket es +Inf
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        # Estimación por bucket: devuelve el límite superior del bucket que contiene el cuantil
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'mean': self.total / self.count if self.count else None,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+        }
+
+
+class Metrics:
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.gauge_callbacks = {}  # nombre -> función que se evalúa al exportar
+        self.histograms = {}
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+
+    def inc(self, name, amount=1):
+        if self.enabled:
+            with self.lock:
+                self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set_gauge(self, name, value):
+        if self.enabled:
+            self.gauges[name] = value
+
+    def register_gauge(self, name, callback):
+        self.gauge_callbacks[name] = callback
+
+    def observe(self, name, seconds):
+        if self.enabled:
+            with self.lock:
+                histogram = self.histograms.get(name)
+                if histogram is None:
+                    histogram = self.histograms[name] = Histogram()
+                histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def _gauge_values(self):
+        values = dict(self.gauges)
+        for name, callback in list(self.gauge_callbacks.items()):
+            try:
+                values[name] = callback()
+            except Exception as error:  # Un gauge roto no debe impedir exportar el resto
+                logger.warning("No se pudo leer el gauge %s: %s", name, error)
+        return values
+
+    def snapshot(self):
+        gauges = self._gauge_values()
+        with self.lock:
+            return {
+                'timestamp': time.time(),
+                'counters': dict(self.counters),
+                'gauges': gauges,
+                'histograms': {name: histogram.summary() for name, histogram in self.histograms.items()},
+            }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self):
+        # Formato de texto de exposición de Prometheus
+        gauges = self._gauge_values()
+        lines = []
+        with self.lock:
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE {PREFIX}{name} counter")
+                lines.append(f"{PREFIX}{name} {value}")
+            for name, value in sorted(gauges.items()):
+                if value is None:
+                    continue
+                lines.append(f"# TYPE {PREFIX}{name} gauge")
+                lines.append(f"{PREFIX}{name} {value}")
+            for name, histogram in sorted(self.histograms.items()):
+                lines.append(f"# TYPE {PREFIX}{name} histogram")
+                cumulative = 0
+                for bound, count in zip(histogram.bounds, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{PREFIX}{name}_bucket{{le="{bound:.6g}"}} {cumulative}')
+                lines.append(f'{PREFIX}{name}_bucket{{le="+Inf"}} {histogram.count}')
+                lines.append(f"{PREFIX}{name}_sum {histogram.total}")
+                lines.append(f"{PREFIX}{name}_count {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, path):
+        # .prom o .txt se escriben en formato Prometheus; cualquier otra extensión, en JSON.
+        # Se reemplaza el archivo de una vez para que quien lo lea nunca vea uno a medias.
+        text = self.to_prometheus() if path.endswith(('.prom', '.txt')) else self.to_json()
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(prefix='.metrics-', dir=directory)
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+
+
+metrics = Metrics()
+
+
+class MetricsReporter:
+    # Hilo que escribe las métricas en `path` cada `interval` segundos, y una última vez al parar
+
+    def __init__(self, path, interval=10.0, registry=None):
+        self.path = path
+        self.interval = interval
+        self.registry = registry or metrics
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='metrics-reporter', daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread.is_alive():
+            self.thread.join()
+        self._dump()
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self._dump()
+
+    def _dump(self):
+        try:
+            self.registry.dump(self.path)
+        except OSError as error:
+            logger.error("No se pudieron escribir las métricas en %s: %s", self.path, error)
+
+
+def track_q_store(get_q_store, registry=None):
+    # Registra gauges que leen la tabla Q vigente al exportar: estados, altura del árbol AVL y
+    # rotaciones acumuladas. Recibe una función para seguir al modelo aunque se reemplace; si
+    # devuelve None (modelo aún sin cargar) los gauges quedan vacíos.
+    registry = registry or metrics
+
+    def avl_tree():
+        return getattr(get_q_store(), 'avl_tree', None)
+
+    def states():
+        q_store = get_q_store()
+        return len(q_store) if q_store is not None else None
+
+    registry.register_gauge('q_store_states', states)
+    registry.register_gauge('avl_tree_height', lambda: avl_tree().get_height(avl_tree().root) if avl_tree() else None)
+    registry.register_gauge('avl_rotations', lambda: avl_tree().rotations if avl_tree() else None)
+
+
+@contextmanager
+def profiled(path):
+    # Perfil de cProfile del bloque (solo del hilo que lo ejecuta), guardado en `path` para
+    # abrirlo con pstats o snakeviz. Sin ruta no hace nada.
+    if not path:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        logger.info("Perfil guardado en %s", path)
@@ -1,89 +1,181 @@
-import tkinter as tk
-from tkinter import messagebox, Toplevel, ttk
-from avlNode import AVLNode
-import numpy as np
 import random
+import logging
+import queue
+import time
 
 from utilities import GameUtilities
+from gameState import SYMMETRIES, SYMMETRY_INVERSES, canonical_form, decode_state, encode_state
+from mcts import MonteCarloAgent
+from solver import perfect_play_table
+from threats import WIN_CELLS, WINNER, code_after_move, mixed_lines_after_move
+from instrumentation import metrics
+
+logger = logging.getLogger(__name__)
 
 class MachineIa:
 
     def __init__(self, boardContext):
         self.boardContext = boardContext
-        self.avl_tree = boardContext.avl_tree
+        self.compactor = None  # Compactor opcional que se avisa en cada inserción
+        self.canonical_keys = True  # Guarda las 8 simetrías de un estado bajo una sola clave
+        self.strategy = 'qlearning'  # 'qlearning', 'perfect' (solucionador exacto) o 'mcts'
+        self.mcts_time_budget = 0.5  # Segundos por jugada de la búsqueda Monte Carlo
+        self.mcts_iterations = None  # Límite de iteraciones por jugada (None: solo el tiempo)
+        self.mcts_agent = None  # Se crea en la primera jugada con 'mcts' y conserva su árbol
+        self.last_q_values = {}  # Valores Q del último estado en que decidió la máquina
+        self.game_recorder = None  # GameRecorder opcional que guarda cada partida en el registro
+        self.training_job = None  # TrainingJob en curso lanzado desde la interfaz
+        self.profile_path = None  # Si se define, train_model guarda ahí un perfil de cProfile
+        # Nivel de registro leído una vez: en las rutas de cada actualización ni siquiera se
+        # llama a logger.debug si el nivel DEBUG estaba apagado al crear la máquina
+        self.trace = logger.isEnabledFor(logging.DEBUG)
+        # Con un almacén que soporta apply_batch, las transiciones se acumulan y se aplican
+        # juntas cada batch_size actualizaciones en lugar de una por una
+        self.batch_updates = False
+        self.batch_size = 512
+        self.pending_updates = []
         self.gameUtilities = GameUtilities(boardContext)
+        self.epsilon = 0.1  # Probabilidad de exploración en block_opponent_win
+        self.exploration_rate = 0.05  # Probabilidad de movimiento aleatorio durante la explotación
+        self.gamma = 0.9  # Factor de descuento para los valores Q futuros
+        self.alpha = 1.0  # Tasa de aprendizaje; con 1 el valor Q se reemplaza por el objetivo
+        self.convergence = None  # Convergence opcional que recibe el |ΔQ| de cada actualización
+
+    @property
+    def q_store(self):
+        # Se consulta en el tablero cada vez para respetar la carga perezosa y los reemplazos
+        return self.boardContext.q_store
 
     def machine_move(self, pvpMode=False):
-        print("machine turn")
-        empty_indices = [i for i, btn in enumerate(self.boardContext.buttons) if btn['text'] == '']
+        logger.debug("machine turn")
+        empty_indices = list(self.boardContext.game_state.empty_indices())
         if empty_indices:
+            start = time.perf_counter() if metrics.enabled else 0
             current_state = self.boardContext.get_board_state()
-            chosen_index = self.block_opponent_win(empty_indices, current_state)
-            # Ejecuta el movimiento seleccionado para la máquina
+            if self.strategy == 'perfect' and len(current_state) == 9:  # El solucionador es solo del 3x3
+                chosen_index = perfect_play_table().choose_move(current_state, self.boardContext.turn)
+            elif self.strategy == 'mcts':
+                chosen_index = self.monte_carlo_agent().choose_move(self.boardContext.game_state,
+                                                                    self.boardContext.turn)
+            else:
+                chosen_index = self.block_opponent_win(empty_indices, current_state)
+            if metrics.enabled:
+                metrics.observe('move_decision_seconds', time.perf_counter() - start)
+                metrics.inc('machine_moves')
+            self.last_q_values = self.q_values_for(current_state)  # Se guardan con la partida
+            # Ejecuta el movimiento seleccionado para la máquina; execute_move ya actualiza los
+            # valores Q del estado previo a la jugada
             self.execute_move(chosen_index, 'O', pvpMode)
-            # Evaluar el resultado del movimiento después de que se ha ejecutado
-            reward, is_diagonal, blocked_opponent = self.evaluate_move_result(chosen_index)
-            # Actualizar los valores Q con la nueva información
-            self.update_q_values(current_state, chosen_index, reward, is_diagonal, blocked_opponent)
-            print("imprimiendo q values")
             # Verificar el estado del juego y cambiar el turno si es necesario
-            if not self.boardContext.winner() and '' in [btn['text'] for btn in self.boardContext.buttons]:
+            if not self.boardContext.winner() and not self.boardContext.game_state.is_full():
                 self.boardContext.turn = 'X'  # Devolver el turno al jugador humano
                 self.boardContext.update_scores()
-                print("devolviendo turno")
-            print("fin")
+                logger.debug("devolviendo turno")
+            logger.debug("fin")
+
 
 
+    def monte_carlo_agent(self):
+        # El agente se conserva entre jugadas para reutilizar su árbol; el presupuesto se lee
+        # en cada jugada para que los cambios de configuración se apliquen de inmediato
+        if self.mcts_agent is None:
+            self.mcts_agent = MonteCarloAgent()
+        self.mcts_agent.time_budget = self.mcts_time_budget
+        self.mcts_agent.iterations = self.mcts_iterations
+        return self.mcts_agent
 
     def execute_move(self, index, player, pvpMode=True):
-        if self.boardContext.buttons[index]['text'] == '' and self.boardContext.winner() is None:
-            self.boardContext.buttons[index]['text'] = player
-            self.boardContext.root.update_idletasks()  # Forzar actualización inmediata de la GUI
+        game_state = self.boardContext.game_state
+        if game_state.is_empty(index) and self.boardContext.winner() is None:
+            previous_state = self.boardContext.get_board_state()  # Estado en que se eligió la jugada
+            self.boardContext.place_mark(index, player)
+            self.boardContext.refresh_display()  # Forzar actualización inmediata de la GUI
 
             # Evaluar el resultado del movimiento después de que se ha ejecutado
             reward, is_diagonal, blocked_opponent = self.evaluate_move_result(index)
+            if self.game_recorder:
+                self.game_recorder.record_move(index, player, reward, is_diagonal, blocked_opponent)
 
-            # Actualizar los valores Q con la nueva información
-            current_state = self.boardContext.get_board_state()  # Obtener estado actual después del movimiento
-            self.update_q_values(current_state, index, reward, is_diagonal, blocked_opponent)
+            # Actualizar los valores Q del estado en que se decidió, con la acción que se tomó
+            self.update_q_values(previous_state, index, reward, is_diagonal, blocked_opponent)
 
             winner = self.boardContext.winner()
-            if winner or all(btn['text'] != '' for btn in self.boardContext.buttons):
+            if winner:
                 if pvpMode:
-                    self.boardContext.update_score(winner) if winner else None
-                    messagebox.showinfo("Juego Terminado", f"El ganador es {winner}!") if winner else None
-                    self.gameUtilities.save_screenshot() if winner else None
+                    from tkinter import messagebox  # Solo las partidas con interfaz muestran avisos
+
+                    self.boardContext.update_score(winner)
+                    messagebox.showinfo("Juego Terminado", f"El ganador es {winner}!")
+                    self.gameUtilities.save_game_record(winner)
+                if self.game_recorder:
+                    self.game_recorder.finish(winner)
                 self.boardContext.reset_game()
-                return  # Detener la ejecución si el juego ha terminado
-            elif '' not in [btn['text'] for btn in self.boardContext.buttons]:  # Comprobar si el tablero está lleno
+                return winner  # Detener la ejecución si el juego ha terminado
+            elif game_state.is_full():  # Comprobar si el tablero está lleno
                 if pvpMode:
+                    from tkinter import messagebox
+
                     self.boardContext.draws += 1
                     messagebox.showinfo("Juego Terminado", "¡Es un empate!")
-                    self.gameUtilities.save_screenshot()
+                    self.gameUtilities.save_game_record()
+                if self.game_recorder:
+                    self.game_recorder.finish('draw')
                 self.boardContext.reset_game()
+                return 'draw'
             else:
                 # Cambia el turno al jugador humano si es PvP
                 if pvpMode:
                     self.boardContext.turn = 'X'
                     self.boardContext.update_scores()
 
-    def update_q_values(self, state, action_index, reward, is_diagonal_move=False, blocked_opponent=False, gamma=0.9):
-        # Busca el nodo con el estado actual del tablero
-        node = self.avl_tree.search(self.avl_tree.root, state)
-        
-        # Si no existe un nodo, entonces crea uno nuevo y lo inicializa con valores Q
+    def canonical_key(self, state):
+        # Devuelve la clave con la que se guarda el estado y la simetría usada para obtenerla
+        if not self.canonical_keys or len(state) != 9:  # Las simetrías son las del 3x3
+            return state, 0
+        return canonical_form(state)
+
+    def q_values_for(self, state):
+        # Valores Q del estado con los índices del tablero original (no los canónicos)
+        self.flush_updates()
+        key, symmetry = self.canonical_key(state)
+        node = self._get_entry(key)
         if not node:
-            new_q_values = {i: 0 for i in range(9) if self.boardContext.buttons[i]['text'] == ''}
-            node = AVLNode(state, new_q_values)
-            self.avl_tree.root = self.avl_tree.insert(self.avl_tree.root, state, new_q_values)
-            node.value_q[action_index] = reward  # Se brinda una recompensa inicial
-            
+            return {}
+        if not symmetry:
+            return dict(node.value_q)
+        perm = SYMMETRIES[symmetry]
+        return {perm[action]: q for action, q in node.value_q.items()}
+
+    def update_q_values(self, state, action_index, reward, is_diagonal_move=False, blocked_opponent=False, gamma=None):
+        gamma = self.gamma if gamma is None else gamma
+        # Traduce el estado y la acción al marco de la forma canónica
+        state, symmetry = self.canonical_key(state)
+        if symmetry:
+            action_index = SYMMETRY_INVERSES[symmetry][action_index]
+
         # Calcula la recompensa, premiando si son movimientos dificiles de bloquear
         adjusted_reward = reward
         if is_diagonal_move:
             adjusted_reward += 0.5
         if blocked_opponent:
             adjusted_reward += 0.3
+
+        if self.batch_updates and hasattr(self.q_store, 'apply_batch'):
+            self.pending_updates.append((encode_state(state), action_index, reward, adjusted_reward, gamma,
+                                         self.alpha))
+            if len(self.pending_updates) >= self.batch_size:
+                self.flush_updates()
+            return
+
+        # Busca el nodo con el estado actual del tablero
+        node = self._get_entry(state)
+        
+        # Si no existe un nodo, entonces crea uno nuevo y lo inicializa con valores Q
+        inserted = not node
+        if inserted:
+            new_q_values = {i: 0 for i, text in enumerate(state) if text == ''}
+            node = self._insert_entry(state, new_q_values)
+            node.value_q[action_index] = reward  # Se brinda una recompensa inicial
         
         # Calcula el mejor valor Q futuro para este estado
         if node.value_q:
@@ -91,42 +183,101 @@ class MachineIa:
         else:
             future_q = 0
         
-        # Actualiza el valor q, usando la formula de recompensas para valores Q
-        updated_q = adjusted_reward + gamma * future_q
-        print(updated_q)
+        # Actualiza el valor q, usando la formula de recompensas para valores Q; con alpha < 1
+        # solo se avanza esa fracción desde el valor anterior hacia el objetivo
+        target = adjusted_reward + gamma * future_q
+        previous_q = node.value_q.get(action_index, 0)
+        updated_q = target if self.alpha == 1 else previous_q + self.alpha * (target - previous_q)
+        if self.trace:
+            logger.debug("updated q %s", updated_q)
         # Actualiza el valor del nodo en base al valor q actualizado
         node.value_q[action_index] = updated_q
-
+        node.visits += 1
+        self.q_store.touch(node)
+        if self.convergence is not None:
+            self.convergence.record(state, abs(updated_q - previous_q))
+        # La compactación corre al final: el nodo ya tiene su recompensa y su visita, y no se
+        # vuelve a escribir (el AVL puede mover otro estado a ese nodo al borrar)
+        if inserted and self.compactor:
+            self.compactor.on_insert(keep=state)
+
+
+    def _get_entry(self, key):
+        # Búsqueda en la tabla Q; con las métricas activas cuenta y mide cada consulta
+        if not metrics.enabled:
+            return self.q_store.get(key)
+        start = time.perf_counter()
+        node = self.q_store.get(key)
+        metrics.observe('q_store_lookup_seconds', time.perf_counter() - start)
+        metrics.inc('q_store_lookups')
+        return node
+
+    def _insert_entry(self, key, value_q):
+        if not metrics.enabled:
+            return self.q_store.insert(key, value_q)
+        start = time.perf_counter()
+        node = self.q_store.insert(key, value_q)
+        metrics.observe('q_store_insert_seconds', time.perf_counter() - start)
+        metrics.inc('q_store_inserts')
+        return node
+
+    def flush_updates(self):
+        # Aplica en una sola operación vectorizada las transiciones acumuladas
+        if not self.pending_updates:
+            return
+        # gamma y alpha van por transición: el calendario de alpha cambia entre episodios
+        codes, actions, rewards, adjusted_rewards, gammas, alphas = zip(*self.pending_updates)
+        self.pending_updates = []
+        deltas = self.q_store.apply_batch(codes, actions, rewards, adjusted_rewards, gammas, alphas)
+        if self.convergence is not None:
+            self.convergence.record_batch([decode_state(code) for code in codes], deltas)
 
     def block_opponent_win(self, empty_indices, current_state):
         current_player = self.boardContext.turn
         opponent = 'X' if current_player == 'O' else 'O'
+        game_state = self.boardContext.game_state
+
+        if game_state.bitboard:
+            # 3x3: las casillas ganadoras de cada jugador salen de la tabla, sin simular jugadas
+            code = game_state.encode()
+            winning = WIN_CELLS[current_player][code]
+            if winning:
+                logger.debug("Machine detect a winning move")
+                return winning[0]
+            blocking = WIN_CELLS[opponent][code]
+            if blocking:
+                logger.debug("Machine detect a loss possibility")
+                return blocking[0]
+            return self.explore_or_exploit(empty_indices, current_state)
+
+        # Tableros mayores: simula sobre una copia del estado, los botones nunca ven las jugadas de prueba
+        game_state = game_state.copy()
 
         # Primero, intenta ganar
         for index in empty_indices:
-            self.boardContext.buttons[index]['text'] = current_player  # Simula el movimiento del jugador actual
-            if self.boardContext.winner() == current_player:
-                self.boardContext.buttons[index]['text'] = ''  # Limpia la simulación
-                print("Machine detect a winning move")
+            game_state.set(index, current_player)  # Simula el movimiento del jugador actual
+            if game_state.winner() == current_player:
+                logger.debug("Machine detect a winning move")
                 return index  # Devuelve este índice para hacer la jugada ganadora
-            self.boardContext.buttons[index]['text'] = ''  # Limpia la simulación
+            game_state.set(index, '')  # Limpia la simulación
 
         # Si no puede ganar, intenta bloquear al oponente
         for index in empty_indices:
-            self.boardContext.buttons[index]['text'] = opponent  # Simula el movimiento del oponente
-            if self.boardContext.winner() == opponent:
-                print("Machine detect a loss possibility")
-                self.boardContext.buttons[index]['text'] = ''  # Limpia la simulación
+            game_state.set(index, opponent)  # Simula el movimiento del oponente
+            if game_state.winner() == opponent:
+                logger.debug("Machine detect a loss possibility")
                 return index  # Devuelve este índice para bloquear la jugada ganadora
-            self.boardContext.buttons[index]['text'] = ''  # Limpia la simulación
+            game_state.set(index, '')  # Limpia la simulación
+
+        return self.explore_or_exploit(empty_indices, current_state)
 
-        epsilon = 0.1  # Probabilidad de exploración
-        if np.random.random() < epsilon:
-            print("machine exploration")
+    def explore_or_exploit(self, empty_indices, current_state):
+        if random.random() < self.epsilon:
+            logger.debug("machine exploration")
             return random.choice(empty_indices)  # Exploración: movimiento aleatorio
         else:
             # Si no hay jugada de bloqueo necesaria, explotar basado en Q-values
-            print("machine explote")
+            logger.debug("machine explote")
             return self.choose_best_move(current_state, empty_indices)
         
 
@@ -135,24 +286,52 @@ class MachineIa:
     def evaluate_diagonal(self, state, index):
         # Esta función debería evaluar si el movimiento es diagonal y si bloquea al oponente
         # Implementación específica dependiendo de cómo defines un movimiento diagonal y bloqueo
-        is_diagonal = index in [0, 2, 4, 6, 8]  # Índices de las posiciones diagonales en un tablero 3x3
+        is_diagonal = self.boardContext.game_state.is_diagonal(index)  # Esquinas y centro en el 3x3
         blocked_opponent = False  # Evaluar si este movimiento bloquea al oponente
         return is_diagonal, blocked_opponent
 
     def choose_best_move(self, state, possible_moves):
-        node = self.avl_tree.search(self.avl_tree.root, state)
+        key, symmetry = self.canonical_key(state)
+        if hasattr(self.q_store, 'greedy_mask'):
+            return self._choose_from_mask(key, symmetry, possible_moves)
+        node = self._get_entry(key)
         if node and node.value_q:
             # Incorporar una pequeña probabilidad de elegir un movimiento aleatorio incluso durante la explotación
-            if np.random.random() < 0.05:  # 5% de probabilidad de movimiento aleatorio
+            if random.random() < self.exploration_rate:  # 5% por defecto de movimiento aleatorio
                 return random.choice(possible_moves)
 
-            # Elegir el índice con el máximo valor Q entre los posibles movimientos
-            max_q_value = max(node.value_q.get(index, 0) for index in possible_moves)
-            best_moves = [index for index in possible_moves if node.value_q.get(index, 0) == max_q_value]
-            print("machine choose a best movement")
+            # Elegir el índice con el máximo valor Q entre los posibles movimientos, leyendo
+            # cada movimiento en el marco canónico
+            value_q = node.value_q
+            if symmetry:
+                inverse = SYMMETRY_INVERSES[symmetry]
+                move_values = [value_q.get(inverse[index], 0) for index in possible_moves]
+            else:
+                move_values = [value_q.get(index, 0) for index in possible_moves]
+            max_q_value = max(move_values)
+            best_moves = [index for index, q in zip(possible_moves, move_values) if q == max_q_value]
+            if self.trace:
+                logger.debug("machine choose a best movement")
             return random.choice(best_moves)  # Para evitar sesgos si hay múltiples mejores movimientos
         return random.choice(possible_moves)
 
+    def _choose_from_mask(self, key, symmetry, possible_moves):
+        # Misma elección que choose_best_move con un almacén que ya tiene calculadas las mejores
+        # acciones de cada estado como máscara de bits (ArrayQStore)
+        mask = self.q_store.greedy_mask(key)
+        if not mask:
+            return random.choice(possible_moves)
+        if random.random() < self.exploration_rate:
+            return random.choice(possible_moves)
+        if symmetry:
+            inverse = SYMMETRY_INVERSES[symmetry]
+            best_moves = [index for index in possible_moves if mask >> inverse[index] & 1]
+        else:
+            best_moves = [index for index in possible_moves if mask >> index & 1]
+        if self.trace:
+            logger.debug("machine choose a best movement")
+        return random.choice(best_moves)
+
 
     def evaluate_move_result(self, index):
         # Establece recompensas base
@@ -160,93 +339,142 @@ class MachineIa:
         is_diagonal = False
         blocked_opponent = False
 
-        # Verifica si el movimiento es diagonal
-        is_diagonal = index in [0, 2, 4, 6, 8]
+        game_state = self.boardContext.game_state
 
-        # Guarda el estado original del botón para restaurarlo después de la evaluación
-        original_text = self.boardContext.buttons[index]['text']
+        # Verifica si el movimiento es diagonal
+        is_diagonal = game_state.is_diagonal(index)
 
-        # Actualiza el tablero temporalmente para la evaluación
-        self.boardContext.buttons[index]['text'] = self.boardContext.turn
-        winner = self.boardContext.winner()
+        if game_state.bitboard:
+            # 3x3: ganador del estado resultante leído de la tabla y líneas mixtas con máscaras
+            code = code_after_move(game_state, index, self.boardContext.turn)
+            winner = WINNER[code]
+            mixed_lines = 0 if winner else mixed_lines_after_move(game_state, index, self.boardContext.turn)
+        else:
+            # Evalúa sobre una copia del estado para no tocar el tablero real
+            game_state = game_state.copy()
+            game_state.set(index, self.boardContext.turn)
+            winner = game_state.winner()
+            mixed_lines = game_state.mixed_lines_through(index)
 
         if winner:
             # Si el jugador actual gana con este movimiento
             reward = 1 if winner == self.boardContext.turn else -1
         else:
-            # Evaluar si el movimiento bloquea al oponente
-            opponent = 'X' if self.boardContext.turn == 'O' else 'O'
-            for a, b, c in [(0, 1, 2), (3, 4, 5), (6, 7, 8),
-                            (0, 3, 6), (1, 4, 7), (2, 5, 8),
-                            (0, 4, 8), (2, 4, 6)]:
-                if {self.boardContext.buttons[a]['text'], self.boardContext.buttons[b]['text'], self.boardContext.buttons[c]['text']} == {opponent, self.boardContext.turn, ''}:
-                    blocked_opponent = True
-                    reward += 0.3  # Agrega una recompensa pequeña por bloquear una jugada ganadora
-
-        # Restaura el estado original del tablero
-        self.boardContext.buttons[index]['text'] = original_text
+            # Evaluar si el movimiento bloquea al oponente: cada línea que pasa por la jugada con
+            # marcas de ambos jugadores y casillas libres suma una recompensa pequeña, así la
+            # escala no crece con el tamaño del tablero
+            if mixed_lines:
+                blocked_opponent = True
+                reward += 0.3 * mixed_lines
 
         return reward, is_diagonal, blocked_opponent
     
 
     def train_model(self, N=100):
-        self.boardContext.reset_game(False)
+        import tkinter as tk  # La ventana de progreso es lo único de la IA que necesita Tk
+        from tkinter import Toplevel, messagebox, ttk
+        from trainingJob import TrainingJob  # trainingJob importa este módulo
+
+        if self.training_job and self.training_job.is_running():
+            messagebox.showinfo("Entrenamiento", "Ya hay un entrenamiento en curso.")
+            return
+        root = self.boardContext.root
+        job = TrainingJob(self, N, profile_path=self.profile_path)
+        self.training_job = job
+
         training_window = Toplevel()
         training_window.title("Training in Progress")
-        ttk.Label(training_window, text="Training... Please wait").pack(padx=10, pady=10)
+        status_label = ttk.Label(training_window, text="Training... You can keep playing")
+        status_label.pack(padx=10, pady=10)
 
         progress = ttk.Progressbar(training_window, orient="horizontal", length=200, mode='determinate')
         progress.pack(padx=10, pady=10)
-        training_window.pack_slaves()
-
-        def update_progress_bar(current, total):
-            progress['value'] = (current / total) * 100
-            self.boardContext.root.update_idletasks()
-
-        def train():
-            use_x = True
-            best_q_value_before = self.get_best_q_value()  # Obtiene el mejor valor Q antes del entrenamiento
-            for i in range(N):
-                self.boardContext.root.after(500, self.simulate_game(use_x))                
-                use_x = not use_x
-                update_progress_bar(i + 1, N)
+        stats_label = ttk.Label(training_window, text="", justify="left")
+        stats_label.pack(padx=10, pady=5)
+
+        def cancel():
+            # Cancelación cooperativa: el hilo termina la partida en curso y avisa por la cola
+            job.cancel()
+            cancel_button.config(state="disabled")
+            status_label.config(text="Cancelando...")
+
+        def show_stats(stats):
+            progress['value'] = (stats['done'] / stats['total']) * 100
+            stats_label.config(text=f"{stats['done']}/{stats['total']} juegos, {stats['games_per_sec']:.0f} juegos/s\n"
+                                    f"Gana X: {stats['x_rate']:.0%}  Gana O: {stats['o_rate']:.0%}  "
+                                    f"Empates: {stats['draw_rate']:.0%}\n"
+                                    f"Cambio del mejor valor Q: {stats['q_delta']:+.2f}  Estados: {stats['states']}"
+                                    + (f"\nRotación de la política: {stats['churn']:.1%}" if stats['churn'] is not None else ""))
+
+        def finish(kind, data):
             training_window.destroy()
-
-            best_q_value_after = self.get_best_q_value()  # Obtiene el mejor valor Q después del entrenamiento
-            improvement = best_q_value_after - best_q_value_before
-            messagebox.showinfo("Entrenamiento Completo", f"Entrenamiento completado. Mejora del valor Q: {improvement:.2f}")
-
-        tk.Button(training_window, text="Cancel", command=training_window.destroy).pack(padx=10, pady=10)
-
-        self.boardContext.root.after(100, train)
+            if kind != 'done':
+                job.q_store.close()  # La copia se descarta (la tabla compartida recibe lo pendiente)
+            if kind == 'done':
+                self.flush_updates()  # Lo pendiente pertenece al modelo que se reemplaza
+                self.boardContext.set_q_store(job.q_store)  # Las jugadas siguientes ya usan el modelo nuevo
+                self.boardContext.save_model()  # Guarda el modelo entrenado para el próximo inicio
+                converged = (f"\nLa política se estabilizó tras {data['done']} de {data['total']} juegos."
+                             if data['stopped_early'] else "")
+                messagebox.showinfo("Entrenamiento Completo",
+                                    f"Entrenamiento completado. Mejora del valor Q: {data['q_delta']:.2f}{converged}")
+            elif kind == 'cancelled':
+                messagebox.showinfo("Entrenamiento cancelado",
+                                    f"Se detuvo tras {data['done']} juegos; el modelo en uso no cambió.")
+            else:
+                messagebox.showerror("Error", f"El entrenamiento falló: {data}")
+
+        def poll():
+            # Lee los mensajes del hilo sin bloquear el ciclo de eventos de Tk
+            while True:
+                try:
+                    kind, data = job.messages.get_nowait()
+                except queue.Empty:
+                    break
+                if kind == 'progress':
+                    show_stats(data)
+                else:
+                    finish(kind, data)
+                    return
+            root.after(100, poll)
+
+        cancel_button = tk.Button(training_window, text="Cancel", command=cancel)
+        cancel_button.pack(padx=10, pady=10)
+        training_window.protocol("WM_DELETE_WINDOW", cancel)
+
+        job.start()
+        root.after(100, poll)
 
     def simulate_game(self, use_x):
         self.boardContext.reset_game(silent=True)  # Asegurarse de no reiniciar el árbol AVL
         self.boardContext.turn = 'X' if use_x else 'O'
         move_count = 0  # Contador para verificar cantidad de movimientos y prevenir bucle infinito
+        result = None
 
-        while move_count < 9:  # Hay un máximo de 9 movimientos en un tablero 3x3
+        max_moves = self.boardContext.game_state.cell_count  # Una jugada por casilla como máximo
+        while move_count < max_moves:
             current_state = self.boardContext.get_board_state()
-            empty_indices = [i for i, btn in enumerate(self.boardContext.buttons) if btn['text'] == '']
+            empty_indices = list(self.boardContext.game_state.empty_indices())
             if not empty_indices:
                 break  # Salir si no hay casillas vacías
 
             move_index = self.choose_best_move(current_state, empty_indices)
-            self.execute_move(move_index, self.boardContext.turn, False)
-
-            winner = self.boardContext.winner()
-            if winner or '' not in [btn['text'] for btn in self.boardContext.buttons]:
+            # execute_move reinicia el tablero al terminar, por eso se usa su resultado
+            result = self.execute_move(move_index, self.boardContext.turn, False)
+            if result:
                 break  # Salir si hay un ganador o no quedan movimientos
 
             self.boardContext.turn = 'O' if self.boardContext.turn == 'X' else 'X'  # Alternar turno
             move_count += 1
 
         self.boardContext.reset_game(silent=True)  # Reiniciar el juego de forma silenciosa para la siguiente simulación
+        return result  # 'X', 'O', 'draw' o None si se agotaron los movimientos
 
 
     def get_best_q_value(self):
-        
-        all_values = [node.value_q for node in self.avl_tree.get_all_nodes() if node.value_q]
-        if not all_values:  # Comprobar si la lista está vacía
-            return 0  # O el valor por defecto que consideres apropiado
-        return max(max(values.values()) for values in all_values if values)
\ No newline at end of file
+        self.flush_updates()
+        if hasattr(self.q_store, 'best_q_value'):
+            return self.q_store.best_q_value()  # Máximo vectorizado sobre la matriz Q
+        # Recorre las entradas como generador, sin armar una lista con todos los nodos
+        # Si la tabla está vacía devuelve 0
+        return max((max(node.value_q.values()) for node in self.q_store.entries() if node.value_q), default=0)
\ No newline at end of file
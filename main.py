@@ -1,13 +1,53 @@
+import argparse
+import logging
+
 from board import BoardManager
+from instrumentation import MetricsReporter, metrics, track_q_store
 
 
 class TicTacToeApp:
-    def __init__(self):
-        self.board = BoardManager()    
+    def __init__(self, size=3, win_length=None, profile_path=None, strategy='qlearning', mcts_time=0.5,
+                 mcts_iterations=None, shared_store=None):
+        self.board = BoardManager(size, win_length, shared_store)
         self.board.reset_game(False)
         self.board.create_widgets()
         self.board.create_menu()
+        self.board.machineIa.profile_path = profile_path
+        self.board.machineIa.mcts_time_budget = mcts_time
+        self.board.machineIa.mcts_iterations = mcts_iterations
+        self.board.strategy.set(strategy)
+        self.board.change_strategy()
+        if metrics.enabled:
+            track_q_store(lambda: self.board.loaded_q_store)
         self.board.root.mainloop()
+        self.board.close_model()
 
 if __name__ == "__main__":
-    app = TicTacToeApp()
+    parser = argparse.ArgumentParser(description="Juego de Totito")
+    parser.add_argument('--size', type=int, default=3, help="Lado del tablero (N x N)")
+    parser.add_argument('--win-length', type=int, default=None,
+                        help="Marcas seguidas necesarias para ganar (por defecto, el lado del tablero)")
+    parser.add_argument('--strategy', default='qlearning', choices=('qlearning', 'perfect', 'mcts'),
+                        help="Estrategia de la máquina (perfect solo en el 3x3)")
+    parser.add_argument('--mcts-time', type=float, default=0.5, help="Segundos por jugada con --strategy mcts")
+    parser.add_argument('--mcts-iterations', type=int, default=None,
+                        help="Iteraciones por jugada con --strategy mcts (además del límite de tiempo)")
+    parser.add_argument('--shared-store', default=None,
+                        help="Tabla Q compartida con otros clientes: archivo SQLite, mongodb://... o memory://")
+    parser.add_argument('--metrics', default=None,
+                        help="Activa las métricas y las escribe en este archivo (.prom para Prometheus, si no JSON)")
+    parser.add_argument('--metrics-interval', type=float, default=10.0, help="Segundos entre escrituras de métricas")
+    parser.add_argument('--profile', default=None, help="Guarda un perfil de cProfile de cada entrenamiento")
+    parser.add_argument('--log-level', default='WARNING', choices=('DEBUG', 'INFO', 'WARNING', 'ERROR'))
+    args = parser.parse_args()
+    if args.strategy == 'perfect' and (args.size, args.win_length or args.size) != (3, 3):
+        parser.error("--strategy perfect solo está disponible en el tablero 3x3")
+    logging.basicConfig(level=args.log_level)
+    reporter = None
+    if args.metrics:
+        metrics.enable()
+        reporter = MetricsReporter(args.metrics, args.metrics_interval).start()
+    app = TicTacToeApp(args.size, args.win_length, args.profile, args.strategy, args.mcts_time,
+                       args.mcts_iterations, args.shared_store)
+    if reporter:
+        reporter.stop()
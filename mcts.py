@@ -0,0 +1,168 @@
+import math
+import random
+import time
+
+from gameState import EMPTY_INDICES, FULL_MASK, O_MASK_CODES, X_MASK_CODES
+from instrumentation import metrics
+from threats import WIN_CELLS, opponent_of
+
+# Búsqueda de árbol Monte Carlo (UCT) con límite de tiempo o de iteraciones por jugada. No
+# necesita tabla Q, así que sirve en tableros grandes donde el espacio de estados no cabe en
+# memoria. Cada iteración baja por el árbol con UCB1, agrega un nodo y termina la partida con
+# jugadas al azar; el resultado se propaga hacia la raíz. Al agotarse el presupuesto se juega
+# la casilla más visitada de la raíz.
+
+
+class MCTSNode:
+    __slots__ = ('move', 'player', 'parent', 'children', 'untried', 'visits', 'value', 'key', 'result')
+
+    def __init__(self, move, player, parent, key, untried, result):
+        self.move = move  # Casilla jugada para llegar a este nodo
+        self.player = player  # Quien jugó `move`; el siguiente en mover es su rival
+        self.parent = parent
+        self.children = {}  # casilla -> MCTSNode
+        self.untried = untried  # Casillas aún sin nodo, en orden aleatorio
+        self.visits = 0
+        self.value = 0.0  # Suma de resultados desde el punto de vista de `player` (1, 0.5 o 0)
+        self.key = key  # Clave del estado (GameState.key / GridState.key) para reusar el árbol
+        self.result = result  # 'X', 'O' o 'draw' si el estado es terminal; None si no
+
+    def best_child(self, exploration):
+        log_visits = math.log(self.visits)
+        best = None
+        best_score = -1.0
+        for child in self.children.values():
+            score = child.value / child.visits + exploration * math.sqrt(log_visits / child.visits)
+            if score > best_score:
+                best, best_score = child, score
+        return best
+
+
+def _result(game_state):
+    winner = game_state.winner()
+    if winner:
+        return winner
+    return 'draw' if game_state.is_full() else None
+
+
+def _rollout_bitboard(x_mask, o_mask, player, rng):
+    # Partida rápida sobre las máscaras del 3x3: gana si puede, bloquea si debe y si no juega al
+    # azar. Las casillas ganadoras salen de las tablas de threats.py.
+    while True:
+        occupied = x_mask | o_mask
+        if occupied == FULL_MASK:
+            return 'draw'
+        code = X_MASK_CODES[x_mask] + O_MASK_CODES[o_mask]
+        if WIN_CELLS[player][code]:
+            return player
+        cells = WIN_CELLS[opponent_of(player)][code] or EMPTY_INDICES[occupied]
+        bit = 1 << rng.choice(cells)
+        if player == 'X':
+            x_mask |= bit
+            player = 'O'
+        else:
+            o_mask |= bit
+            player = 'X'
+
+
+def _rollout(game_state, player, rng):
+    if game_state.bitboard:
+        return _rollout_bitboard(game_state.x_mask, game_state.o_mask, player, rng)
+    # Tableros mayores: casillas libres al azar hasta que alguien gana o se llena el tablero
+    empties = list(game_state.empty_indices())
+    rng.shuffle(empties)
+    for index in empties:
+        game_state.set(index, player)
+        if game_state.winner():
+            return player
+        player = opponent_of(player)
+    return 'draw'
+
+
+class MonteCarloAgent:
+    # Conserva el árbol entre jugadas de la misma partida: en la siguiente consulta busca el
+    # estado nuevo entre los hijos y nietos de la raíz anterior (la jugada propia y la respuesta
+    # del rival) y sigue desde ahí con las estadísticas acumuladas.
+
+    def __init__(self, time_budget=0.5, iterations=None, exploration=math.sqrt(2), seed=None):
+        self.time_budget = time_budget  # Segundos por jugada (None: sin límite de tiempo)
+        self.iterations = iterations  # Iteraciones por jugada (None: sin límite de iteraciones)
+        self.exploration = exploration
+        self.rng = random.Random(seed)
+        self.root = None
+        self.last_search = {}  # iterations, seconds, reused (visitas heredadas) de la última jugada
+
+    def reset(self):
+        self.root = None
+
+    def _new_node(self, move, player, parent, game_state):
+        result = _result(game_state)
+        untried = [] if result else list(game_state.empty_indices())
+        self.rng.shuffle(untried)
+        return MCTSNode(move, player, parent, game_state.key(), untried, result)
+
+    def _find_root(self, game_state, player):
+        # Reutiliza el subárbol del estado actual si la búsqueda anterior ya lo había explorado
+        key = game_state.key()
+        previous = opponent_of(player)
+        if self.root is not None:
+            candidates = [self.root]
+            for child in self.root.children.values():
+                candidates.append(child)
+                candidates.extend(child.children.values())
+            for node in candidates:
+                if node.key == key and node.player == previous:
+                    node.parent = None  # Libera el resto del árbol anterior
+                    return node
+        return self._new_node(None, previous, None, game_state)
+
+    def choose_move(self, game_state, player):
+        empties = game_state.empty_indices()
+        if len(empties) == 1:
+            return empties[0]
+        root = self._find_root(game_state, player)
+        self.root = root
+        reused = root.visits
+        start = time.perf_counter()
+        deadline = start + self.time_budget if self.time_budget is not None else None
+        done = 0
+        while True:
+            self._iterate(root, game_state)
+            done += 1
+            if self.iterations is not None and done >= self.iterations:
+                break
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            if self.iterations is None and deadline is None:
+                break  # Sin presupuesto se hace una sola iteración
+        self.last_search = {'iterations': done, 'seconds': time.perf_counter() - start, 'reused': reused}
+        metrics.inc('mcts_iterations', done)
+        if not root.children:
+            return self.rng.choice(empties)
+        return max(root.children.values(), key=lambda child: child.visits).move
+
+    def _iterate(self, root, game_state):
+        node = root
+        state = game_state.copy()
+        # Selección: baja por los nodos ya expandidos por completo
+        while not node.untried and node.children:
+            node = node.best_child(self.exploration)
+            state.set(node.move, node.player)
+        # Expansión: agrega un hijo con una casilla todavía no probada
+        if node.untried:
+            move = node.untried.pop()
+            player = opponent_of(node.player)
+            state.set(move, player)
+            child = self._new_node(move, player, node, state)
+            node.children[move] = child
+            node = child
+        # Simulación
+        result = node.result or _rollout(state, opponent_of(node.player), self.rng)
+        # Retropropagación
+        while node is not None:
+            node.visits += 1
+            if result == node.player:
+                node.value += 1.0
+            elif result == 'draw':
+                node.value += 0.5
+            node = node.parent
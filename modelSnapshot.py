@@ -0,0 +1,98 @@
+import math
+import mmap
+import os
+import struct
+import tempfile
+
+from gameState import decode_state, encode_state
+
+# Formato binario de la tabla Q:
+#   cabecera: magic 'TTTQ', versión (uint16), opciones (uint16), número de registros (uint32)
+#   registro: código base 3 del estado (uint16), visitas (uint32), 9 valores Q (float32)
+# Las acciones sin valor Q se guardan como NaN. Los registros van ordenados por código, que es
+# el mismo orden que el de las tuplas en el árbol AVL, y tienen ancho fijo para poder leerse
+# directamente desde un mmap.
+# Opciones: FLAG_RAW_KEYS indica que los estados se guardaron tal cual (entrenamiento con
+# --no-symmetry) en lugar de en su forma canónica. Los modelos anteriores tienen 0 en ese campo,
+# que es justamente el formato canónico.
+MAGIC = b'TTTQ'
+VERSION = 1
+FLAG_RAW_KEYS = 1
+KNOWN_FLAGS = FLAG_RAW_KEYS
+HEADER = struct.Struct('<4sHHI')
+RECORD = struct.Struct('<HI9f')
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def save_snapshot(q_store, path, canonical_keys=True):
+    # Escribe en un archivo temporal del mismo directorio y luego lo renombra, de modo que
+    # quien lea `path` siempre ve un modelo completo (el anterior o el nuevo)
+    records = []
+    for entry in q_store.entries():
+        values = [math.nan] * 9
+        for action, q in entry.value_q.items():
+            values[action] = q
+        records.append((encode_state(entry.board_state), entry.visits, values))
+    records.sort(key=lambda record: record[0])
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.snapshot-', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            flags = 0 if canonical_keys else FLAG_RAW_KEYS
+            f.write(HEADER.pack(MAGIC, VERSION, flags, len(records)))
+            for code, visits, values in records:
+                f.write(RECORD.pack(code, min(visits, 0xFFFFFFFF), *values))
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)  # mkstemp crea el archivo con permisos 0600
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return len(records)
+
+
+def _check_header(path, header):
+    magic, version, flags, count = header
+    if magic != MAGIC or version != VERSION:
+        raise SnapshotError(f"{path} no es un modelo válido (versión {version})")
+    if flags & ~KNOWN_FLAGS:
+        raise SnapshotError(f"{path} usa opciones desconocidas ({flags:#x})")
+    return flags, count
+
+
+def snapshot_canonical_keys(path):
+    # True si los estados del modelo están en forma canónica (las 8 simetrías bajo una clave)
+    with open(path, 'rb') as f:
+        data = f.read(HEADER.size)
+    if len(data) < HEADER.size:
+        raise SnapshotError(f"{path} no es un modelo válido")
+    flags, _ = _check_header(path, HEADER.unpack(data))
+    return not flags & FLAG_RAW_KEYS
+
+
+def iter_snapshot(path):
+    # Genera (board_state, value_q, visits) en orden, leyendo los registros desde un mmap
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < HEADER.size:
+            raise SnapshotError(f"{path} no es un modelo válido")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            _, count = _check_header(path, HEADER.unpack_from(data, 0))
+            if size != HEADER.size + count * RECORD.size:
+                raise SnapshotError(f"{path} está truncado")
+            with memoryview(data)[HEADER.size:] as body:
+                for code, visits, *values in RECORD.iter_unpack(body):
+                    value_q = {action: q for action, q in enumerate(values) if q == q}  # q != q solo para NaN
+                    yield decode_state(code), value_q, visits
+
+
+def load_snapshot(q_store, path):
+    # Carga masiva: los registros ya vienen ordenados, así que el árbol AVL se construye en O(n)
+    q_store.load_items(list(iter_snapshot(path)))
+    return q_store
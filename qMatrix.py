@@ -0,0 +1,310 @@
+from collections.abc import MutableMapping
+
+import numpy as np
+
+from avlTree import AVLTree
+from gameState import STATE_COUNT, decode_state, encode_state
+from qStore import QStore
+
+# Máscara de acciones legales (casillas vacías) para cada uno de los 3^9 códigos de estado
+_POWERS = 3 ** np.arange(8, -1, -1)
+LEGAL_MASK = (np.arange(STATE_COUNT)[:, None] // _POWERS[None, :]) % 3 == 0
+_ACTION_BITS = 1 << np.arange(9)
+_MIN_ROUND = 16  # Rondas de apply_batch más chicas que esto se aplican en Python
+
+
+class QRow(MutableMapping):
+    # Vista tipo diccionario sobre una fila de la matriz, para que MachineIa y la compactación
+    # sigan usando node.value_q[accion] sin saber que por debajo hay un arreglo
+    __slots__ = ('matrix', 'code')
+
+    def __init__(self, matrix, code):
+        self.matrix = matrix
+        self.code = code
+
+    def __getitem__(self, action):
+        if not self.matrix.has_action[self.code, action]:
+            raise KeyError(action)
+        return float(self.matrix.q[self.code, action])
+
+    def get(self, action, default=None):
+        if not self.matrix.has_action[self.code, action]:
+            return default
+        return float(self.matrix.q[self.code, action])
+
+    def __setitem__(self, action, value):
+        self.matrix.q[self.code, action] = value
+        self.matrix.has_action[self.code, action] = True
+        self.matrix.greedy[self.code] = None
+
+    def __delitem__(self, action):
+        if not self.matrix.has_action[self.code, action]:
+            raise KeyError(action)
+        self.matrix.has_action[self.code, action] = False
+        self.matrix.q[self.code, action] = 0
+        self.matrix.greedy[self.code] = None
+
+    def __iter__(self):
+        return iter(np.flatnonzero(self.matrix.has_action[self.code]).tolist())
+
+    def __len__(self):
+        return int(self.matrix.has_action[self.code].sum())
+
+    def __bool__(self):
+        return any(self.matrix.has_action[self.code].tolist())  # Sin la reducción de numpy de __len__
+
+    def values(self):
+        return self.matrix.q[self.code][self.matrix.has_action[self.code]].tolist()
+
+
+class MatrixEntry:
+    __slots__ = ('matrix', 'code', 'board_state')
+
+    def __init__(self, matrix, code, board_state):
+        self.matrix = matrix
+        self.code = code
+        self.board_state = board_state
+
+    @property
+    def value_q(self):
+        return QRow(self.matrix, self.code)
+
+    @value_q.setter
+    def value_q(self, value_q):
+        self.matrix.set_row(self.code, value_q)
+
+    @property
+    def visits(self):
+        return int(self.matrix.visits[self.code])
+
+    @visits.setter
+    def visits(self, visits):
+        self.matrix.visits[self.code] = visits
+
+
+class ArrayQStore(QStore):
+    # Matriz Q de forma (3^9, 9) indexada por el código base 3 del estado. has_action marca las
+    # acciones que tienen valor (las llaves del diccionario value_q en los otros backends).
+    # greedy guarda, en una lista de Python, una máscara de 9 bits con las mejores acciones
+    # legales de cada estado (las acciones sin valor cuentan como 0, igual que choose_best_move):
+    # 0 si el estado no tiene valores y None si hay que recalcularla. apply_batch la recalcula
+    # en bloque para los estados del lote, así elegir jugada no lee la matriz elemento a elemento.
+
+    def __init__(self):
+        self.q = np.zeros((STATE_COUNT, 9))
+        self.has_action = np.zeros((STATE_COUNT, 9), dtype=bool)
+        self.visits = np.zeros(STATE_COUNT, dtype=np.int64)
+        self.known = np.zeros(STATE_COUNT, dtype=bool)
+        self.greedy = [0] * STATE_COUNT
+
+    def set_row(self, code, value_q):
+        self.known[code] = True
+        self.greedy[code] = None
+        self.q[code] = 0
+        self.has_action[code] = False
+        for action, q in value_q.items():
+            self.q[code, action] = q
+            self.has_action[code, action] = True
+
+    def get(self, board_state):
+        code = encode_state(board_state)
+        if not self.known[code]:
+            return None
+        return MatrixEntry(self, code, board_state)
+
+    def insert(self, board_state, value_q):
+        code = encode_state(board_state)
+        self.set_row(code, value_q)
+        return MatrixEntry(self, code, board_state)
+
+    def remove(self, board_state):
+        code = encode_state(board_state)
+        self.known[code] = False
+        self.q[code] = 0
+        self.has_action[code] = False
+        self.visits[code] = 0
+        self.greedy[code] = 0
+
+    def entries(self):
+        for code in np.flatnonzero(self.known).tolist():
+            yield MatrixEntry(self, code, decode_state(code))
+
+    def clear(self):
+        self.q.fill(0)
+        self.has_action.fill(False)
+        self.visits.fill(0)
+        self.known.fill(False)
+        self.greedy = [0] * STATE_COUNT
+
+    def __len__(self):
+        return int(self.known.sum())
+
+    def load_items(self, sorted_items):
+        self.clear()
+        for board_state, value_q, visits in sorted_items:
+            code = encode_state(board_state)
+            self.set_row(code, value_q)
+            self.visits[code] = visits
+
+    def as_avl_tree(self):
+        avl_tree = AVLTree()
+        avl_tree.bulk_load((entry.board_state, dict(entry.value_q), entry.visits) for entry in self.entries())
+        return avl_tree
+
+    # Consultas vectorizadas sobre lotes de estados
+
+    def max_q(self, codes):
+        # Máximo valor Q de cada estado entre sus acciones con valor; 0 si no tiene ninguna
+        codes = np.asarray(codes)
+        masked = np.where(self.has_action[codes], self.q[codes], -np.inf)
+        best = masked.max(axis=1)
+        return np.where(np.isneginf(best), 0.0, best)
+
+    def best_actions(self, codes):
+        # Acción legal de mayor valor Q para cada estado (las acciones sin valor cuentan como 0,
+        # igual que choose_best_move). Devuelve -1 para tableros sin casillas vacías.
+        codes = np.asarray(codes)
+        legal = LEGAL_MASK[codes]
+        values = np.where(self.has_action[codes], self.q[codes], 0.0)
+        values = np.where(legal, values, -np.inf)
+        actions = values.argmax(axis=1)
+        return np.where(legal.any(axis=1), actions, -1)
+
+    def greedy_masks(self, codes):
+        # Máscara de las acciones legales empatadas en el máximo de cada estado; 0 si el estado
+        # no se conoce o no tiene valores
+        codes = np.asarray(codes)
+        legal = LEGAL_MASK[codes]
+        has_action = self.has_action[codes]
+        values = np.where(legal, np.where(has_action, self.q[codes], 0.0), -np.inf)
+        best = (values == values.max(axis=1, keepdims=True)) & legal
+        masks = best @ _ACTION_BITS
+        return np.where(self.known[codes] & has_action.any(axis=1), masks, 0)
+
+    def greedy_mask(self, board_state):
+        # Consulta de una jugada: lee la máscara ya calculada y solo recalcula los estados que
+        # se escribieron fuera de apply_batch
+        code = encode_state(board_state)
+        mask = self.greedy[code]
+        if mask is None:
+            mask = self.greedy[code] = self._row_mask(code)
+        return mask
+
+    def _row_mask(self, code):
+        # greedy_masks para un solo estado, en Python: con una fila numpy cuesta más preparar el
+        # arreglo que recorrer 9 valores
+        has_action = self.has_action[code].tolist()
+        if not any(has_action):
+            return 0
+        row = self.q[code].tolist()
+        values = [(row[action] if has_action[action] else 0.0, action)
+                  for action, legal in enumerate(LEGAL_MASK[code].tolist()) if legal]
+        if not values:
+            return 0
+        best = max(value for value, _ in values)
+        return sum(1 << action for value, action in values if value == best)
+
+    def _apply_in_order(self, codes, actions, targets, gamma, alpha):
+        # Cola de apply_batch: las últimas rondas tienen pocos estados muy repetidos (los de
+        # inicio de partida), así que se aplican una por una en Python sobre la fila de cada
+        # estado, leída y escrita una sola vez
+        rows = {}
+        deltas = []
+        for code, action, adjusted_reward, gamma_value, alpha_value in zip(
+                codes.tolist(), actions.tolist(), targets.tolist(), gamma.tolist(), alpha.tolist()):
+            row = rows.get(code)
+            if row is None:
+                row = rows[code] = (self.q[code].tolist(), self.has_action[code].tolist())
+            values, has_action = row
+            future_q = max((q for q, known in zip(values, has_action) if known), default=0.0)
+            previous_q = values[action] if has_action[action] else 0.0
+            target = adjusted_reward + gamma_value * future_q
+            updated_q = target if alpha_value == 1 else previous_q + alpha_value * (target - previous_q)
+            values[action] = updated_q
+            has_action[action] = True
+            deltas.append(abs(updated_q - previous_q))
+        for code, (values, has_action) in rows.items():
+            self.q[code] = values
+            self.has_action[code] = has_action
+        return deltas
+
+    def best_q_value(self):
+        rows = self.known & self.has_action.any(axis=1)
+        if not rows.any():
+            return 0
+        return float(self.max_q(np.flatnonzero(rows)).max())
+
+    def statistics(self):
+        values = self.q[self.has_action]
+        return {
+            'states': len(self),
+            'values': int(values.size),
+            'max_q': float(values.max()) if values.size else 0.0,
+            'mean_q': float(values.mean()) if values.size else 0.0,
+            'visits': int(self.visits.sum()),
+        }
+
+    def apply_batch(self, codes, actions, rewards, adjusted_rewards, gamma, alpha=1.0):
+        # Actualización de Bellman vectorizada sobre un lote de transiciones, con la misma
+        # fórmula que update_q_values: Q(s, a) += alpha * (r_ajustada + gamma * max Q(s) - Q(s, a)).
+        # gamma y alpha pueden ser un valor para todo el lote o uno por transición. El resultado
+        # es el mismo que aplicar las transiciones una por una en orden: un estado que se repite
+        # en el lote se actualiza en rondas sucesivas (la k-ésima transición de cada estado va en
+        # la ronda k), y dentro de una ronda cada fila aparece una sola vez. Devuelve el |ΔQ| de
+        # cada transición.
+        codes = np.asarray(codes, dtype=np.int64)
+        actions = np.asarray(actions, dtype=np.int64)
+        rewards = np.asarray(rewards, dtype=float)
+        adjusted_rewards = np.asarray(adjusted_rewards, dtype=float)
+        gamma = np.broadcast_to(np.asarray(gamma, dtype=float), codes.shape)
+        alpha = np.broadcast_to(np.asarray(alpha, dtype=float), codes.shape)
+
+        # Estados nuevos: acciones legales en 0 y la recompensa inicial en la acción tomada
+        new_codes, first = np.unique(codes[~self.known[codes]], return_index=True)
+        if new_codes.size:
+            new_positions = np.flatnonzero(~self.known[codes])[first]
+            self.known[new_codes] = True
+            self.q[new_codes] = 0
+            self.has_action[new_codes] = LEGAL_MASK[new_codes]
+            self.q[new_codes, actions[new_positions]] = rewards[new_positions]
+            self.has_action[new_codes, actions[new_positions]] = True
+
+        # Ronda de cada transición: cuántas veces apareció antes su estado en el lote
+        order = np.argsort(codes, kind='stable')
+        sorted_codes = codes[order]
+        group_starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+        group_sizes = np.diff(np.r_[group_starts, codes.size])
+        rounds = np.empty_like(order)
+        rounds[order] = np.arange(codes.size) - np.repeat(group_starts, group_sizes)
+        by_round = np.argsort(rounds, kind='stable')
+        round_codes, round_actions = codes[by_round], actions[by_round]
+        round_targets, round_gamma, round_alpha = adjusted_rewards[by_round], gamma[by_round], alpha[by_round]
+
+        round_deltas = np.empty(codes.size)
+        start = 0
+        for size in np.bincount(rounds).tolist():
+            if size < _MIN_ROUND:
+                break
+            batch = slice(start, start + size)
+            start += size
+            batch_codes, batch_actions = round_codes[batch], round_actions[batch]
+            future_q = self.max_q(batch_codes)
+            previous_q = self.q[batch_codes, batch_actions]
+            target = round_targets[batch] + round_gamma[batch] * future_q
+            batch_alpha = round_alpha[batch]
+            updated_q = np.where(batch_alpha == 1, target, previous_q + batch_alpha * (target - previous_q))
+            self.q[batch_codes, batch_actions] = updated_q
+            self.has_action[batch_codes, batch_actions] = True
+            round_deltas[batch] = np.abs(updated_q - previous_q)
+        if start < codes.size:
+            round_deltas[start:] = self._apply_in_order(
+                round_codes[start:], round_actions[start:], round_targets[start:], round_gamma[start:],
+                round_alpha[start:])
+        deltas = np.empty(codes.size)
+        deltas[by_round] = round_deltas
+        np.add.at(self.visits, codes, 1)
+
+        touched = np.unique(codes)
+        for code, mask in zip(touched.tolist(), self.greedy_masks(touched).tolist()):
+            self.greedy[code] = mask
+        return deltas
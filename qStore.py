@@ -0,0 +1,159 @@
+from abc import ABC, abstractmethod
+
+from avlTree import AVLTree
+from gridState import state_key
+
+
+# Interfaz comun de almacenamiento de valores Q. MachineIa solo usa estos metodos, asi que
+# cualquier backend que los implemente puede reemplazar al arbol AVL.
+class QStore(ABC):
+
+    @abstractmethod
+    def get(self, board_state):
+        # Devuelve la entrada (con board_state, value_q y visits) o None si no existe
+        pass
+
+    @abstractmethod
+    def insert(self, board_state, value_q):
+        # Inserta el estado y devuelve la entrada almacenada
+        pass
+
+    @abstractmethod
+    def remove(self, board_state):
+        pass
+
+    @abstractmethod
+    def entries(self):
+        pass
+
+    @abstractmethod
+    def clear(self):
+        pass
+
+    def load_items(self, sorted_items):
+        # Reemplaza el contenido con (board_state, value_q, visits) ordenados por board_state
+        self.clear()
+        for board_state, value_q, visits in sorted_items:
+            self.insert(board_state, value_q).visits = visits
+
+    def touch(self, entry):
+        # Aviso de que la entrada se modificó en el lugar (valores Q o visitas). Los almacenes en
+        # memoria no necesitan hacer nada; el compartido la anota para el próximo envío.
+        pass
+
+    def close(self):
+        # Guarda lo pendiente y libera conexiones antes de dejar de usar el almacén
+        pass
+
+    def __len__(self):
+        return sum(1 for _ in self.entries())
+
+    @abstractmethod
+    def as_avl_tree(self):
+        # Árbol AVL con las mismas entradas, usado por el "diagrama de evolucion"
+        pass
+
+
+class AVLQStore(QStore):
+
+    def __init__(self, avl_tree=None):
+        self.avl_tree = avl_tree if avl_tree is not None else AVLTree()
+
+    def get(self, board_state):
+        return self.avl_tree.search(self.avl_tree.root, board_state)
+
+    def insert(self, board_state, value_q):
+        # Deduplicación incremental: si el estado ya existe se actualiza en lugar de repetirlo
+        node = self.avl_tree.search(self.avl_tree.root, board_state)
+        if node:
+            node.value_q = value_q
+            return node
+        self.avl_tree.root = self.avl_tree.insert(self.avl_tree.root, board_state, value_q)
+        return self.avl_tree.search(self.avl_tree.root, board_state)
+
+    def remove(self, board_state):
+        self.avl_tree.root = self.avl_tree.delete_node(self.avl_tree.root, board_state)
+
+    def entries(self):
+        return self.avl_tree.iter_nodes()
+
+    def __len__(self):
+        return len(self.avl_tree)
+
+    def clear(self):
+        self.avl_tree.root = None
+
+    def load_items(self, sorted_items):
+        # Reemplaza el contenido con un árbol perfectamente balanceado
+        self.avl_tree.bulk_load(sorted_items)
+
+    def as_avl_tree(self):
+        return self.avl_tree
+
+
+class QEntry:
+    __slots__ = ('board_state', 'value_q', 'visits')  # Sin __dict__ por entrada, hay miles de ellas
+
+    def __init__(self, board_state, value_q):
+        self.board_state = board_state
+        self.value_q = value_q
+        self.visits = 0
+
+
+class HashQStore(QStore):
+    # Tabla hash indexada por state_key: el código base 3 en el 3x3 (a lo sumo 3^9 = 19683
+    # entradas) y el hash Zobrist en tableros mayores, donde solo se guardan los estados vistos.
+    # La búsqueda e inserción son O(1) y no hay nodos ni rebalanceos.
+
+    def __init__(self):
+        self.table = {}
+
+    def get(self, board_state):
+        return self.table.get(state_key(board_state))
+
+    def insert(self, board_state, value_q):
+        entry = QEntry(board_state, value_q)
+        self.table[state_key(board_state)] = entry
+        return entry
+
+    def remove(self, board_state):
+        self.table.pop(state_key(board_state), None)
+
+    def entries(self):
+        return self.table.values()
+
+    def clear(self):
+        self.table.clear()
+
+    def load_items(self, sorted_items):
+        self.table.clear()
+        for board_state, value_q, visits in sorted_items:
+            entry = QEntry(board_state, value_q)
+            entry.visits = visits
+            self.table[state_key(board_state)] = entry
+
+    def __len__(self):
+        return len(self.table)
+
+    def as_avl_tree(self):
+        # La carga masiva necesita las entradas en el orden de las tuplas
+        avl_tree = AVLTree()
+        entries = sorted(self.table.values(), key=lambda entry: entry.board_state)
+        avl_tree.bulk_load((entry.board_state, entry.value_q, entry.visits) for entry in entries)
+        return avl_tree
+
+
+def _array_q_store():
+    from qMatrix import ArrayQStore  # numpy solo se importa si se pide este backend
+    return ArrayQStore()
+
+
+Q_STORES = {
+    'avl': AVLQStore,
+    'hash': HashQStore,
+    'array': _array_q_store,
+}
+
+
+def create_q_store(kind='avl'):
+    return Q_STORES[kind]()
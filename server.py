@@ -0,0 +1,262 @@
+import argparse
+import logging
+import math
+import os
+import threading
+import time
+
+from flask import Flask, Response, jsonify, request
+from flask_cors import CORS
+
+from gameState import EMPTY_INDICES, SYMMETRIES, GameState, canonical_form, encode_state
+from instrumentation import metrics
+from modelSnapshot import SnapshotError, iter_snapshot, snapshot_canonical_keys
+from solver import player_to_move
+from threats import WIN_CELLS, opponent_of
+
+logger = logging.getLogger(__name__)
+
+MODEL_PATH = 'model.qtab'
+MAX_BATCH = 1024
+EMPTY_CELLS = ('', ' ', '.', '-', '_', None)
+
+
+class BoardError(ValueError):
+    pass
+
+
+class ReadOnlyQTable:
+    # Tabla Q inmutable para servir jugadas. Los valores se guardan por código de estado (canónico
+    # salvo en modelos entrenados con --no-symmetry, según la cabecera del archivo) como tuplas de 9 floats (NaN = acción sin valor) y nunca se modifican después de cargarse, así
+    # que cualquier número de hilos puede leerla sin bloqueos. Las decisiones ya calculadas se
+    # memorizan por (código del tablero, jugador); como son deterministas, si dos hilos calculan
+    # la misma a la vez ambos guardan el mismo resultado.
+
+    def __init__(self, values=None, path=None, mtime=None, version=0, canonical_keys=True):
+        self.values = values or {}
+        self.canonical_keys = canonical_keys
+        self.path = path
+        self.mtime = mtime
+        self.version = version
+        self.loaded_at = time.time()
+        self.decisions = {}
+
+    @classmethod
+    def from_snapshot(cls, path):
+        stat = os.stat(path)
+        canonical_keys = snapshot_canonical_keys(path)
+        values = {}
+        for board_state, value_q, _ in iter_snapshot(path):
+            row = [math.nan] * 9
+            for action, q in value_q.items():
+                row[action] = q
+            values[encode_state(board_state)] = tuple(row)
+        return cls(values, path, stat.st_mtime_ns, canonical_keys=canonical_keys)
+
+    def __len__(self):
+        return len(self.values)
+
+    def q_values(self, board_state):
+        # Valores Q en los índices del tablero recibido, igual que MachineIa.q_values_for
+        if not self.canonical_keys:
+            row = self.values.get(encode_state(board_state))
+            return {action: q for action, q in enumerate(row) if q == q} if row else {}
+        canonical, symmetry = canonical_form(board_state)
+        row = self.values.get(encode_state(canonical))
+        if row is None:
+            return {}
+        perm = SYMMETRIES[symmetry]
+        return {perm[action]: q for action, q in enumerate(row) if q == q}
+
+    def decide(self, board_state, player):
+        key = (encode_state(board_state), player)
+        decision = self.decisions.get(key)
+        if decision is None:
+            decision = self._decide(board_state, player)
+            self.decisions[key] = decision
+        return decision
+
+    def _decide(self, board_state, player):
+        # Misma política que block_opponent_win sin exploración: ganar, bloquear y si no el
+        # mayor valor Q (las acciones sin valor cuentan como 0, el empate va al menor índice)
+        state = GameState.from_tuple(board_state)
+        code = state.encode()
+        q_values = self.q_values(board_state)
+        forced = WIN_CELLS[player][code] or WIN_CELLS[opponent_of(player)][code]
+        if forced:
+            return forced[0], q_values
+        empties = EMPTY_INDICES[state.x_mask | state.o_mask]
+        return max(empties, key=lambda i: (q_values.get(i, 0), -i)), q_values
+
+
+class ModelServer:
+    # Mantiene la tabla vigente. Los lectores toman `self.table` una vez por petición y trabajan
+    # con esa referencia; una recarga construye la tabla nueva aparte y solo al final reemplaza
+    # la referencia, de modo que ninguna petición ve un modelo a medio cargar ni espera un lock.
+
+    def __init__(self, path=MODEL_PATH, poll_interval=1.0):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.table = ReadOnlyQTable(path=path)
+        self.reload_lock = threading.Lock()  # Solo serializa recargas, nunca lecturas
+        self.failed_mtime = None  # Versión del archivo que no se pudo leer, para no reintentarla
+        self.stop_event = threading.Event()
+        self.watcher = None
+        self.reload_if_changed()
+
+    def reload_if_changed(self):
+        with self.reload_lock:
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError:
+                if self.table.version == 0:
+                    logger.warning("No existe %s; se sirve sin valores Q hasta que aparezca", self.path)
+                return False
+            if mtime == self.table.mtime or mtime == self.failed_mtime:
+                return False
+            try:
+                table = ReadOnlyQTable.from_snapshot(self.path)
+            except (OSError, SnapshotError) as error:
+                self.failed_mtime = mtime
+                logger.error("No se pudo recargar %s, se mantiene el modelo anterior: %s", self.path, error)
+                return False
+            table.version = self.table.version + 1
+            self.table = table
+            logger.info("Modelo %s cargado (versión %d, %d estados)", self.path, table.version, len(table))
+            return True
+
+    def start_watcher(self):
+        # Revisa la fecha de modificación del modelo cada poll_interval segundos
+        if self.watcher is None and self.poll_interval:
+            self.watcher = threading.Thread(target=self._watch, name='model-watcher', daemon=True)
+            self.watcher.start()
+
+    def stop_watcher(self):
+        self.stop_event.set()
+        if self.watcher is not None:
+            self.watcher.join()
+            self.watcher = None
+
+    def _watch(self):
+        while not self.stop_event.wait(self.poll_interval):
+            self.reload_if_changed()
+
+    def move(self, board, player=None):
+        start = time.perf_counter() if metrics.enabled else 0
+        table = self.table
+        board_state = parse_board(board)
+        player = parse_player(player, board_state)
+        index, q_values = table.decide(board_state, player)
+        if metrics.enabled:
+            metrics.observe('server_move_seconds', time.perf_counter() - start)
+            metrics.inc('server_moves')
+        return {
+            'index': index,
+            'player': player,
+            'q_values': {str(action): q for action, q in sorted(q_values.items())},
+            'model_version': table.version,
+        }
+
+
+def parse_board(board):
+    # Acepta una lista de 9 casillas ('X', 'O' o vacía) o un texto de 9 caracteres como "X.O...XO."
+    if not isinstance(board, (list, tuple, str)) or len(board) != 9:
+        raise BoardError("El tablero debe tener 9 casillas")
+    cells = []
+    for cell in board:
+        if cell in EMPTY_CELLS:
+            cells.append('')
+        elif isinstance(cell, str) and cell.upper() in ('X', 'O'):
+            cells.append(cell.upper())
+        else:
+            raise BoardError(f"Casilla inválida: {cell!r}")
+    board_state = tuple(cells)
+    state = GameState.from_tuple(board_state)
+    if state.winner() or state.is_full():
+        raise BoardError("La partida ya terminó")
+    return board_state
+
+
+def parse_player(player, board_state):
+    if player is None:
+        return player_to_move(board_state)
+    if player not in ('X', 'O'):
+        raise BoardError(f"Jugador inválido: {player!r}")
+    return player
+
+
+def create_app(model_path=MODEL_PATH, poll_interval=1.0):
+    # Fábrica para `flask run` o un servidor WSGI con varios procesos, por ejemplo
+    # gunicorn -w 4 --threads 8 'server:create_app()'; cada proceso vigila el modelo por su cuenta
+    app = Flask(__name__)
+    CORS(app)
+    model = ModelServer(model_path, poll_interval)
+    model.start_watcher()
+    app.config['MODEL_SERVER'] = model
+
+    @app.errorhandler(BoardError)
+    def board_error(error):
+        return jsonify({'error': str(error)}), 400
+
+    @app.post('/move')
+    def move():
+        payload = request.get_json(silent=True)
+        if not isinstance(payload, dict):
+            raise BoardError("Se esperaba un objeto JSON con 'board'")
+        return jsonify(model.move(payload.get('board'), payload.get('player')))
+
+    @app.post('/moves')
+    def moves():
+        # Lote de tableros: un resultado por tablero, en el mismo orden. Un tablero inválido
+        # solo produce un error en su posición.
+        payload = request.get_json(silent=True)
+        boards = payload.get('boards') if isinstance(payload, dict) else None
+        if not isinstance(boards, list):
+            raise BoardError("Se esperaba un objeto JSON con la lista 'boards'")
+        if len(boards) > MAX_BATCH:
+            raise BoardError(f"Se admiten a lo sumo {MAX_BATCH} tableros por petición")
+        players = payload.get('players') or [None] * len(boards)
+        if not isinstance(players, list) or len(players) != len(boards):
+            raise BoardError("'players' debe tener un jugador por tablero")
+        results = []
+        for board, player in zip(boards, players):
+            try:
+                results.append(model.move(board, player))
+            except BoardError as error:
+                results.append({'error': str(error)})
+        return jsonify({'moves': results})
+
+    @app.get('/metrics')
+    def metrics_text():
+        # Solo tiene datos si el servicio se inició con --metrics
+        return Response(metrics.to_prometheus(), mimetype='text/plain; version=0.0.4')
+
+    @app.get('/health')
+    def health():
+        table = model.table
+        return jsonify({'model': model.path, 'model_version': table.version, 'states': len(table),
+                        'loaded_at': table.loaded_at})
+
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servicio HTTP que elige jugadas con la tabla Q entrenada")
+    parser.add_argument('--model', default=MODEL_PATH, help="Modelo guardado con modelSnapshot")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--poll-interval', type=float, default=1.0,
+                        help="Segundos entre revisiones del modelo para recargarlo (0 desactiva)")
+    parser.add_argument('--metrics', action='store_true', help="Mide las decisiones y las expone en GET /metrics")
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO)
+    if args.metrics:
+        metrics.enable()
+    app = create_app(args.model, args.poll_interval)
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
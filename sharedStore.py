@@ -0,0 +1,622 @@
+import json
+import logging
+import operator
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from avlTree import AVLTree
+from instrumentation import metrics
+from qStore import QEntry, QStore
+
+logger = logging.getLogger(__name__)
+
+# Tabla Q compartida entre varios clientes del juego (kioscos, procesos de entrenamiento). Cada
+# cliente trabaja sobre un caché local y solo va al almacén compartido en tres casos:
+#   - un estado que no está en el caché (una consulta por estado, luego queda en caché)
+#   - cada flush_size actualizaciones o flush_interval segundos, para enviar lo aprendido
+#   - cada sync_interval segundos, para saber qué estados cambiaron otros clientes
+# Por cada estado se envían los valores Q nuevos, las visitas que tenía al leerlo y las visitas
+# nuevas. La actualización de Q reemplaza el valor anterior, así que sumar los cambios de dos
+# clientes contaría dos veces el mismo paso; el almacén combina como training.merge_tables: el
+# promedio, ponderado por visitas, de lo que escribieron otros desde esa lectura y lo enviado
+# (merge_values). Después del envío el cliente se queda con el valor combinado.
+#
+# El almacén tiene un número de versión que crece con cada envío, y cada fila guarda la versión
+# con que se escribió. Al sincronizar, el cliente pide los estados con versión mayor que la
+# última que vio y los saca del caché; la próxima consulta los lee de nuevo. La versión que
+# devuelve el almacén es la confirmada: todos los envíos hasta ella ya están escritos.
+#
+# Backends:
+#   archivo.db               SQLite en modo WAL (varios procesos en la misma máquina)
+#   mongodb://host/base      colección de MongoDB (requiere pymongo)
+#   memory://                colección en memoria con la interfaz de MongoDB, para pruebas
+EMPTY_CELL = '-'
+
+
+def state_text(board_state):
+    # Clave de texto del estado, válida para cualquier tamaño de tablero: 'X-O------'
+    return ''.join(cell or EMPTY_CELL for cell in board_state)
+
+
+def board_from_text(text):
+    return tuple('' if cell == EMPTY_CELL else cell for cell in text)
+
+
+def _encode_values(value_q):
+    return json.dumps({str(action): q for action, q in value_q.items()})
+
+
+def _decode_values(text):
+    return {int(action): q for action, q in json.loads(text).items()}
+
+
+def merge_values(stored_q, stored_visits, value_q, read_visits, new_visits):
+    # Combina un envío con la fila del almacén. `others` son las visitas que otros clientes
+    # agregaron desde que este leyó el estado; sin ellas queda el valor enviado, como si el
+    # cliente estuviera solo. MongoBackend repite esta cuenta en el servidor (_merge_pipeline).
+    others = max(stored_visits - read_visits, 0)
+    total = others + new_visits
+    merged = dict(stored_q)
+    for action, q in value_q.items():
+        if total and action in stored_q:
+            merged[action] = (stored_q[action] * others + q * new_visits) / total
+        else:
+            merged[action] = q
+    return merged, stored_visits + new_visits
+
+
+class SQLiteBackend:
+    # Un archivo SQLite en modo WAL: los lectores no bloquean al que escribe y cada envío es una
+    # transacción, así que la versión y las filas cambian juntas para todos los procesos
+
+    def __init__(self, path, timeout=30.0):
+        self.path = path
+        # Cada cliente tiene su propia conexión; puede crearse en un hilo y usarse en otro
+        # (el entrenamiento de la interfaz), nunca en dos a la vez
+        self.connection = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS q_values (
+                state TEXT PRIMARY KEY,
+                value_q TEXT NOT NULL,
+                visits INTEGER NOT NULL,
+                version INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS q_values_version ON q_values (version);
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            INSERT OR IGNORE INTO meta (name, value) VALUES ('version', 0);
+        """)
+
+    def open_client(self):
+        return SQLiteBackend(self.path)
+
+    def version(self):
+        return self.connection.execute("SELECT value FROM meta WHERE name = 'version'").fetchone()[0]
+
+    def fetch(self, states):
+        rows = {}
+        states = list(states)
+        for start in range(0, len(states), 500):  # Límite de parámetros por consulta
+            chunk = states[start:start + 500]
+            query = f"SELECT state, value_q, visits FROM q_values WHERE state IN ({','.join('?' * len(chunk))})"
+            for state, value_q, visits in self.connection.execute(query, chunk):
+                rows[state] = (_decode_values(value_q), visits)
+        return rows
+
+    def changed_since(self, version):
+        current = self.version()
+        if current == version:
+            return current, []
+        states = [row[0] for row in self.connection.execute(
+            "SELECT state FROM q_values WHERE version > ?", (version,))]
+        return current, states
+
+    def apply_updates(self, updates):
+        # updates: [(estado, {acción: Q}, visitas leídas, visitas nuevas)]; devuelve las filas
+        # combinadas. BEGIN IMMEDIATE toma el lock de escritura antes de leer, de modo que ningún
+        # otro proceso cambia las filas entre lectura y escritura.
+        with self._transaction():
+            version = self.version() + 1
+            self.connection.execute("UPDATE meta SET value = ? WHERE name = 'version'", (version,))
+            current = self.fetch(update[0] for update in updates)
+            merged = {}
+            for state, value_q, read_visits, new_visits in updates:
+                stored_q, stored_visits = current.get(state, ({}, 0))
+                merged[state] = merge_values(stored_q, stored_visits, value_q, read_visits, new_visits)
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO q_values (state, value_q, visits, version) VALUES (?, ?, ?, ?)",
+                ((state, _encode_values(value_q), visits, version) for state, (value_q, visits) in merged.items()))
+        return merged
+
+    def replace_all(self, items):
+        with self._transaction():
+            version = self.version() + 1
+            self.connection.execute("UPDATE meta SET value = ? WHERE name = 'version'", (version,))
+            self.connection.execute("DELETE FROM q_values")
+            self.connection.executemany(
+                "INSERT INTO q_values (state, value_q, visits, version) VALUES (?, ?, ?, ?)",
+                ((state, _encode_values(value_q), visits, version) for state, value_q, visits in items))
+
+    def delete(self, state):
+        with self._transaction():
+            version = self.version() + 1
+            self.connection.execute("UPDATE meta SET value = ? WHERE name = 'version'", (version,))
+            self.connection.execute("DELETE FROM q_values WHERE state = ?", (state,))
+
+    def iter_all(self):
+        for state, value_q, visits in self.connection.execute("SELECT state, value_q, visits FROM q_values"):
+            yield state, _decode_values(value_q), visits
+
+    def count(self):
+        return self.connection.execute("SELECT COUNT(*) FROM q_values").fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+
+    @contextmanager
+    def _transaction(self):
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            self.connection.execute('ROLLBACK')
+            raise
+        self.connection.execute('COMMIT')
+
+
+class MongoBackend:
+    # Una colección con documentos {_id: estado, q: {acción: valor}, visits, version} y otra con
+    # el contador de versión. Los envíos son un bulk_write de UpdateOne con upsert y un pipeline
+    # que combina en el servidor, atómico por documento. La versión se reserva antes de escribir
+    # y queda pendiente hasta que termina la escritura; version() no pasa de la primera pendiente,
+    # así una sincronización no se salta filas que todavía no llegaron.
+    LEASE_SECONDS = 300.0  # Una reserva más vieja es de un cliente que murió a mitad del envío
+
+    def __init__(self, collection, meta_collection, update_one=None, reopen=None):
+        self.collection = collection
+        self.meta = meta_collection
+        if update_one is None:
+            from pymongo import UpdateOne  # Dependencia opcional, solo con este backend
+            update_one = UpdateOne
+        self.update_one = update_one
+        self.reopen = reopen  # Función que crea otro cliente sobre los mismos datos
+
+    def open_client(self):
+        return self.reopen() if self.reopen else self
+
+    def _live_reservations(self, document):
+        now = time.time()
+        return [reservation for reservation in document.get('pending') or []
+                if now - reservation['since'] < self.LEASE_SECONDS]
+
+    def version(self):
+        # Versión confirmada: la anterior a la primera reserva sin terminar, o el contador
+        document = self.meta.find_one({'_id': 'version'})
+        if not document:
+            return 0
+        pending = [reservation['version'] for reservation in self._live_reservations(document)]
+        return min(pending) - 1 if pending else document['value']
+
+    def _reserve_version(self):
+        # Sube el contador y anota la reserva en una sola escritura condicionada al documento que
+        # se leyó; si otro cliente lo cambió en medio, se vuelve a intentar
+        while True:
+            document = self.meta.find_one({'_id': 'version'})
+            if document is None:
+                self.meta.find_one_and_update({'_id': 'version'}, {'$inc': {'value': 0}}, upsert=True)
+                continue
+            version = document['value'] + 1
+            pending = self._live_reservations(document) + [{'version': version, 'since': time.time()}]
+            if self.meta.find_one_and_update({'_id': 'version', 'value': document['value'],
+                                              'pending': document.get('pending')},
+                                             {'$set': {'value': version, 'pending': pending}}):
+                return version
+
+    @contextmanager
+    def _writing(self):
+        version = self._reserve_version()
+        try:
+            yield version
+        finally:
+            self.meta.find_one_and_update({'_id': 'version'}, {'$pull': {'pending': {'version': version}}})
+
+    def fetch(self, states):
+        documents = self.collection.find({'_id': {'$in': list(states)}})
+        return {document['_id']: (_decode_document(document), document['visits']) for document in documents}
+
+    def changed_since(self, version):
+        current = self.version()
+        if current == version:
+            return current, []
+        documents = self.collection.find({'version': {'$gt': version}}, {'_id': 1})
+        return current, [document['_id'] for document in documents]
+
+    def apply_updates(self, updates):
+        states = [update[0] for update in updates]
+        with self._writing() as version:
+            requests = [self.update_one({'_id': state}, _merge_pipeline(value_q, read_visits, new_visits, version),
+                                        upsert=True)
+                        for state, value_q, read_visits, new_visits in updates]
+            if requests:
+                self.collection.bulk_write(requests, ordered=False)
+        # La combinación ocurre en el servidor; se lee el resultado (con lo que otros hayan
+        # escrito después, que también vale como lectura)
+        return self.fetch(states)
+
+    def replace_all(self, items):
+        with self._writing() as version:
+            self.collection.delete_many({})
+            requests = [self.update_one({'_id': state}, {'$set': {'q': {str(a): q for a, q in value_q.items()},
+                                                                  'visits': visits, 'version': version}},
+                                        upsert=True)
+                        for state, value_q, visits in items]
+            if requests:
+                self.collection.bulk_write(requests, ordered=False)
+
+    def delete(self, state):
+        with self._writing():
+            self.collection.delete_one({'_id': state})
+
+    def iter_all(self):
+        for document in self.collection.find({}):
+            yield document['_id'], _decode_document(document), document['visits']
+
+    def count(self):
+        return self.collection.count_documents({})
+
+    def close(self):
+        pass
+
+
+def _merge_pipeline(value_q, read_visits, new_visits, version):
+    # merge_values como pipeline de actualización: las expresiones de un mismo $set leen el
+    # documento anterior, así que `visits` todavía es el valor guardado
+    stored_visits = {'$ifNull': ['$visits', 0]}
+    others = {'$max': [{'$subtract': [stored_visits, read_visits]}, 0]}
+    fields = {'visits': {'$add': [stored_visits, new_visits]}, 'version': version}
+    for action, q in value_q.items():
+        total = {'$add': ['$$others', new_visits]}
+        weighted = {'$add': [{'$multiply': [{'$ifNull': [f'$q.{action}', q]}, '$$others']}, q * new_visits]}
+        fields[f'q.{action}'] = {'$let': {'vars': {'others': others},
+                                          'in': {'$cond': [{'$eq': [total, 0]}, q, {'$divide': [weighted, total]}]}}}
+    return [{'$set': fields}]
+
+
+def _decode_document(document):
+    return {int(action): q for action, q in document.get('q', {}).items()}
+
+
+class MemoryUpdate:
+    # Equivalente de pymongo.UpdateOne para MemoryCollection
+    __slots__ = ('filter', 'update', 'upsert')
+
+    def __init__(self, filter, update, upsert=False):
+        self.filter = filter
+        self.update = update
+        self.upsert = upsert
+
+
+class MemoryCollection:
+    # Colección en memoria con el subconjunto de la API de pymongo que usa MongoBackend. Varios
+    # clientes del mismo proceso pueden compartirla para probar el aprendizaje colectivo sin un
+    # servidor de MongoDB.
+
+    def __init__(self):
+        self.documents = {}
+        self.lock = threading.Lock()
+
+    def _matches(self, document, filter):
+        for field, condition in filter.items():
+            value = document.get(field)
+            if isinstance(condition, dict):
+                if '$in' in condition and value not in condition['$in']:
+                    return False
+                if '$gt' in condition and not (value is not None and value > condition['$gt']):
+                    return False
+            elif value != condition:
+                return False
+        return True
+
+    def _copy(self, document, projection=None):
+        if projection:
+            return {field: document[field] for field in projection if field in document}
+        return {field: dict(value) if isinstance(value, dict) else value for field, value in document.items()}
+
+    def find(self, filter=None, projection=None):
+        with self.lock:
+            if filter and set(filter) == {'_id'} and isinstance(filter['_id'], dict) and '$in' in filter['_id']:
+                found = [self.documents[key] for key in filter['_id']['$in'] if key in self.documents]
+            else:
+                found = [document for document in self.documents.values() if self._matches(document, filter or {})]
+            return [self._copy(document, projection) for document in found]
+
+    def find_one(self, filter):
+        found = self.find(filter)
+        return found[0] if found else None
+
+    def _apply(self, filter, update, upsert):
+        if set(filter) == {'_id'} and not isinstance(filter['_id'], dict):
+            document = self.documents.get(filter['_id'])
+            matches = [document] if document is not None else []
+        else:
+            matches = [document for document in self.documents.values() if self._matches(document, filter)]
+        if not matches:
+            if not upsert:
+                return None
+            document = {'_id': filter['_id']}
+            self.documents[filter['_id']] = document
+            matches = [document]
+        for document in matches:
+            if isinstance(update, list):
+                # Pipeline de actualización: cada etapa $set evalúa sobre el documento anterior
+                for stage in update:
+                    values = {field: _evaluate(expression, document, {}) for field, expression in stage['$set'].items()}
+                    for field, value in values.items():
+                        target, key = _dotted(document, field)
+                        target[key] = value
+                continue
+            for field, amount in update.get('$inc', {}).items():
+                target, key = _dotted(document, field)
+                target[key] = target.get(key, 0) + amount
+            for field, value in update.get('$set', {}).items():
+                target, key = _dotted(document, field)
+                target[key] = value
+            for field, condition in update.get('$pull', {}).items():
+                target, key = _dotted(document, field)
+                target[key] = [item for item in target.get(key) or [] if not _pulled(item, condition)]
+        return matches[0]
+
+    def find_one_and_update(self, filter, update, upsert=False, return_document=False):
+        with self.lock:
+            document = self._apply(filter, update, upsert)
+            return self._copy(document) if document else None
+
+    def bulk_write(self, requests, ordered=True):
+        with self.lock:
+            for request in requests:
+                self._apply(request.filter, request.update, request.upsert)
+
+    def delete_one(self, filter):
+        with self.lock:
+            self.documents.pop(filter['_id'], None)
+
+    def delete_many(self, filter):
+        with self.lock:
+            for key in [key for key, document in self.documents.items() if self._matches(document, filter)]:
+                del self.documents[key]
+
+    def count_documents(self, filter):
+        return len(self.find(filter))
+
+
+def _pulled(item, condition):
+    if isinstance(condition, dict):
+        return isinstance(item, dict) and all(item.get(field) == value for field, value in condition.items())
+    return item == condition
+
+
+_OPERATORS = {
+    '$add': lambda *values: sum(values),
+    '$subtract': operator.sub,
+    '$multiply': operator.mul,
+    '$divide': operator.truediv,
+    '$max': lambda *values: max(value for value in values if value is not None),
+    '$ifNull': lambda value, default: default if value is None else value,
+    '$eq': operator.eq,
+}
+
+
+def _evaluate(expression, document, variables):
+    # Las expresiones de agregación que usa _merge_pipeline: '$campo.sub', '$$variable', $let,
+    # $cond (solo evalúa la rama elegida) y los operadores de _OPERATORS
+    if isinstance(expression, str) and expression.startswith('$$'):
+        return variables[expression[2:]]
+    if isinstance(expression, str) and expression.startswith('$'):
+        value = document
+        for part in expression[1:].split('.'):
+            value = value.get(part) if isinstance(value, dict) else None
+        return value
+    if not isinstance(expression, dict):
+        return expression
+    (name, arguments), = expression.items()
+    if name == '$let':
+        scope = dict(variables)
+        scope.update((variable, _evaluate(value, document, variables))
+                     for variable, value in arguments['vars'].items())
+        return _evaluate(arguments['in'], document, scope)
+    if name == '$cond':
+        condition, then, otherwise = arguments
+        return _evaluate(then if _evaluate(condition, document, variables) else otherwise, document, variables)
+    return _OPERATORS[name](*(_evaluate(argument, document, variables) for argument in arguments))
+
+
+def _dotted(document, field):
+    # Campo con puntos ('q.3') -> (diccionario que lo contiene, última llave)
+    *path, key = field.split('.')
+    for part in path:
+        document = document.setdefault(part, {})
+    return document, key
+
+
+class SharedQStore(QStore):
+
+    def __init__(self, backend, cache_size=4096, flush_size=256, flush_interval=2.0, sync_interval=1.0):
+        self.backend = backend
+        self.cache_size = cache_size
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.sync_interval = sync_interval
+        self.cache = OrderedDict()  # estado -> QEntry, o None si el almacén no lo tiene (LRU)
+        self.synced = {}  # estado -> (valores Q, visitas) según la última lectura o envío
+        self.dirty = {}  # estado -> QEntry con cambios sin enviar
+        self.version = backend.version()
+        self.size = backend.count()  # Para len() desde otros hilos (métricas) sin ir al almacén
+        self.last_flush = self.last_sync = time.monotonic()
+
+    def open_client(self):
+        # Otro cliente sobre el mismo almacén, con su propio caché y conexión
+        return SharedQStore(self.backend.open_client(), self.cache_size, self.flush_size, self.flush_interval,
+                            self.sync_interval)
+
+    def _remember(self, key, entry):
+        self.cache[key] = entry
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.cache_size:
+            evicted, _ = self.cache.popitem(last=False)
+            if evicted not in self.dirty:
+                self.synced.pop(evicted, None)
+
+    def get(self, board_state):
+        if time.monotonic() - self.last_sync >= self.sync_interval:
+            self.sync()
+        key = state_text(board_state)
+        entry = self.dirty.get(key)
+        if entry is not None:
+            return entry
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            metrics.inc('shared_store_cache_hits')
+            return self.cache[key]
+        metrics.inc('shared_store_cache_misses')
+        row = self.backend.fetch([key]).get(key)
+        entry = None
+        if row is not None:
+            value_q, visits = row
+            entry = QEntry(board_state, dict(value_q))
+            entry.visits = visits
+            self.synced[key] = (value_q, visits)
+        self._remember(key, entry)
+        return entry
+
+    def insert(self, board_state, value_q):
+        key = state_text(board_state)
+        entry = QEntry(board_state, value_q)
+        previous = self.dirty.get(key) or self.cache.get(key)
+        if previous is not None:
+            entry.visits = previous.visits
+        self._remember(key, entry)
+        self.touch(entry)
+        return entry
+
+    def touch(self, entry):
+        self.dirty[state_text(entry.board_state)] = entry
+        if len(self.dirty) >= self.flush_size or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        # Envía en un solo lote las acciones que cambiaron en cada estado modificado, con las
+        # visitas que tenía al sincronizarse, y se queda con lo que combinó el almacén
+        self.last_flush = time.monotonic()
+        if not self.dirty:
+            return 0
+        updates = []
+        for key, entry in self.dirty.items():
+            value_q, visits = self.synced.get(key, ({}, 0))
+            changed_q = {action: q for action, q in entry.value_q.items() if q != value_q.get(action)}
+            if changed_q or entry.visits != visits:
+                updates.append((key, changed_q, visits, max(entry.visits - visits, 0)))
+        merged = {}
+        if updates:
+            with metrics.timer('shared_store_flush_seconds'):
+                merged = self.backend.apply_updates(updates)
+                self.size = self.backend.count()
+            metrics.inc('shared_store_flushed_states', len(updates))
+        for key, entry in self.dirty.items():
+            if key in merged:
+                # En el mismo objeto: es el que está en el caché
+                value_q, entry.visits = merged[key]
+                entry.value_q.clear()
+                entry.value_q.update(value_q)
+            self.synced[key] = (dict(entry.value_q), entry.visits)
+        self.dirty.clear()
+        return len(updates)
+
+    def sync(self):
+        # Envía lo pendiente y olvida los estados que cambiaron en el almacén desde la última vez
+        self.flush()
+        self.last_sync = time.monotonic()
+        version, changed = self.backend.changed_since(self.version)
+        for key in changed:
+            self.cache.pop(key, None)
+            self.synced.pop(key, None)
+        if changed:
+            metrics.inc('shared_store_invalidations', len(changed))
+            self.size = self.backend.count()
+        self.version = version
+
+    def remove(self, board_state):
+        self.flush()
+        key = state_text(board_state)
+        self.backend.delete(key)
+        self.cache.pop(key, None)
+        self.synced.pop(key, None)
+        self.size = self.backend.count()
+
+    def entries(self):
+        self.flush()
+        for key, value_q, visits in self.backend.iter_all():
+            entry = QEntry(board_from_text(key), value_q)
+            entry.visits = visits
+            yield entry
+
+    def clear(self):
+        self.load_items([])
+
+    def load_items(self, sorted_items):
+        self.dirty.clear()
+        self.backend.replace_all((state_text(board_state), value_q, visits)
+                                 for board_state, value_q, visits in sorted_items)
+        self._forget()
+
+    def _forget(self):
+        self.cache.clear()
+        self.synced.clear()
+        self.version = self.backend.version()
+        self.size = self.backend.count()
+
+    def __len__(self):
+        # Estados del almacén al último envío o sincronización; no envía ni consulta, porque el
+        # hilo de métricas también lo llama y el caché y la conexión son de un solo hilo
+        return self.size
+
+    def as_avl_tree(self):
+        avl_tree = AVLTree()
+        entries = sorted(self.entries(), key=lambda entry: entry.board_state)
+        avl_tree.bulk_load((entry.board_state, entry.value_q, entry.visits) for entry in entries)
+        return avl_tree
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.backend.close()
+
+
+_memory_collections = {}
+
+
+def open_backend(uri):
+    if uri.startswith('mongodb://') or uri.startswith('mongodb+srv://'):
+        from pymongo import MongoClient  # Dependencia opcional, solo con este backend
+
+        def connect():
+            database = MongoClient(uri).get_default_database('tictactoe')
+            return MongoBackend(database['q_values'], database['q_meta'], reopen=connect)
+        return connect()
+    if uri.startswith('memory://'):
+        # Mismo nombre, mismos datos dentro del proceso
+        name = uri[len('memory://'):]
+        if name not in _memory_collections:
+            _memory_collections[name] = (MemoryCollection(), MemoryCollection())
+        collection, meta = _memory_collections[name]
+        return MongoBackend(collection, meta, update_one=MemoryUpdate)
+    return SQLiteBackend(uri)
+
+
+def open_shared_store(uri, **options):
+    logger.info("Tabla Q compartida en %s", uri)
+    return SharedQStore(open_backend(uri), **options)
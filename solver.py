@@ -0,0 +1,197 @@
+import random
+
+from gameState import (EMPTY_INDICES, FULL_MASK, IS_WIN, SYMMETRIES, SYMMETRY_INVERSES, GameState,
+                       canonical_form, decode_state, encode_state)
+
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+def player_to_move(board_state):
+    # El que tenga menos marcas mueve; con el mismo número se asume que empezó 'X', como en la GUI
+    x_count = board_state.count('X')
+    o_count = board_state.count('O')
+    return 'O' if x_count > o_count else 'X'
+
+
+class PerfectPlayTable:
+    # Solucionador exacto del 3x3: negamax con poda alfa-beta y tabla de transposición indexada
+    # por (código canónico, jugador). Las 8 simetrías comparten entrada. Los valores son desde
+    # el punto de vista del jugador que mueve: > 0 gana, 0 empata, < 0 pierde; ganar antes
+    # (con más casillas libres) vale más.
+
+    def __init__(self):
+        self.transpositions = {}  # (código, jugador) -> (valor, tipo de cota)
+        self.moves = {}  # (código canónico, jugador) -> (valores por acción canónica, mejores acciones)
+        self.nodes = 0
+
+    def _key(self, x_mask, o_mask, player):
+        canonical, _ = canonical_form(GameState(x_mask, o_mask).to_tuple())
+        return encode_state(canonical), player
+
+    def _negamax(self, x_mask, o_mask, player, alpha, beta):
+        self.nodes += 1
+        occupied = x_mask | o_mask
+        if occupied == FULL_MASK:
+            return 0
+
+        key = self._key(x_mask, o_mask, player)
+        cached = self.transpositions.get(key)
+        if cached:
+            value, bound = cached
+            if bound == EXACT:
+                return value
+            if bound == LOWER and value >= beta:
+                return value
+            if bound == UPPER and value <= alpha:
+                return value
+
+        original_alpha = alpha
+        best = -10
+        empties = EMPTY_INDICES[occupied]
+        for index in empties:
+            bit = 1 << index
+            if player == 'X':
+                if IS_WIN[x_mask | bit]:
+                    value = len(empties)  # Gana ya: casillas libres restantes + 1
+                else:
+                    value = -self._negamax(x_mask | bit, o_mask, 'O', -beta, -alpha)
+            else:
+                if IS_WIN[o_mask | bit]:
+                    value = len(empties)
+                else:
+                    value = -self._negamax(x_mask, o_mask | bit, 'X', -beta, -alpha)
+            if value > best:
+                best = value
+            if best > alpha:
+                alpha = best
+            if alpha >= beta:
+                break
+
+        if best <= original_alpha:
+            bound = UPPER
+        elif best >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.transpositions[key] = (best, bound)
+        return best
+
+    def _solve_moves(self, canonical, player):
+        key = (encode_state(canonical), player)
+        if key not in self.moves:
+            state = GameState.from_tuple(canonical)
+            values = {}
+            for index in state.empty_indices():
+                child = state.copy()
+                child.set(index, player)
+                if child.winner() == player:
+                    values[index] = len(state.empty_indices())
+                else:
+                    opponent = 'O' if player == 'X' else 'X'
+                    values[index] = -self._negamax(child.x_mask, child.o_mask, opponent, -10, 10)
+            best_value = max(values.values(), default=0)
+            best = tuple(index for index, value in values.items() if value == best_value)
+            self.moves[key] = (values, best)
+        return self.moves[key]
+
+    def move_values(self, board_state, player=None):
+        # Valor exacto de cada jugada legal, en los índices del tablero recibido
+        player = player or player_to_move(board_state)
+        canonical, symmetry = canonical_form(tuple(board_state))
+        values, _ = self._solve_moves(canonical, player)
+        perm = SYMMETRIES[symmetry]
+        return {perm[index]: value for index, value in values.items()}
+
+    def value(self, board_state, player=None):
+        return max(self.move_values(board_state, player).values(), default=0)
+
+    def best_moves(self, board_state, player=None):
+        player = player or player_to_move(board_state)
+        canonical, symmetry = canonical_form(tuple(board_state))
+        _, best = self._solve_moves(canonical, player)
+        perm = SYMMETRIES[symmetry]
+        return [perm[index] for index in best]
+
+    def optimal_moves(self, board_state, player=None):
+        # Jugadas que conservan el resultado teórico (ganar, empatar), sin importar la rapidez
+        values = self.move_values(board_state, player)
+        best = _sign(max(values.values(), default=0))
+        return [index for index, value in values.items() if _sign(value) == best]
+
+    def choose_move(self, board_state, player=None):
+        return random.choice(self.best_moves(board_state, player))
+
+    def precompute(self):
+        # Recorre todos los estados alcanzables empezando con cualquiera de los dos jugadores
+        pending = [(GameState(), 'X'), (GameState(), 'O')]
+        seen = set()
+        while pending:
+            state, player = pending.pop()
+            board_state = state.to_tuple()
+            canonical, _ = canonical_form(board_state)
+            key = (canonical, player)
+            if key in seen or state.winner() or state.is_full():
+                continue
+            seen.add(key)
+            self._solve_moves(canonical, player)
+            opponent = 'O' if player == 'X' else 'X'
+            for index in state.empty_indices():
+                child = state.copy()
+                child.set(index, player)
+                pending.append((child, opponent))
+        return len(self.moves)
+
+
+_perfect_table = None
+
+
+def perfect_play_table():
+    # Tabla de juego perfecto compartida, calculada una sola vez por proceso
+    global _perfect_table
+    if _perfect_table is None:
+        _perfect_table = PerfectPlayTable()
+        _perfect_table.precompute()
+    return _perfect_table
+
+
+def _sign(value):
+    return (value > 0) - (value < 0)
+
+
+def seed_q_store(q_store, table=None, canonical_keys=True):
+    # Maestro: llena la tabla Q con +1 / 0 / -1 según el resultado exacto de cada jugada
+    table = table or perfect_play_table()
+    seeded = 0
+    for (code, player), (values, _) in list(table.moves.items()):
+        board_state = decode_state(code)
+        if player != player_to_move(board_state):
+            continue
+        value_q = {index: float(_sign(value)) for index, value in values.items()}
+        if canonical_keys:
+            q_store.insert(board_state, value_q)
+            seeded += 1
+        else:
+            for perm, inverse in zip(SYMMETRIES, SYMMETRY_INVERSES):
+                variant = tuple(board_state[i] for i in perm)
+                if q_store.get(variant) is None:
+                    q_store.insert(variant, {inverse[index]: q for index, q in value_q.items()})
+                    seeded += 1
+    return seeded
+
+
+def policy_agreement(q_store, table=None):
+    # Fracción de estados guardados donde la mejor jugada según Q es una jugada óptima
+    table = table or perfect_play_table()
+    checked = agreed = 0
+    for entry in q_store.entries():
+        state = GameState.from_tuple(entry.board_state)
+        empties = state.empty_indices()
+        if not empties or state.winner():
+            continue
+        value_q = entry.value_q
+        best_q = max(value_q.get(index, 0) for index in empties)
+        greedy = [index for index in empties if value_q.get(index, 0) == best_q]
+        optimal = set(table.optimal_moves(entry.board_state))
+        checked += 1
+        agreed += all(index in optimal for index in greedy)
+    return (agreed / checked if checked else 0.0), checked
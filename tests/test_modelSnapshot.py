@@ -0,0 +1,69 @@
+import pytest
+
+from avlTree import AVLTree
+from gameState import decode_state
+from modelSnapshot import (HEADER, SnapshotError, iter_snapshot, load_snapshot, save_snapshot,
+                           snapshot_canonical_keys)
+from qMatrix import ArrayQStore
+from qStore import AVLQStore, HashQStore
+
+
+def _sample_store():
+    q_store = HashQStore()
+    for code, visits in ((0, 7), (1, 1), (4, 0), (19682 - 3 ** 4, 12), (1234, 70000)):
+        board_state = decode_state(code)
+        empties = [index for index, mark in enumerate(board_state) if mark == '']
+        entry = q_store.insert(board_state, {index: 0.25 * index - 1 for index in empties[::2]})
+        entry.visits = visits
+    return q_store
+
+
+def _contents(q_store):
+    return sorted((entry.board_state, dict(entry.value_q), entry.visits) for entry in q_store.entries())
+
+
+@pytest.mark.parametrize('make_store', [lambda: AVLQStore(AVLTree()), HashQStore, ArrayQStore])
+def test_save_and_load_round_trip(tmp_path, make_store):
+    original = _sample_store()
+    path = tmp_path / 'model.qtab'
+    assert save_snapshot(original, path) == len(original)
+    loaded = load_snapshot(make_store(), path)
+    assert _contents(loaded) == _contents(original)  # Valores en float32, exactos para múltiplos de 0.25
+
+
+def test_records_are_sorted_by_state(tmp_path):
+    path = tmp_path / 'model.qtab'
+    save_snapshot(_sample_store(), path)
+    states = [board_state for board_state, _, _ in iter_snapshot(path)]
+    assert states == sorted(states)
+
+
+def test_header_records_the_keying_mode(tmp_path):
+    canonical, raw = tmp_path / 'canonical.qtab', tmp_path / 'raw.qtab'
+    save_snapshot(_sample_store(), canonical)
+    save_snapshot(_sample_store(), raw, canonical_keys=False)
+    assert snapshot_canonical_keys(canonical)
+    assert not snapshot_canonical_keys(raw)
+
+
+def test_rejects_truncated_and_foreign_files(tmp_path):
+    path = tmp_path / 'model.qtab'
+    save_snapshot(_sample_store(), path)
+    data = path.read_bytes()
+
+    path.write_bytes(data[:-1])
+    with pytest.raises(SnapshotError):
+        list(iter_snapshot(path))
+
+    path.write_bytes(b'XXXX' + data[4:])
+    with pytest.raises(SnapshotError):
+        list(iter_snapshot(path))
+
+    magic, version, _, count = HEADER.unpack_from(data)
+    path.write_bytes(HEADER.pack(magic, version, 0x8000, count) + data[HEADER.size:])
+    with pytest.raises(SnapshotError):
+        snapshot_canonical_keys(path)
+
+    path.write_bytes(data[:HEADER.size - 1])
+    with pytest.raises(SnapshotError):
+        snapshot_canonical_keys(path)
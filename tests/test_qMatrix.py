@@ -0,0 +1,71 @@
+import random
+
+import pytest
+
+import qMatrix
+from machineAI import MachineIa
+from qMatrix import ArrayQStore
+from qStore import HashQStore
+from training import HeadlessBoard
+
+
+def _transitions(games, seed):
+    # Jugadas de partidas al azar desde el tablero vacío: los primeros estados se repiten
+    # muchas veces dentro de un mismo lote
+    rng = random.Random(seed)
+    transitions = []
+    for _ in range(games):
+        state = [''] * 9
+        player = 'X'
+        for _ in range(rng.randint(1, 9)):
+            action = rng.choice([i for i, mark in enumerate(state) if mark == ''])
+            reward = rng.choice([-1.0, 0.0, 0.5, 1.0])
+            transitions.append((tuple(state), action, reward, rng.random() < 0.3, rng.random() < 0.2))
+            state[action] = player
+            player = 'O' if player == 'X' else 'X'
+    return transitions
+
+
+def _machine(q_store, alpha, batch_updates):
+    machine = MachineIa(HeadlessBoard(q_store))
+    machine.alpha = alpha
+    machine.batch_updates = batch_updates
+    return machine
+
+
+@pytest.mark.parametrize('alpha', [1.0, 0.3])
+@pytest.mark.parametrize('min_round', [1, 16, 10 ** 6])  # Solo rondas numpy, mixto y solo Python
+def test_apply_batch_matches_unbatched_updates(alpha, min_round, monkeypatch):
+    monkeypatch.setattr(qMatrix, '_MIN_ROUND', min_round)
+    transitions = _transitions(300, seed=5)
+    batched = _machine(ArrayQStore(), alpha, batch_updates=True)
+    sequential = _machine(HashQStore(), alpha, batch_updates=False)
+    for transition in transitions:
+        batched.update_q_values(*transition)
+        sequential.update_q_values(*transition)
+    batched.flush_updates()
+
+    assert len(batched.q_store) == len(sequential.q_store)
+    for entry in sequential.q_store.entries():
+        matrix_entry = batched.q_store.get(entry.board_state)
+        assert dict(matrix_entry.value_q) == pytest.approx(dict(entry.value_q), rel=1e-12, abs=1e-12)
+        assert matrix_entry.visits == entry.visits
+
+
+@pytest.mark.parametrize('min_round', [1, 10 ** 6])
+def test_apply_batch_applies_repeated_transitions_in_order(min_round, monkeypatch):
+    monkeypatch.setattr(qMatrix, '_MIN_ROUND', min_round)
+    store = ArrayQStore()
+    state = ('',) * 9
+    code = 0
+    deltas = store.apply_batch([code, code, code], [4, 4, 0], [1.0, 1.0, 0.0], [1.0, 2.0, 0.5], 0.9, 0.5)
+    # Cada transición parte del valor que dejó la anterior
+    first = 1.0 + 0.5 * (1.0 + 0.9 * 1.0 - 1.0)
+    second = first + 0.5 * (2.0 + 0.9 * first - first)
+    third = 0.0 + 0.5 * (0.5 + 0.9 * second - 0.0)
+    entry = store.get(state)
+    assert entry.value_q[4] == pytest.approx(second)
+    assert entry.value_q[0] == pytest.approx(third)
+    assert entry.visits == 3
+    assert list(deltas) == pytest.approx([first - 1.0, second - first, third])
+    assert store.greedy_mask(state) == 1 << 4
@@ -0,0 +1,102 @@
+import threading
+import uuid
+
+import pytest
+
+from machineAI import MachineIa
+from sharedStore import MemoryCollection, MemoryUpdate, MongoBackend, SharedQStore, merge_values, open_shared_store
+from training import HeadlessBoard, run_training, seed_everything
+
+STATE = ('X', '', '', '', 'O', '', '', '', '')
+
+
+def _memory_uri():
+    return f'memory://{uuid.uuid4().hex}'
+
+
+def _learn(store, value, visits):
+    # Lo que hace MachineIa: reemplazar el valor de una acción y sumar visitas
+    entry = store.get(STATE) or store.insert(STATE, {1: 0.0, 2: 0.0})
+    entry.value_q[1] = value
+    entry.visits += visits
+    store.touch(entry)
+
+
+def test_merge_values_keeps_a_lone_update_and_averages_concurrent_ones():
+    # Nadie más escribió desde la lectura: queda el valor enviado
+    assert merge_values({1: 4.0, 2: 1.0}, 10, {1: 9.0}, 10, 5) == ({1: 9.0, 2: 1.0}, 15)
+    # Otro cliente sumó 30 visitas desde la lectura: promedio ponderado por visitas
+    assert merge_values({1: 6.0}, 40, {1: 10.0}, 10, 10) == ({1: 7.0}, 50)
+    # Acción que el almacén no tenía
+    assert merge_values({}, 3, {5: 2.0}, 0, 1) == ({5: 2.0}, 4)
+
+
+@pytest.mark.parametrize('uri', ['sqlite', 'memory'])
+def test_concurrent_clients_average_instead_of_adding(tmp_path, uri):
+    uri = str(tmp_path / 'shared.db') if uri == 'sqlite' else _memory_uri()
+    first = open_shared_store(uri, flush_size=10 ** 6, flush_interval=10 ** 6, sync_interval=10 ** 6)
+    second = first.open_client()
+    _learn(first, 0.0, 0)
+    first.flush()
+    assert second.get(STATE).value_q[1] == 0.0
+    # Los dos reemplazan el mismo valor leído; sumar las diferencias daría 18
+    _learn(first, 8.0, 3)
+    _learn(second, 10.0, 1)
+    first.flush()
+    second.flush()
+    assert second.get(STATE).value_q == {1: 8.5, 2: 0.0}
+    assert second.get(STATE).visits == 4
+    first.sync()
+    assert first.get(STATE).value_q[1] == 8.5
+    first.close()
+    second.close()
+
+
+def test_training_clients_on_sqlite_stay_within_single_client_values(tmp_path):
+    # Dos entrenamientos a la vez sobre el mismo archivo: ningún valor supera el máximo posible
+    # de un cliente solo (recompensa 15 de una victoria)
+    path = str(tmp_path / 'shared.db')
+    stores = [open_shared_store(path, flush_size=64) for _ in range(2)]
+    seed_everything(0)
+
+    def train(store):
+        run_training(MachineIa(HeadlessBoard(store)), 3000)
+
+    threads = [threading.Thread(target=train, args=(store,)) for store in stores]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for store in stores:
+        store.flush()
+    values = [q for entry in stores[0].entries() for q in entry.value_q.values()]
+    assert values and max(values) <= 15 + 1e-9
+    for store in stores:
+        store.close()
+
+
+def test_len_does_not_flush_or_query_the_backend():
+    store = open_shared_store(_memory_uri(), flush_size=10 ** 6, flush_interval=10 ** 6)
+    _learn(store, 1.0, 1)
+    store.backend = None  # Cualquier consulta fallaría
+    assert len(store) == 0
+    assert store.dirty
+
+
+def test_mongo_version_waits_for_writes_in_flight():
+    backend = MongoBackend(MemoryCollection(), MemoryCollection(), update_one=MemoryUpdate)
+    reader = SharedQStore(backend)
+    # Más reservas que cualquier margen fijo mientras el primer envío sigue escribiendo
+    slow = backend._writing()
+    slow_version = slow.__enter__()
+    for _ in range(20):
+        backend.apply_updates([('fast', {0: 1.0}, 0, 1)])
+    assert backend.version() == slow_version - 1
+    reader.sync()
+    reader.get(STATE)  # En caché como ausente
+    backend.collection.bulk_write([MemoryUpdate({'_id': 'X---O----'}, {'$set': {
+        'q': {'1': 3.0}, 'visits': 1, 'version': slow_version}}, upsert=True)])
+    slow.__exit__(None, None, None)
+    assert backend.version() == slow_version + 20
+    reader.sync()
+    assert reader.get(STATE).value_q == {1: 3.0}
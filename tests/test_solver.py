@@ -0,0 +1,69 @@
+from functools import lru_cache
+
+from gameState import GameState
+from qStore import HashQStore
+from solver import PerfectPlayTable, seed_q_store
+
+
+def _winner(board_state):
+    return GameState.from_tuple(board_state).winner()
+
+
+@lru_cache(maxsize=None)
+def _minimax(board_state, player):
+    # Referencia sin poda, sin tabla de transposición y sin simetrías, con la misma escala que
+    # el solucionador: ganar vale las casillas libres antes de la jugada
+    return max(_move_values(board_state, player).values(), default=0)
+
+
+def _move_values(board_state, player):
+    opponent = 'O' if player == 'X' else 'X'
+    empties = [index for index, mark in enumerate(board_state) if mark == '']
+    values = {}
+    for index in empties:
+        child = board_state[:index] + (player,) + board_state[index + 1:]
+        values[index] = len(empties) if _winner(child) == player else -_minimax(child, opponent)
+    return values
+
+
+def _reachable(first_player):
+    pending = [(('',) * 9, first_player)]
+    seen = set()
+    while pending:
+        board_state, player = pending.pop()
+        if (board_state, player) in seen or _winner(board_state) or '' not in board_state:
+            continue
+        seen.add((board_state, player))
+        yield board_state, player
+        opponent = 'O' if player == 'X' else 'X'
+        for index, mark in enumerate(board_state):
+            if mark == '':
+                pending.append((board_state[:index] + (player,) + board_state[index + 1:], opponent))
+
+
+def test_move_values_match_plain_minimax():
+    table = PerfectPlayTable()
+    checked = 0
+    for first_player in ('X', 'O'):
+        for board_state, player in _reachable(first_player):
+            assert table.move_values(board_state, player) == _move_values(board_state, player), board_state
+            checked += 1
+    assert checked > 5000
+
+
+def test_best_moves_keep_the_draw_from_the_empty_board():
+    table = PerfectPlayTable()
+    empty = ('',) * 9
+    assert table.value(empty, 'X') == 0
+    assert set(table.best_moves(empty, 'X')) == set(range(9))  # Todas empatan con juego perfecto
+
+
+def test_raw_seeding_stores_every_symmetric_variant():
+    table = PerfectPlayTable()
+    table.precompute()
+    q_store = HashQStore()
+    seed_q_store(q_store, table, canonical_keys=False)
+    for entry in q_store.entries():
+        expected = {index: float((value > 0) - (value < 0))
+                    for index, value in table.move_values(entry.board_state).items()}
+        assert dict(entry.value_q) == expected
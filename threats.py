@@ -0,0 +1,102 @@
+from gameState import (EMPTY_INDICES, FULL_MASK, IS_WIN, LINES_THROUGH, O_MASK_CODES, STATE_COUNT, WIN_MASKS,
+                       X_MASK_CODES)
+
+# Tablas de amenazas del 3x3 indexadas por el código base 3 del estado (ver encode_state). Se
+# calculan una sola vez al importar el módulo recorriendo los 3^9 pares de máscaras (x, o)
+# disjuntos, de modo que la máquina decide y evalúa jugadas con búsquedas en lugar de simular
+# marcas sobre el tablero.
+#   WIN_CELLS[p][código]:  casillas vacías con las que p completa una línea (en orden ascendente)
+#   FORK_CELLS[p][código]: casillas vacías que, sin ganar todavía, le dejan a p dos o más
+#                          casillas ganadoras
+#   WINNER[código]:        'X', 'O' o None, con la misma prioridad que GameState.winner
+# Las casillas que p debe bloquear son WIN_CELLS[rival de p][código].
+
+# Para cada máscara propia, casillas (ocupadas o no) que completarían alguna línea
+_THREAT_MASK = tuple(sum(1 << i for i in range(9) if not mask >> i & 1 and IS_WIN[mask | 1 << i])
+                     for mask in range(1 << 9))
+_BITS = tuple(EMPTY_INDICES[FULL_MASK & ~mask] for mask in range(1 << 9))  # Casillas de cada máscara
+
+
+def _fork_cells(own, occupied):
+    if not own:
+        return ()  # Con una sola marca no hay dos líneas por completar
+    forks = []
+    for index in EMPTY_INDICES[occupied]:
+        bit = 1 << index
+        if IS_WIN[own | bit]:
+            continue  # Es una jugada ganadora, no una bifurcación
+        threats = _THREAT_MASK[own | bit] & ~(occupied | bit)
+        if threats & (threats - 1):  # Dos o más casillas ganadoras
+            forks.append(index)
+    return tuple(forks)
+
+
+def _build_tables():
+    win_x = [()] * STATE_COUNT
+    win_o = [()] * STATE_COUNT
+    fork_x = [()] * STATE_COUNT
+    fork_o = [()] * STATE_COUNT
+    winner = [None] * STATE_COUNT
+    for x_mask in range(1 << 9):
+        free = FULL_MASK & ~x_mask
+        o_mask = free
+        while True:  # Recorre todas las submáscaras de las casillas que X no ocupa
+            code = X_MASK_CODES[x_mask] + O_MASK_CODES[o_mask]
+            occupied = x_mask | o_mask
+            empty = FULL_MASK & ~occupied
+            win_x[code] = _BITS[_THREAT_MASK[x_mask] & empty]
+            win_o[code] = _BITS[_THREAT_MASK[o_mask] & empty]
+            fork_x[code] = _fork_cells(x_mask, occupied)
+            fork_o[code] = _fork_cells(o_mask, occupied)
+            winner[code] = 'X' if IS_WIN[x_mask] else ('O' if IS_WIN[o_mask] else None)
+            if not o_mask:
+                break
+            o_mask = (o_mask - 1) & free
+    return ({'X': tuple(win_x), 'O': tuple(win_o)}, {'X': tuple(fork_x), 'O': tuple(fork_o)},
+            tuple(winner))
+
+
+WIN_CELLS, FORK_CELLS, WINNER = _build_tables()
+
+
+def opponent_of(player):
+    return 'O' if player == 'X' else 'X'
+
+
+def winning_cells(code, player):
+    return WIN_CELLS[player][code]
+
+
+def blocking_cells(code, player):
+    return WIN_CELLS[opponent_of(player)][code]
+
+
+def fork_cells(code, player):
+    return FORK_CELLS[player][code]
+
+
+def code_after_move(game_state, index, player):
+    # Código del estado tras poner `player` en `index` (reemplazando lo que hubiera), sin copiar
+    # ni modificar el estado
+    keep = ~(1 << index)
+    x_mask = game_state.x_mask & keep
+    o_mask = game_state.o_mask & keep
+    if player == 'X':
+        x_mask |= 1 << index
+    else:
+        o_mask |= 1 << index
+    return X_MASK_CODES[x_mask] + O_MASK_CODES[o_mask]
+
+
+def mixed_lines_after_move(game_state, index, player):
+    # Líneas que pasan por `index` y, tras la jugada, tienen marcas de ambos jugadores y al menos
+    # una casilla libre; igual que code_after_move, sin copiar ni modificar el estado
+    keep = ~(1 << index)
+    x_mask = game_state.x_mask & keep
+    o_mask = game_state.o_mask & keep
+    if player == 'X':
+        x_mask |= 1 << index
+    else:
+        o_mask |= 1 << index
+    occupied = x_mask | o_mask
+    return sum(1 for line in LINES_THROUGH[index] if x_mask & line and o_mask & line and occupied & line != line)
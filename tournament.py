@@ -0,0 +1,322 @@
+import argparse
+import json
+import math
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from gridState import create_game_state
+from machineAI import MachineIa
+from mcts import MonteCarloAgent
+from modelSnapshot import load_snapshot, save_snapshot, snapshot_canonical_keys
+from qStore import create_q_store
+from solver import perfect_play_table
+from threats import FORK_CELLS, WIN_CELLS, code_after_move, opponent_of
+from training import HeadlessBoard, run_training, seed_everything
+
+# Evaluación sin interfaz: partidas entre dos agentes repartidas en procesos, con semillas fijas.
+# Los agentes se describen con texto para poder enviarlos a los workers:
+#   random            casilla libre al azar
+#   heuristic         gana, bloquea, bifurca, bloquea bifurcaciones, centro, esquina, lado
+#   perfect           solucionador exacto (solo 3x3)
+#   qpolicy[:ruta]    política de la tabla Q guardada (por defecto model.qtab), sin exploración
+#   mcts[:iter]       búsqueda Monte Carlo con un número fijo de iteraciones (por defecto 1000)
+# Las partidas se juegan en bloques de CHUNK_GAMES; cada bloque se siembra con su primer índice,
+# así que los resultados no dependen de cuántos workers se usen.
+CHUNK_GAMES = 250
+MODEL_PATH = 'model.qtab'
+AGENTS = ('random', 'heuristic', 'perfect', 'qpolicy', 'mcts')
+CORNERS = (0, 2, 6, 8)
+SIDES = (1, 3, 5, 7)
+
+
+class RandomAgent:
+
+    def __init__(self, rng):
+        self.rng = rng
+
+    def choose_move(self, game_state, player):
+        return self.rng.choice(game_state.empty_indices())
+
+
+class HeuristicAgent:
+    # Reglas clásicas del totito con las tablas de threats.py; en tableros mayores solo gana o
+    # bloquea simulando sobre una copia y si no juega al azar
+
+    def __init__(self, rng):
+        self.rng = rng
+
+    def choose_move(self, game_state, player):
+        opponent = opponent_of(player)
+        empties = game_state.empty_indices()
+        if not game_state.bitboard:
+            for who in (player, opponent):
+                for index in empties:
+                    state = game_state.copy()
+                    state.set(index, who)
+                    if state.winner() == who:
+                        return index
+            return self.rng.choice(empties)
+        code = game_state.encode()
+        for cells in (WIN_CELLS[player][code], WIN_CELLS[opponent][code], FORK_CELLS[player][code]):
+            if cells:
+                return self.rng.choice(cells)
+        forks = FORK_CELLS[opponent][code]
+        if len(forks) == 1:
+            return forks[0]
+        if forks:
+            # Con varias bifurcaciones posibles no alcanza con ocupar una: se fuerza al rival a
+            # bloquear en una casilla que no le dé la bifurcación
+            forcing = [index for index in empties
+                       if self._forced_reply_is_safe(code_after_move(game_state, index, player), player)]
+            return self.rng.choice(forcing or forks)
+        if game_state.is_empty(4):
+            return 4
+        opposite = [8 - corner for corner in CORNERS
+                    if game_state.get(corner) == opponent and game_state.is_empty(8 - corner)]
+        for cells in (opposite, [i for i in CORNERS if game_state.is_empty(i)]):
+            if cells:
+                return self.rng.choice(cells)
+        return self.rng.choice([i for i in SIDES if game_state.is_empty(i)])
+
+
+    @staticmethod
+    def _forced_reply_is_safe(code, player):
+        replies = WIN_CELLS[player][code]
+        return len(replies) == 1 and replies[0] not in FORK_CELLS[opponent_of(player)][code]
+
+
+class PerfectAgent:
+
+    def choose_move(self, game_state, player):
+        return perfect_play_table().choose_move(game_state.to_tuple(), player)
+
+
+class QPolicyAgent:
+    # Juega como MachineIa en la interfaz (gana, bloquea y si no sigue la tabla Q) pero sin
+    # exploración, y nunca actualiza la tabla
+
+    def __init__(self, q_store, canonical_keys=True):
+        self.board = HeadlessBoard(q_store)
+        self.machine = MachineIa(self.board)
+        self.machine.canonical_keys = canonical_keys
+        self.machine.epsilon = 0
+        self.machine.exploration_rate = 0
+
+    def choose_move(self, game_state, player):
+        self.board.game_state = game_state
+        self.board.turn = player
+        return self.machine.block_opponent_win(list(game_state.empty_indices()), game_state.to_tuple())
+
+
+def create_agent(spec, seed=None):
+    name, _, argument = spec.partition(':')
+    rng = random.Random(seed)
+    if name == 'random':
+        return RandomAgent(rng)
+    if name == 'heuristic':
+        return HeuristicAgent(rng)
+    if name == 'perfect':
+        return PerfectAgent()
+    if name == 'qpolicy':
+        q_store = create_q_store('hash')
+        path = argument or MODEL_PATH
+        load_snapshot(q_store, path)
+        return QPolicyAgent(q_store, snapshot_canonical_keys(path))
+    if name == 'mcts':
+        return MonteCarloAgent(time_budget=None, iterations=int(argument or 1000), seed=seed)
+    raise ValueError(f"Agente desconocido: {spec} (opciones: {', '.join(AGENTS)})")
+
+
+def check_agent(spec, size=3, win_length=None):
+    # Valida la descripción antes de lanzar procesos, para fallar con un mensaje claro
+    name, _, argument = spec.partition(':')
+    if name not in AGENTS:
+        raise ValueError(f"Agente desconocido: {spec} (opciones: {', '.join(AGENTS)})")
+    if name in ('perfect', 'qpolicy') and (size, win_length or size) != (3, 3):
+        raise ValueError(f"El agente {spec} solo juega en el tablero 3x3")
+    if name == 'qpolicy' and not os.path.exists(argument or MODEL_PATH):
+        raise ValueError(f"No existe el modelo {argument or MODEL_PATH}")
+    if name == 'mcts' and argument and not argument.isdigit():
+        raise ValueError(f"Las iteraciones de {spec} deben ser un entero")
+
+
+def play_game(agent_x, agent_o, size=3, win_length=None):
+    # Devuelve 'X', 'O' o 'draw'; X siempre mueve primero
+    game_state = create_game_state(size, win_length)
+    agents = {'X': agent_x, 'O': agent_o}
+    player = 'X'
+    while True:
+        game_state.set(agents[player].choose_move(game_state, player), player)
+        winner = game_state.winner()
+        if winner:
+            return winner
+        if game_state.is_full():
+            return 'draw'
+        player = opponent_of(player)
+
+
+def _play_chunk(spec_a, spec_b, first_game, games, seed, size, win_length):
+    # Partidas first_game .. first_game + games - 1; A juega con X en las pares y con O en las
+    # impares. Las semillas dependen solo del bloque para que el resultado sea reproducible.
+    chunk_seed = seed * 1_000_003 + first_game
+    seed_everything(chunk_seed)  # MachineIa y el solucionador usan el random global
+    agent_a = create_agent(spec_a, chunk_seed)
+    agent_b = create_agent(spec_b, chunk_seed + 1)
+    counts = {'wins': 0, 'draws': 0, 'losses': 0, 'wins_as_x': 0, 'wins_as_o': 0}
+    for game in range(first_game, first_game + games):
+        a_is_x = game % 2 == 0
+        for agent in (agent_a, agent_b):
+            if hasattr(agent, 'reset'):
+                agent.reset()
+        result = play_game(*((agent_a, agent_b) if a_is_x else (agent_b, agent_a)), size, win_length)
+        if result == 'draw':
+            counts['draws'] += 1
+        elif (result == 'X') == a_is_x:
+            counts['wins'] += 1
+            counts['wins_as_x' if a_is_x else 'wins_as_o'] += 1
+        else:
+            counts['losses'] += 1
+    return counts
+
+
+def wilson_interval(successes, total, z=1.96):
+    # Intervalo de confianza de Wilson para una proporción (95% con z=1.96)
+    if not total:
+        return 0.0, 1.0
+    p = successes / total
+    denominator = 1 + z * z / total
+    center = (p + z * z / (2 * total)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / total + z * z / (4 * total * total)) / denominator
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+def run_match(spec_a, spec_b, games=1000, workers=1, seed=0, size=3, win_length=None, pool=None):
+    # Resultados desde el punto de vista de A, con intervalos de confianza por proporción
+    for spec in (spec_a, spec_b):
+        check_agent(spec, size, win_length)
+    chunks = [(start, min(CHUNK_GAMES, games - start)) for start in range(0, games, CHUNK_GAMES)]
+    start = time.perf_counter()
+    if workers > 1 or pool is not None:
+        own_pool = pool is None
+        pool = pool or ProcessPoolExecutor(max_workers=workers)
+        try:
+            futures = [pool.submit(_play_chunk, spec_a, spec_b, first, count, seed, size, win_length)
+                       for first, count in chunks]
+            parts = [future.result() for future in futures]
+        finally:
+            if own_pool:
+                pool.shutdown()
+    else:
+        parts = [_play_chunk(spec_a, spec_b, first, count, seed, size, win_length) for first, count in chunks]
+    elapsed = time.perf_counter() - start
+    totals = {key: sum(part[key] for part in parts) for key in parts[0]} if parts else {}
+    report = {'agent': spec_a, 'opponent': spec_b, 'games': games, 'seed': seed, 'seconds': elapsed,
+              'games_per_sec': games / elapsed if elapsed else None}
+    report.update(totals)
+    for key in ('wins', 'draws', 'losses'):
+        count = totals.get(key, 0)
+        report[f'{key}_rate'] = count / games if games else 0.0
+        report[f'{key}_ci'] = wilson_interval(count, games)
+    return report
+
+
+def strength_curve(episodes, checkpoints, opponents, games=1000, workers=1, seed=0, epsilon_start=0.3,
+                   epsilon_end=0.05, gamma=0.9, report=None):
+    # Entrena por auto-juego en `checkpoints` tramos iguales y después de cada uno evalúa la
+    # política contra cada oponente. train_seconds cuenta solo el tiempo de entrenamiento, así
+    # que la curva muestra cuánta fuerza se compra con cada segundo.
+    seed_everything(seed)
+    board = HeadlessBoard(create_q_store('hash'))
+    machine = MachineIa(board)
+    machine.gamma = gamma
+    rows = []
+    trained = 0
+    train_seconds = 0.0
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    with tempfile.TemporaryDirectory(prefix='curve-') as directory:
+        try:
+            for checkpoint in range(1, checkpoints + 1):
+                target = episodes * checkpoint // checkpoints
+                seed_everything(seed + checkpoint)
+                elapsed, _ = run_training(machine, target - trained, epsilon_start, epsilon_end,
+                                          schedule_offset=trained, schedule_total=episodes)
+                trained = target
+                train_seconds += elapsed
+                path = os.path.join(directory, f'checkpoint-{checkpoint}.qtab')
+                save_snapshot(board.q_store, path, machine.canonical_keys)
+                row = {'episodes': trained, 'train_seconds': train_seconds, 'states': len(board.q_store),
+                       'matches': {}}
+                for opponent in opponents:
+                    row['matches'][opponent] = run_match(f'qpolicy:{path}', opponent, games, workers, seed,
+                                                         pool=pool)
+                rows.append(row)
+                if report:
+                    report(row)
+        finally:
+            if pool:
+                pool.shutdown()
+    return rows
+
+
+def format_match(report):
+    low, high = report['wins_ci']
+    return (f"{report['agent']} vs {report['opponent']}: {report['games']} juegos, "
+            f"gana {report['wins_rate']:.1%} [{low:.1%}, {high:.1%}], "
+            f"empata {report['draws_rate']:.1%}, pierde {report['losses_rate']:.1%}, "
+            f"{report['games_per_sec']:.0f} juegos/s")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Partidas entre agentes y curva de fuerza contra tiempo de entrenamiento")
+    commands = parser.add_subparsers(dest='command', required=True)
+    match = commands.add_parser('match', help="Enfrenta dos agentes")
+    match.add_argument('agent', help=f"Agente evaluado ({', '.join(AGENTS)}; qpolicy:ruta, mcts:iteraciones)")
+    match.add_argument('opponent', help="Agente rival")
+    match.add_argument('--size', type=int, default=3, help="Lado del tablero (N x N)")
+    match.add_argument('--win-length', type=int, default=None,
+                       help="Marcas seguidas necesarias para ganar (por defecto, el lado del tablero)")
+    curve = commands.add_parser('curve', help="Entrena y evalúa la política en varios puntos del entrenamiento")
+    curve.add_argument('--episodes', type=int, default=50000, help="Juegos de entrenamiento en total")
+    curve.add_argument('--checkpoints', type=int, default=10, help="Evaluaciones a lo largo del entrenamiento")
+    curve.add_argument('--opponents', nargs='+', default=['random', 'perfect'], help="Rivales en cada evaluación")
+    curve.add_argument('--epsilon-start', type=float, default=0.3, help="Exploración al inicio del entrenamiento")
+    curve.add_argument('--epsilon-end', type=float, default=0.05, help="Exploración al final del entrenamiento")
+    curve.add_argument('--gamma', type=float, default=0.9, help="Factor de descuento de los valores Q")
+    for command in (match, curve):
+        command.add_argument('--games', type=int, default=1000, help="Partidas por enfrentamiento")
+        command.add_argument('--workers', type=int, default=1, help="Procesos que juegan en paralelo")
+        command.add_argument('--seed', type=int, default=0)
+        command.add_argument('--output', default=None, help="Guarda el resultado en JSON")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == 'match':
+        try:
+            result = run_match(args.agent, args.opponent, args.games, args.workers, args.seed, args.size,
+                               args.win_length)
+        except ValueError as error:
+            parser.error(str(error))
+        print(format_match(result))
+    else:
+        def report(row):
+            matches = '  '.join(f"{name}: +{match['wins_rate']:.0%} ={match['draws_rate']:.0%} "
+                                f"-{match['losses_rate']:.0%}" for name, match in row['matches'].items())
+            print(f"{row['episodes']:>8} juegos {row['train_seconds']:>8.2f}s {row['states']:>6} estados  {matches}")
+
+        result = strength_curve(args.episodes, args.checkpoints, args.opponents, args.games, args.workers,
+                                args.seed, args.epsilon_start, args.epsilon_end, args.gamma, report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+            f.write('\n')
+    return result
+
+
+if __name__ == '__main__':
+    main()
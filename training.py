@@ -0,0 +1,381 @@
+import argparse
+import logging
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from gridState import create_game_state
+from machineAI import MachineIa
+from qStore import AVLQStore, Q_STORES, create_q_store
+from modelSnapshot import load_snapshot, save_snapshot, snapshot_canonical_keys
+from solver import policy_agreement, seed_q_store
+from gameLog import GameLogWriter, GameRecorder
+from instrumentation import MetricsReporter, metrics, profiled, track_q_store
+from convergence import Convergence
+from sharedStore import open_shared_store
+
+logger = logging.getLogger(__name__)
+
+
+class HeadlessBoard:
+    # Contexto de tablero sin interfaz grafica. Expone la misma API de BoardManager que usa
+    # MachineIa, de modo que el entrenamiento corre sin tk.Tk() ni pantalla.
+
+    def __init__(self, q_store=None, size=3, win_length=None):
+        self.q_store = q_store if q_store is not None else AVLQStore()
+        self.game_state = create_game_state(size, win_length)
+        self.turn = 'X'
+        self.score_x = 0
+        self.score_o = 0
+        self.draws = 0
+
+    def reset_game(self, silent=False):
+        self.turn = 'X'
+        self.game_state.reset()
+
+    def winner(self):
+        return self.game_state.winner()
+
+    def place_mark(self, index, player):
+        self.game_state.set(index, player)
+
+    def sync_buttons(self):
+        pass
+
+    def refresh_display(self):
+        pass
+
+    def get_board_state(self):
+        return self.game_state.to_tuple()
+
+    def update_score(self, winner):
+        if winner == 'X':
+            self.score_x += 1
+        elif winner == 'O':
+            self.score_o += 1
+
+    def update_scores(self):
+        pass
+
+
+SCHEDULES = ('constant', 'linear', 'exponential')
+
+
+def scheduled_value(kind, start, end, episode, episodes):
+    # Valor de un parámetro (exploración, tasa de aprendizaje) en el episodio `episode`:
+    #   constant:    siempre start
+    #   linear:      de start a end en línea recta
+    #   exponential: de start a end multiplicando por el mismo factor en cada episodio
+    if kind == 'constant':
+        return start
+    if episodes <= 1:
+        return end
+    fraction = min(episode / (episodes - 1), 1.0)
+    if kind == 'exponential' and start > 0 and end > 0:
+        return start * (end / start) ** fraction
+    return start + (end - start) * fraction
+
+
+def seed_everything(seed):
+    # MachineIa, el solucionador y la exploración usan solo el módulo random
+    random.seed(seed)
+
+
+def run_training(machine, episodes, epsilon_start=0.05, epsilon_end=0.05, report_every=0, report=None,
+                 schedule_offset=0, schedule_total=None, epsilon_schedule='linear', alpha_start=None,
+                 alpha_end=None, alpha_schedule='constant', convergence=None):
+    # schedule_offset/schedule_total ubican este tramo dentro de un entrenamiento mayor (modo paralelo).
+    # Sin alpha_start la tasa de aprendizaje de la máquina no se toca. Con `convergence` se cierra
+    # un lote cada convergence.batch_episodes episodios y el entrenamiento termina antes si la
+    # política se estabilizó (convergence.stopped_at indica en qué episodio).
+    schedule_total = schedule_total or episodes
+    alpha_end = alpha_start if alpha_end is None else alpha_end
+    machine.convergence = convergence
+    results = {'X': 0, 'O': 0, 'draw': 0}
+    use_x = True
+    played = 0
+    start = time.perf_counter()
+    for episode in range(episodes):
+        played += 1
+        machine.exploration_rate = scheduled_value(epsilon_schedule, epsilon_start, epsilon_end,
+                                                   schedule_offset + episode, schedule_total)
+        if alpha_start is not None:
+            machine.alpha = scheduled_value(alpha_schedule, alpha_start, alpha_end,
+                                            schedule_offset + episode, schedule_total)
+        if metrics.enabled:
+            episode_start = time.perf_counter()
+            result = machine.simulate_game(use_x)
+            metrics.observe('training_episode_seconds', time.perf_counter() - episode_start)
+            metrics.inc('training_episodes')
+        else:
+            result = machine.simulate_game(use_x)
+        if result:
+            results[result] += 1
+        use_x = not use_x
+        if report and report_every and (episode + 1) % report_every == 0:
+            elapsed = time.perf_counter() - start
+            metrics.set_gauge('training_episodes_per_second', (episode + 1) / elapsed if elapsed else 0)
+            report(episode + 1, elapsed, results)
+        if convergence and (episode + 1) % convergence.batch_episodes == 0:
+            machine.flush_updates()
+            row = convergence.end_batch(schedule_offset + episode + 1, machine.q_store)
+            metrics.set_gauge('training_policy_churn', row['churn'])
+            metrics.set_gauge('training_max_delta_q', row['max_delta'])
+            if convergence.should_stop():
+                convergence.stopped_at = schedule_offset + episode + 1
+                break
+    machine.flush_updates()
+    machine.convergence = None
+    elapsed = time.perf_counter() - start
+    metrics.set_gauge('training_episodes_per_second', played / elapsed if elapsed else 0)
+    return elapsed, results
+
+
+def export_table(q_store):
+    # Copia serializable de la tabla Q: estado -> (valores Q, visitas)
+    return {node.board_state: (dict(node.value_q), node.visits) for node in q_store.entries()}
+
+
+def load_table(q_store, table):
+    for state, (value_q, visits) in table.items():
+        node = q_store.get(state)
+        if not node:
+            node = q_store.insert(state, dict(value_q))
+        else:
+            node.value_q = dict(value_q)
+        node.visits = visits
+
+
+def merge_tables(q_store, worker_tables, merge='visits'):
+    # Combina las tablas locales de cada worker en la tabla principal. Solo participan los
+    # workers que visitaron el estado en esta ronda; 'mean' promedia sus valores Q y 'visits'
+    # los pondera por las visitas que cada worker aportó.
+    collected = {}
+    for table in worker_tables:
+        for state, (value_q, visits) in table.items():
+            collected.setdefault(state, []).append((value_q, visits))
+
+    merged = {}
+    for state, entries in collected.items():
+        current = q_store.get(state)
+        base_visits = current.visits if current else 0
+        actions = set()
+        for value_q, _ in entries:
+            actions.update(value_q)
+        value_q = {}
+        for action in actions:
+            if merge == 'mean':
+                values = [q.get(action, 0) for q, _ in entries]
+                value_q[action] = sum(values) / len(values)
+            else:
+                total = sum(visits for _, visits in entries)
+                value_q[action] = sum(q.get(action, 0) * visits for q, visits in entries) / total
+        merged[state] = (value_q, base_visits + sum(visits for _, visits in entries))
+    load_table(q_store, merged)
+
+
+def _self_play_worker(table, store_kind, episodes, schedule_offset, schedule_total, epsilon_start, epsilon_end,
+                      gamma, seed, canonical_keys, batch_updates=False, schedules=None):
+    seed_everything(seed)
+    board = HeadlessBoard(create_q_store(store_kind))
+    load_table(board.q_store, table)
+    machine = MachineIa(board)
+    machine.gamma = gamma
+    machine.canonical_keys = canonical_keys
+    machine.batch_updates = batch_updates
+    _, results = run_training(machine, episodes, epsilon_start, epsilon_end,
+                              schedule_offset=schedule_offset, schedule_total=schedule_total, **(schedules or {}))
+
+    # Devuelve solo los estados actualizados en esta ronda, con las visitas nuevas
+    touched = {}
+    for node in board.q_store.entries():
+        previous_visits = table[node.board_state][1] if node.board_state in table else 0
+        if node.visits > previous_visits:
+            touched[node.board_state] = (node.value_q, node.visits - previous_visits)
+    return touched, results
+
+
+def run_parallel_training(q_store, episodes, workers, sync_interval=5000, merge='visits',
+                          epsilon_start=0.05, epsilon_end=0.05, gamma=0.9, seed=None, report=None,
+                          store_kind='hash', canonical_keys=True, batch_updates=False, schedules=None):
+    # Reparte los episodios entre procesos. Cada worker juega sync_interval episodios sobre
+    # su copia local de la tabla y luego se fusionan los resultados en q_store. `schedules` lleva
+    # los argumentos de calendario de run_training (epsilon_schedule, alpha_start, ...).
+    base_seed = seed if seed is not None else random.randrange(2 ** 31)
+    results = {'X': 0, 'O': 0, 'draw': 0}
+    done = 0
+    sync_round = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while done < episodes:
+            table = export_table(q_store)
+            futures = []
+            offset = done
+            for worker in range(workers):
+                count = min(sync_interval, episodes - offset)
+                if count <= 0:
+                    break
+                futures.append(pool.submit(_self_play_worker, table, store_kind, count, offset, episodes,
+                                           epsilon_start, epsilon_end, gamma,
+                                           base_seed + sync_round * workers + worker, canonical_keys,
+                                           batch_updates, schedules))
+                offset += count
+            worker_tables = []
+            for future in futures:
+                touched, worker_results = future.result()
+                worker_tables.append(touched)
+                for key, value in worker_results.items():
+                    results[key] += value
+            merge_tables(q_store, worker_tables, merge)
+            done = offset
+            sync_round += 1
+            if report:
+                report(done, time.perf_counter() - start, results)
+    return time.perf_counter() - start, results
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Entrenamiento por auto-juego sin interfaz grafica")
+    parser.add_argument('--episodes', type=int, default=10000, help="Número de juegos simulados")
+    parser.add_argument('--epsilon-start', type=float, default=0.05, help="Exploración al inicio del entrenamiento")
+    parser.add_argument('--epsilon-end', type=float, default=0.05, help="Exploración al final del entrenamiento")
+    parser.add_argument('--epsilon-schedule', choices=SCHEDULES, default='linear',
+                        help="Forma en que la exploración pasa de --epsilon-start a --epsilon-end")
+    parser.add_argument('--alpha', type=float, default=1.0,
+                        help="Tasa de aprendizaje al inicio (1 reemplaza el valor Q por el objetivo)")
+    parser.add_argument('--alpha-end', type=float, default=None,
+                        help="Tasa de aprendizaje al final (por defecto, la misma que --alpha)")
+    parser.add_argument('--alpha-schedule', choices=SCHEDULES, default='linear',
+                        help="Forma en que la tasa de aprendizaje pasa de --alpha a --alpha-end")
+    parser.add_argument('--gamma', type=float, default=0.9, help="Factor de descuento de los valores Q")
+    parser.add_argument('--seed', type=int, default=None, help="Semilla para resultados reproducibles")
+    parser.add_argument('--report-every', type=int, default=10000, help="Episodios entre reportes de progreso (0 desactiva)")
+    parser.add_argument('--workers', type=int, default=1, help="Procesos de auto-juego en paralelo")
+    parser.add_argument('--sync-interval', type=int, default=5000,
+                        help="Episodios por worker entre cada fusión de tablas Q")
+    parser.add_argument('--merge', choices=('mean', 'visits'), default='visits',
+                        help="Fusión de tablas: promedio simple o ponderado por visitas")
+    parser.add_argument('--store', choices=sorted(Q_STORES), default='hash',
+                        help="Backend de la tabla Q: árbol AVL o tabla hash por código de estado")
+    parser.add_argument('--no-symmetry', action='store_true',
+                        help="Guarda cada rotación/reflexión como un estado distinto")
+    parser.add_argument('--batch-updates', action='store_true',
+                        help="Acumula transiciones y las aplica en lote (requiere --store array)")
+    parser.add_argument('--batch-episodes', type=int, default=0,
+                        help="Episodios por lote para medir |ΔQ| y la rotación de la política (0 desactiva)")
+    parser.add_argument('--early-stop', action='store_true',
+                        help="Termina cuando la política se estabiliza (lotes de 1000 si no se indica --batch-episodes)")
+    parser.add_argument('--patience', type=int, default=5, help="Lotes estables seguidos necesarios para detenerse")
+    parser.add_argument('--churn-threshold', type=float, default=0.01,
+                        help="Rotación máxima de la política en un lote estable")
+    parser.add_argument('--delta-threshold', type=float, default=None,
+                        help="|ΔQ| máximo en un lote estable (por defecto no se exige)")
+    parser.add_argument('--shared-store', default=None,
+                        help="Entrena sobre una tabla Q compartida (archivo SQLite o mongodb://...) en lugar de --store")
+    parser.add_argument('--input', default=None, help="Modelo guardado desde el cual continuar el entrenamiento")
+    parser.add_argument('--output', default=None, help="Archivo donde guardar el modelo entrenado")
+    parser.add_argument('--seed-from-solver', action='store_true',
+                        help="Inicializa la tabla Q con los resultados exactos del solucionador")
+    parser.add_argument('--check-policy', action='store_true',
+                        help="Compara la política aprendida con el juego perfecto al terminar")
+    parser.add_argument('--log-dir', default=None,
+                        help="Guarda cada partida simulada en el registro de partidas de esta carpeta")
+    parser.add_argument('--size', type=int, default=3, help="Lado del tablero (N x N)")
+    parser.add_argument('--win-length', type=int, default=None,
+                        help="Marcas seguidas necesarias para ganar (por defecto, el lado del tablero)")
+    parser.add_argument('--metrics', default=None,
+                        help="Activa las métricas y las escribe en este archivo (.prom para Prometheus, si no JSON)")
+    parser.add_argument('--metrics-interval', type=float, default=10.0, help="Segundos entre escrituras de métricas")
+    parser.add_argument('--profile', default=None, help="Guarda un perfil de cProfile del entrenamiento")
+    parser.add_argument('--verbose', action='store_true', help="Muestra el registro de depuración de MachineIa")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if (args.size, args.win_length or args.size) != (3, 3):
+        # Modelos guardados, solucionador, matriz Q y workers asumen el 3x3 clásico
+        unsupported = [flag for flag, used in (('--input', args.input), ('--output', args.output),
+                                               ('--seed-from-solver', args.seed_from_solver),
+                                               ('--check-policy', args.check_policy),
+                                               ('--log-dir', args.log_dir), ('--workers', args.workers > 1),
+                                               ('--store array', args.store == 'array')) if used]
+        if unsupported:
+            parser.error(f"{', '.join(unsupported)} solo admite el tablero 3x3")
+    if args.workers > 1 and (args.early_stop or args.batch_episodes):
+        parser.error("--early-stop y --batch-episodes solo admiten un worker")
+    if args.shared_store and (args.workers > 1 or args.batch_updates):
+        # Para entrenar en paralelo sobre la tabla compartida se lanzan varios procesos de training
+        parser.error("--shared-store no admite --workers ni --batch-updates")
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING)
+    if args.seed is not None:
+        seed_everything(args.seed)
+
+    q_store = open_shared_store(args.shared_store) if args.shared_store else create_q_store(args.store)
+    board = HeadlessBoard(q_store, args.size, args.win_length)
+    if args.input:
+        if snapshot_canonical_keys(args.input) == args.no_symmetry:
+            parser.error(f"{args.input} se entrenó {'con' if args.no_symmetry else 'sin'} simetrías; "
+                         f"{'quita' if args.no_symmetry else 'agrega'} --no-symmetry para continuarlo")
+        load_snapshot(board.q_store, args.input)
+    if args.seed_from_solver:
+        seeded = seed_q_store(board.q_store, canonical_keys=not args.no_symmetry)
+        print(f"Tabla Q inicializada con {seeded} estados del solucionador")
+    machine = MachineIa(board)
+    machine.gamma = args.gamma
+    machine.canonical_keys = not args.no_symmetry
+    machine.batch_updates = args.batch_updates
+    if args.log_dir:
+        machine.game_recorder = GameRecorder(GameLogWriter(args.log_dir))
+    reporter = None
+    if args.metrics:
+        metrics.enable()
+        track_q_store(lambda: board.q_store)
+        reporter = MetricsReporter(args.metrics, args.metrics_interval).start()
+
+    def report(done, elapsed, results):
+        print(f"{done}/{args.episodes} juegos, {done / elapsed:.0f} juegos/s, "
+              f"X: {results['X']} O: {results['O']} empates: {results['draw']}")
+
+    def report_batch(row):
+        print(f"lote hasta {row['episodes']}: |ΔQ| máx {row['max_delta']:.4f} medio {row['mean_delta']:.4f}, "
+              f"rotación de la política {row['churn']:.2%}, {row['states']} estados")
+
+    convergence = None
+    if args.early_stop or args.batch_episodes:
+        convergence = Convergence(args.batch_episodes or 1000, args.patience if args.early_stop else None,
+                                  args.churn_threshold, args.delta_threshold, report_batch)
+    schedules = {'epsilon_schedule': args.epsilon_schedule, 'alpha_start': args.alpha, 'alpha_end': args.alpha_end,
+                 'alpha_schedule': args.alpha_schedule}
+
+    with profiled(args.profile):
+        if args.workers > 1:
+            elapsed, results = run_parallel_training(board.q_store, args.episodes, args.workers, args.sync_interval,
+                                                     args.merge, args.epsilon_start, args.epsilon_end, args.gamma,
+                                                     args.seed, report, args.store, not args.no_symmetry,
+                                                     args.batch_updates, schedules)
+        else:
+            elapsed, results = run_training(machine, args.episodes, args.epsilon_start, args.epsilon_end,
+                                            args.report_every, report, convergence=convergence, **schedules)
+    played = convergence.stopped_at if convergence and convergence.stopped_at else args.episodes
+    games_per_sec = played / elapsed if elapsed else float('inf')
+    if reporter:
+        metrics.set_gauge('training_episodes_per_second', games_per_sec)
+        reporter.stop()
+    if convergence and convergence.stopped_at:
+        print(f"La política se estabilizó: se detuvo en {played} de {args.episodes} juegos")
+    print(f"Entrenamiento completado: {played} juegos en {elapsed:.2f}s ({games_per_sec:.0f} juegos/s)")
+    print(f"Estados aprendidos: {len(board.q_store)}, mejor valor Q: {machine.get_best_q_value():.2f}")
+    if args.check_policy:
+        agreement, checked = policy_agreement(board.q_store)
+        print(f"Coincidencia con el juego perfecto: {agreement:.1%} de {checked} estados")
+    if args.output:
+        saved = save_snapshot(board.q_store, args.output, machine.canonical_keys)
+        print(f"Modelo guardado en {args.output} ({saved} estados)")
+    board.q_store.close()
+    return board.q_store
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+import queue
+import threading
+import time
+
+from convergence import Convergence
+from instrumentation import metrics, profiled
+from machineAI import MachineIa
+from qStore import AVLQStore, HashQStore
+from training import HeadlessBoard
+
+
+def copy_q_store(q_store):
+    # Copia independiente de la tabla Q del mismo tipo que usa el juego: árbol AVL en el 3x3 y
+    # tabla hash en tableros mayores. Los diccionarios de valores Q también se copian. Con la
+    # tabla compartida no se copia nada: el entrenamiento es un cliente más del mismo almacén y
+    # envía lo aprendido mientras juega (al cancelar, lo aprendido hasta ahí se conserva).
+    if hasattr(q_store, 'open_client'):
+        return q_store.open_client()
+    entries = [(entry.board_state, dict(entry.value_q), entry.visits) for entry in q_store.entries()]
+    entries.sort(key=lambda item: item[0])
+    copy = AVLQStore() if isinstance(q_store, AVLQStore) else HashQStore()
+    copy.load_items(entries)
+    return copy
+
+
+class TrainingJob:
+    # Entrenamiento por auto-juego en un hilo aparte. Trabaja sobre una copia de la tabla Q, así
+    # que el juego sigue usando el modelo actual mientras tanto. El progreso se publica en
+    # `messages` para que la interfaz lo lea con root.after; cancel() pide detenerse y el hilo
+    # lo revisa entre partida y partida. Al terminar, `q_store` tiene el modelo entrenado y
+    # quien lo lanzó decide si reemplaza el modelo en uso. Si la política se estabiliza antes
+    # de jugar todos los episodios, el entrenamiento termina ahí (stats['stopped_early']).
+
+    def __init__(self, machine, episodes, report_interval=0.2, profile_path=None, batch_episodes=500):
+        board = machine.boardContext
+        self.episodes = episodes
+        self.profile_path = profile_path  # Perfil de cProfile del hilo de entrenamiento
+        self.report_interval = report_interval
+        self.q_store = copy_q_store(machine.q_store)
+        self.board = HeadlessBoard(self.q_store, board.game_state.size, board.game_state.win_length)
+        self.machine = MachineIa(self.board)
+        self.machine.gamma = machine.gamma
+        self.machine.alpha = machine.alpha
+        self.machine.epsilon = machine.epsilon
+        self.machine.exploration_rate = machine.exploration_rate
+        self.machine.canonical_keys = machine.canonical_keys
+        self.convergence = Convergence(batch_episodes)
+        self.messages = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='training-job', daemon=True)
+        self.status = 'pending'  # pending, running, done, cancelled o error
+
+    def start(self):
+        self.status = 'running'
+        self.thread.start()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def is_running(self):
+        return self.thread.is_alive()
+
+    def _stats(self, done, elapsed, results, best_q_before):
+        finished = sum(results.values())
+        return {
+            'done': done,
+            'total': self.episodes,
+            'games_per_sec': done / elapsed if elapsed else 0.0,
+            'x_rate': results['X'] / finished if finished else 0.0,
+            'o_rate': results['O'] / finished if finished else 0.0,
+            'draw_rate': results['draw'] / finished if finished else 0.0,
+            'q_delta': self.machine.get_best_q_value() - best_q_before,
+            'states': len(self.q_store),
+            'churn': self.convergence.history[-1]['churn'] if self.convergence.history else None,
+            'stopped_early': self.convergence.stopped_at is not None,
+        }
+
+    def _run(self):
+        # cProfile solo ve el hilo donde se activa, por eso el perfil se toma aquí
+        with profiled(self.profile_path):
+            self._train()
+
+    def _train(self):
+        results = {'X': 0, 'O': 0, 'draw': 0}
+        done = 0
+        try:
+            best_q_before = self.machine.get_best_q_value()
+            self.machine.convergence = self.convergence
+            start = last_report = time.perf_counter()
+            use_x = True
+            while done < self.episodes and not self.cancel_event.is_set():
+                result = self.machine.simulate_game(use_x)
+                if result:
+                    results[result] += 1
+                use_x = not use_x
+                done += 1
+                metrics.inc('training_episodes')
+                if done % self.convergence.batch_episodes == 0:
+                    self.machine.flush_updates()
+                    self.convergence.end_batch(done, self.q_store)
+                    if self.convergence.should_stop():
+                        self.convergence.stopped_at = done
+                        break
+                now = time.perf_counter()
+                if now - last_report >= self.report_interval:
+                    last_report = now
+                    metrics.set_gauge('training_episodes_per_second', done / (now - start))
+                    self.messages.put(('progress', self._stats(done, now - start, results, best_q_before)))
+            self.machine.flush_updates()
+            stats = self._stats(done, time.perf_counter() - start, results, best_q_before)
+            self.status = 'cancelled' if self.cancel_event.is_set() else 'done'
+            self.messages.put((self.status, stats))
+        except Exception as error:  # El error se muestra en la interfaz en lugar de perderse en el hilo
+            self.status = 'error'
+            self.messages.put(('error', str(error)))
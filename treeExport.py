@@ -0,0 +1,197 @@
+import heapq
+import os
+import random
+import shutil
+import subprocess
+import tempfile
+import threading
+
+# Exportación del árbol AVL a DOT escrita línea por línea en el archivo, sin armar el grafo en
+# memoria, y dibujo con el programa `dot` de Graphviz en un proceso aparte. Con árboles grandes
+# conviene limitar lo que se exporta:
+#   max_depth: solo los niveles hasta esa profundidad (los hijos ocultos se marcan con "...")
+#   top_k:     los k subárboles cuyas raíces tienen el mayor valor Q, con el camino desde la raíz
+#   sample:    fracción de nodos elegidos al azar; cada uno se une a su ancestro elegido más cercano
+
+
+def best_q(node):
+    return max(node.value_q.values()) if node.value_q else None
+
+
+def _label(node):
+    q = best_q(node)
+    text = f"Q: {q:.2f}" if q is not None else "No Q-values"
+    return f"{text}\\nvisitas: {node.visits}"
+
+
+def _top_nodes(tree, k):
+    # Los k nodos con mayor valor Q y todos sus ancestros (para dibujar el camino desde la raíz)
+    heap = []
+    parents = {}
+    stack = [(tree.root, None)]
+    while stack:
+        node, parent = stack.pop()
+        if node is None:
+            continue
+        parents[id(node)] = parent
+        q = best_q(node)
+        if q is not None:
+            item = (q, id(node), node)
+            if len(heap) < k:
+                heapq.heappush(heap, item)
+            elif item[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, item)
+        stack.append((node.left, node))
+        stack.append((node.right, node))
+    tops = {id(node) for _, _, node in heap}
+    ancestors = set()
+    for node_id in tops:
+        parent = parents[node_id]
+        while parent is not None and id(parent) not in ancestors:
+            ancestors.add(id(parent))
+            parent = parents[id(parent)]
+    return tops, ancestors - tops
+
+
+def write_dot(tree, path, max_depth=None, top_k=None, sample=None, seed=0, progress=None):
+    # Escribe el DOT en `path` y devuelve cuántos nodos incluyó. progress(n) se llama cada
+    # 1000 nodos escritos.
+    rng = random.Random(seed)
+    tops, ancestors = _top_nodes(tree, top_k) if top_k else (None, None)
+    written = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('// AVL Tree\ndigraph {\n\tnode [shape=box fontsize=10]\n')
+        if not tree.root:
+            f.write('\tNone [label="Empty Tree"]\n}\n')
+            return 0
+        # Cada elemento: (nodo, profundidad relativa, ancestro dibujado más cercano, si es su
+        # hijo directo, si está dentro de un subárbol top-k)
+        stack = [(tree.root, 0, None, True, top_k is None)]
+        while stack:
+            node, depth, drawn_parent, direct, inside = stack.pop()
+            node_id = id(node)
+            if top_k and node_id in tops:
+                inside, depth = True, 0  # La profundidad se cuenta desde la raíz del subárbol
+            if inside:
+                keep = sample is None or node is tree.root or rng.random() < sample
+            else:
+                keep = node_id in ancestors
+            if not inside and not keep:
+                continue  # Fuera de todo subárbol top-k y de sus caminos
+            if keep:
+                style = '' if inside else ' style=dashed'  # Ancestros que solo dan contexto
+                f.write(f'\tn{node_id} [label="{_label(node)}"{style}]\n')
+                if drawn_parent is not None:
+                    f.write(f'\tn{drawn_parent} -> n{node_id}{"" if direct else " [style=dashed]"}\n')
+                written += 1
+                if progress and written % 1000 == 0:
+                    progress(written)
+            parent_for_children = node_id if keep else drawn_parent
+            children = [child for child in (node.right, node.left) if child]
+            if max_depth is not None and inside and depth >= max_depth:
+                if children and keep:
+                    f.write(f'\tmore{node_id} [label="..." shape=plaintext]\n\tn{node_id} -> more{node_id}\n')
+                continue
+            for child in children:
+                stack.append((child, depth + 1, parent_for_children, keep, inside))
+        f.write('}\n')
+    return written
+
+
+def dot_available():
+    return shutil.which('dot') is not None
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+class DotExportJob:
+    # Escribe el DOT en un hilo aparte, porque write_dot recorre todo el árbol. Se consulta con
+    # poll() y se cancela con cancel() igual que RenderJob; el hilo deja de escribir en el
+    # siguiente aviso de progreso.
+
+    def __init__(self, tree, path, max_depth=None, top_k=None, sample=None):
+        self.tree = tree
+        self.path = path
+        self.options = (max_depth, top_k, sample)
+        self.thread = None
+        self.written = None
+        self.error = None
+        self.cancelled = False
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def _run(self):
+        try:
+            self.written = write_dot(self.tree, self.path, *self.options, progress=self._check_cancelled)
+        except ExportCancelled:
+            if os.path.exists(self.path):
+                os.remove(self.path)  # DOT a medias
+        except OSError as error:
+            self.error = error
+
+    def _check_cancelled(self, written):
+        if self.cancelled:
+            raise ExportCancelled
+
+    def poll(self):
+        # None mientras sigue escribiendo; 'done', 'cancelled' o 'error' al terminar
+        if self.thread is None or self.thread.is_alive():
+            return None
+        if self.cancelled:
+            return 'cancelled'
+        return 'error' if self.error is not None else 'done'
+
+    def error_message(self):
+        return str(self.error) if self.error is not None else ''
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class RenderJob:
+    # Ejecuta `dot` en un proceso aparte; quien lo lanza consulta poll() sin bloquearse y puede
+    # cancelarlo con cancel()
+
+    def __init__(self, dot_path, output_path=None, fmt='pdf'):
+        self.dot_path = dot_path
+        self.output_path = output_path or f'{dot_path}.{fmt}'
+        self.fmt = fmt
+        self.process = None
+        self.errors = None
+        self.cancelled = False
+
+    def start(self):
+        if not dot_available():
+            raise RuntimeError("No se encontró el programa 'dot' de Graphviz")
+        # Los mensajes de dot van a un archivo temporal: un pipe sin leer podría llenarse y trabarlo
+        self.errors = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(['dot', f'-T{self.fmt}', self.dot_path, '-o', self.output_path],
+                                        stdout=subprocess.DEVNULL, stderr=self.errors)
+        return self
+
+    def poll(self):
+        # None mientras sigue dibujando; 'done', 'cancelled' o 'error' al terminar
+        if self.process is None or self.process.poll() is None:
+            return None
+        if self.cancelled:
+            return 'cancelled'
+        return 'done' if self.process.returncode == 0 else 'error'
+
+    def error_message(self):
+        if self.errors is None:
+            return ''
+        self.errors.seek(0)
+        return self.errors.read().decode(errors='replace').strip()
+
+    def cancel(self):
+        if self.process is not None and self.process.poll() is None:
+            self.cancelled = True
+            self.process.kill()
+            self.process.wait()
+            if os.path.exists(self.output_path):
+                os.remove(self.output_path)  # Salida a medias
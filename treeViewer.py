@@ -0,0 +1,125 @@
+import tkinter as tk
+from tkinter import Label, Toplevel, messagebox, ttk
+
+from treeExport import DotExportJob, RenderJob, dot_available
+
+LARGE_TREE = 2000  # A partir de este tamaño se propone limitar la profundidad
+
+
+class TreeExportWindow:
+    # Opciones del diagrama de evolución. El DOT se escribe en un hilo aparte y `dot` dibuja en
+    # un proceso aparte; la ventana solo consulta cada paso con after(), así que el juego sigue
+    # respondiendo y la exportación se puede cancelar en cualquier momento.
+
+    def __init__(self, master, tree, filename='avl_tree'):
+        self.master = master
+        self.tree = tree
+        self.filename = filename
+        self.job = None
+        self.closed = False
+        size = len(tree)
+
+        self.window = Toplevel(master)
+        self.window.title("Diagrama de evolucion")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        Label(self.window, text=f"{size} estados en el árbol").grid(row=0, column=0, columnspan=2, pady=5)
+
+        self.max_depth = self._field("Profundidad máxima", 1, '8' if size > LARGE_TREE else '')
+        self.top_k = self._field("Top K por valor Q", 2, '')
+        self.sample = self._field("Muestra (0-1)", 3, '')
+
+        self.progress = ttk.Progressbar(self.window, orient="horizontal", length=220, mode='indeterminate')
+        self.progress.grid(row=4, column=0, columnspan=2, padx=10, pady=5)
+        self.status = Label(self.window, text="")
+        self.status.grid(row=5, column=0, columnspan=2)
+
+        self.generate_button = tk.Button(self.window, text="Generar", command=self.generate)
+        self.generate_button.grid(row=6, column=0, pady=10)
+        tk.Button(self.window, text="Cancelar", command=self.close).grid(row=6, column=1, pady=10)
+
+    def _field(self, text, row, default):
+        Label(self.window, text=text).grid(row=row, column=0, sticky="w", padx=10)
+        entry = tk.Entry(self.window, width=10)
+        entry.insert(0, default)
+        entry.grid(row=row, column=1, padx=10)
+        return entry
+
+    def _options(self):
+        def read(entry, kind):
+            text = entry.get().strip()
+            return kind(text) if text else None
+
+        max_depth = read(self.max_depth, int)
+        top_k = read(self.top_k, int)
+        sample = read(self.sample, float)
+        if (max_depth is not None and max_depth < 0) or (top_k is not None and top_k < 1) \
+                or (sample is not None and not 0 < sample <= 1):
+            raise ValueError
+        return max_depth, top_k, sample
+
+    def generate(self):
+        try:
+            max_depth, top_k, sample = self._options()
+        except ValueError:
+            messagebox.showerror("Error", "Revise las opciones: enteros positivos y una muestra entre 0 y 1.",
+                                 parent=self.window)
+            return
+        self.generate_button.config(state="disabled")
+        self.status.config(text="Escribiendo el diagrama...")
+        self.progress.start(10)
+        self.job = DotExportJob(self.tree, self.filename, max_depth, top_k, sample).start()
+        self.window.after(200, self.poll)
+
+    def poll(self):
+        if self.closed:
+            return  # close() ya destruyó la ventana
+        result = self.job.poll()
+        if result is None:
+            self.window.after(200, self.poll)
+            return
+        if result == 'cancelled':
+            return
+        if isinstance(self.job, DotExportJob):
+            self._exported(result)
+        else:
+            self._rendered(result)
+
+    def _exported(self, result):
+        if result == 'error':
+            self._failed(f"No se pudo escribir {self.filename}:\n{self.job.error_message()}")
+            return
+        written = self.job.written
+        if not dot_available():
+            self.progress.stop()
+            messagebox.showinfo("Diagrama de evolucion",
+                                f"Se guardó {self.filename} ({written} nodos) en formato DOT. "
+                                "Instale Graphviz para dibujarlo.", parent=self.window)
+            self.close()
+            return
+        self.status.config(text=f"Dibujando {written} nodos...")
+        self.job = RenderJob(self.filename).start()
+        self.window.after(200, self.poll)
+
+    def _rendered(self, result):
+        if result == 'error':
+            self._failed(f"Graphviz no pudo dibujar el árbol:\n{self.job.error_message()}")
+            return
+        import graphviz  # Solo se carga al abrir el diagrama
+
+        self.progress.stop()
+        graphviz.view(self.job.output_path)
+        self.close()
+
+    def _failed(self, message):
+        self.progress.stop()
+        messagebox.showerror("Error", message, parent=self.window)
+        self.generate_button.config(state="normal")
+        self.status.config(text="")
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self.job is not None:
+            self.job.cancel()
+        self.window.destroy()
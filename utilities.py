@@ -1,6 +1,114 @@
-from PIL import ImageGrab
-import os
+import atexit
+import math
 import datetime
+import json
+import logging
+import os
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DIR = 'history'
+RECORDS_FILE = 'games.jsonl'  # Un registro JSON por partida, dentro de HISTORY_DIR
+
+
+def render_board(board_state, cell_size=None):
+    # Dibuja el tablero final directamente desde el estado, sin capturar la pantalla. PIL solo
+    # se carga al guardar la primera imagen.
+    from PIL import Image, ImageDraw
+
+    cells = math.isqrt(len(board_state))
+    cell_size = cell_size or max(300 // cells, 20)
+    size = cell_size * cells
+    img = Image.new('RGB', (size, size), 'white')
+    draw = ImageDraw.Draw(img)
+    grid_width = min(3, max(cell_size // 10, 1))
+    for i in range(1, cells):
+        draw.line([(i * cell_size, 0), (i * cell_size, size)], fill='black', width=grid_width)
+        draw.line([(0, i * cell_size), (size, i * cell_size)], fill='black', width=grid_width)
+
+    margin = cell_size // 5
+    stroke = max(cell_size // 16, 2)
+    for index, text in enumerate(board_state):
+        x0 = (index % cells) * cell_size + margin
+        y0 = (index // cells) * cell_size + margin
+        x1 = x0 + cell_size - 2 * margin
+        y1 = y0 + cell_size - 2 * margin
+        if text == 'X':
+            draw.line([(x0, y0), (x1, y1)], fill='#c0392b', width=stroke)
+            draw.line([(x0, y1), (x1, y0)], fill='#c0392b', width=stroke)
+        elif text == 'O':
+            draw.ellipse([x0, y0, x1, y1], outline='#2471a3', width=stroke)
+    return img
+
+
+class HistoryWriter:
+    # Hilo de fondo que dibuja y guarda el historial. Las partidas se encolan sin bloquear el
+    # ciclo de eventos de Tk; el hilo toma lotes de la cola y escribe los registros de cada lote
+    # con una sola apertura del archivo.
+
+    def __init__(self, directory=HISTORY_DIR, write_images=True, batch_size=32):
+        self.directory = directory
+        self.write_images = write_images
+        self.batch_size = batch_size
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def submit(self, record):
+        self.queue.put(record)
+
+    def flush(self):
+        self.queue.join()
+
+    def close(self):
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            records = [record for record in batch if record is not None]
+            try:
+                self._write(records)
+            except OSError as error:
+                logger.error("No se pudo guardar el historial: %s", error)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+            if stop:
+                return
+
+    def _write(self, records):
+        if not records:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        for record in records:
+            if record.get('image'):
+                render_board(record['board']).save(os.path.join(self.directory, record['image']))
+        with open(os.path.join(self.directory, RECORDS_FILE), 'a', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record) + '\n')
+
+
+_history_writer = None
+
+
+def get_history_writer():
+    # Un solo hilo de escritura por proceso, creado la primera vez que se guarda una partida
+    global _history_writer
+    if _history_writer is None:
+        _history_writer = HistoryWriter()
+    return _history_writer
 
 
 class GameUtilities:
@@ -8,18 +116,17 @@ class GameUtilities:
     def __init__(self, boardContext):
         self.boardContext = boardContext
 
-    
-    def save_screenshot(self):
-        # Se asegura que exista la carpeta
-        os.makedirs('history', exist_ok=True)
-
-        x0 = self.boardContext.root.winfo_rootx() + self.boardContext.buttons[0].winfo_x()
-        y0 = self.boardContext.root.winfo_rooty() + self.boardContext.buttons[0].winfo_y()
-        x1 = x0 + 3 * self.boardContext.buttons[0].winfo_width()
-        y1 = y0 + 3 * self.boardContext.buttons[0].winfo_height()
-
-        # toma y guarda la captura
-        img = ImageGrab.grab(bbox=(x0, y0, x1, y1))
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        img.save(f'history/game_{timestamp}.png')
-        print(f"Saved screenshot as 'history/game_{timestamp}.png'")
\ No newline at end of file
+    def save_game_record(self, winner=None):
+        # Toma el estado final ahora (antes del reinicio) y deja el dibujo y la escritura al hilo
+        writer = get_history_writer()
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S-%f")
+        machine = getattr(self.boardContext, 'machineIa', None)
+        q_values = getattr(machine, 'last_q_values', None) or {}
+        record = {
+            'timestamp': timestamp,
+            'board': list(self.boardContext.get_board_state()),
+            'winner': winner,
+            'q_values': {str(index): q for index, q in sorted(q_values.items())},
+            'image': f'game_{timestamp}.png' if writer.write_images else None,
+        }
+        writer.submit(record)